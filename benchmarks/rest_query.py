@@ -0,0 +1,80 @@
+"""Benchmarks the per-query overhead of the shared middleware stack.
+
+Compares the flattened :class:`voltorb.middlewares.RestQuery` fast path against the equivalent composition of
+generator middlewares (``reusable`` + ``relay`` + ``map_return``) it replaced, with and without the static request
+templates.
+
+Examples:
+    python benchmarks/rest_query.py
+"""
+
+import timeit
+from functools import partial
+
+import snug
+from attrs import frozen
+from gentools import compose, map_return, relay, reusable
+
+from voltorb.middlewares import (
+    deserialiser,
+    error_handling_middleware,
+    request_preparation_middleware,
+    request_template,
+    rest_query,
+)
+
+URL = "https://api.electricitymap.org/v3/carbon-intensity/latest"
+RESPONSE = snug.Response(200, content=b'{"zone": "IT", "carbonIntensity": 302}')
+
+
+@frozen
+class Schema:
+    zone: str
+    carbonIntensity: int  # noqa: N815
+
+
+def composed_rest_query(*, response_schema):
+    return compose(
+        reusable,
+        relay(request_preparation_middleware, error_handling_middleware),
+        map_return(partial(deserialiser, response_schema=response_schema)),
+    )
+
+
+def endpoint(zone):
+    request = snug.Request("GET", URL)
+    return (yield request.with_params({"zone": zone}))
+
+
+def templated_endpoint(zone):
+    return (yield request_template("GET", URL).with_params({"zone": zone}))
+
+
+def run(query):
+    """Drives a query against a canned response, without any client/network overhead."""
+    gen = iter(query)
+    next(gen)
+    try:
+        gen.send(RESPONSE)
+    except StopIteration as e:
+        return e.value
+    raise AssertionError
+
+
+CASES = {
+    "composed middlewares": composed_rest_query(response_schema=Schema)(endpoint),
+    "flattened (no template)": rest_query(response_schema=Schema)(endpoint),
+    "flattened + template": rest_query(response_schema=Schema)(templated_endpoint),
+}
+
+
+if __name__ == "__main__":
+    number, repeat = 20_000, 5
+    baseline = None
+    for name, make_query in CASES.items():
+        best = min(
+            timeit.repeat(lambda mq=make_query: run(mq("IT")), number=number, repeat=repeat)
+        )
+        per_query_us = best / number * 1e6
+        baseline = baseline or per_query_us
+        print(f"{name:<28} {per_query_us:8.2f} us/query  ({baseline / per_query_us:4.2f}x)")
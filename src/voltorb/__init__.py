@@ -4,9 +4,33 @@ import logging
 
 from ._patches import async_executor, execute, execute_async, executor
 from ._version import __version__
+from .adaptive import AdaptiveConcurrencyClient
 from .api import Api as electricity_maps  # noqa: N813
 from .auth import token_auth
-from .exceptions import HTTPStatusError, UnauthorisedError, ValidationError
+from .batch import Batch
+from .cache import CachingClient
+from .catalog import ZoneCatalog
+from .circuit import CircuitBreakingClient
+from .clients import ClientWrapper
+from .coverage import RangeCache
+from .entitlements import EntitlementClient
+from .exceptions import (
+    CircuitOpenError,
+    ForbiddenError,
+    HTTPStatusError,
+    OfflineError,
+    UnauthorisedError,
+    ValidationError,
+)
+from .lookups import lookup_past
+from .planner import QueryPlanner
+from .resolver import ZoneResolver
+from .streaming import (
+    aiter_past_range,
+    aiter_updated_since,
+    iter_past_range,
+    iter_updated_since,
+)
 from .typing import Coordinates, EmissionFactorType, EstimationMethod, ZoneKey
 
 __all__ = [
@@ -17,11 +41,29 @@ __all__ = [
     "HTTPStatusError",
     "ValidationError",
     "UnauthorisedError",
+    "ForbiddenError",
+    "CircuitOpenError",
+    "OfflineError",
     "execute_async",
     "executor",
     "async_executor",
+    "Batch",
     "Coordinates",
     "ZoneKey",
+    "ZoneCatalog",
+    "ZoneResolver",
+    "RangeCache",
+    "QueryPlanner",
+    "ClientWrapper",
+    "CircuitBreakingClient",
+    "AdaptiveConcurrencyClient",
+    "CachingClient",
+    "EntitlementClient",
+    "iter_past_range",
+    "aiter_past_range",
+    "lookup_past",
+    "iter_updated_since",
+    "aiter_updated_since",
     "EmissionFactorType",
     "EstimationMethod",
 ]
@@ -0,0 +1,5 @@
+"""Entry point of `python -m voltorb`."""
+
+from voltorb.cli import main
+
+main()
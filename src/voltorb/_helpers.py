@@ -0,0 +1,19 @@
+"""Helpers shared by the modules of the package."""
+
+import importlib
+from datetime import datetime, timezone
+from types import ModuleType
+
+
+def optional_import(name: str) -> ModuleType | None:
+    """Imports the module of an optional dependency, if installed."""
+    try:
+        return importlib.import_module(name)
+    except ImportError:  # pragma: no cover
+        return None
+
+
+def utc(dt: datetime) -> datetime:
+    """Converts a datetime to UTC, naive datetimes being UTC (as for the API)."""
+    is_naive = dt.tzinfo is None or dt.tzinfo.utcoffset(dt) is None
+    return dt.replace(tzinfo=timezone.utc) if is_naive else dt.astimezone(timezone.utc)
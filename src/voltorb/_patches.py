@@ -1,5 +1,6 @@
 """Patches for snug type annotations."""
 
+import functools
 import urllib.request
 from collections.abc import Callable, Coroutine, Generator, Iterator
 from typing import Any, Protocol, TypeAlias, TypeVar
@@ -26,21 +27,47 @@ class ExecuteAsync(Protocol):
     ) -> Coroutine[Any, Any, T_co]: ...
 
 
+def iterate(query: Query[T_co]) -> Generator[snug.Request, snug.Response, T_co]:
+    """Returns the request / response generator resolving a query (i.e. ``iter(query)``, but correctly typed)."""
+    return iter(query)  # type: ignore[arg-type]
+
+
+def _decoding(client: Any) -> Any:
+    """Wraps clients which don't decode compressed responses themselves into ones which do."""
+    from voltorb.clients import ClientWrapper, undecoding
+
+    return ClientWrapper(client) if undecoding(client) else client
+
+
 def execute(query: Query[T_co], auth: _AuthT = None, client: Any = None) -> T_co:
     if client is None:
         client = urllib.request.build_opener()
-    return snug.execute(query, auth, client)  # type: ignore[no-any-return]
+    return snug.execute(query, auth, _decoding(client))  # type: ignore[no-any-return]
 
 
 def execute_async(
-    query: Query[T_co], auth: _AuthT = None, client: Any = None
+    query: Query[T_co], auth: _AuthT = None, client: Any = None, *, http2: bool = False
 ) -> Coroutine[Any, Any, T_co]:
-    return snug.execute_async(query, auth, client)  # type: ignore[no-any-return]
+    if http2:
+        if client is not None:
+            msg = "http2 can't be combined with a custom client"
+            raise ValueError(msg)
+        return _execute_http2(query, auth)
+    return snug.execute_async(query, auth, _decoding(client))  # type: ignore[no-any-return]
+
+
+async def _execute_http2(query: Query[T_co], auth: _AuthT) -> T_co:
+    """Executes a query multiplexing all of its requests over the HTTP/2 connection(s) of the running event loop."""
+    from voltorb.transports import _shared_client
+
+    client = await _shared_client()
+    return await snug.execute_async(query, auth, client)  # type: ignore[no-any-return]
 
 
 def executor(**kwargs: Any) -> Execute:
-    return snug.executor(**kwargs)  # type: ignore[no-any-return]
+    # rather than snug.executor, so that the default client decodes compressed responses, as with execute()
+    return functools.partial(execute, **kwargs)
 
 
 def async_executor(**kwargs: Any) -> ExecuteAsync:
-    return snug.async_executor(**kwargs)  # type: ignore[no-any-return]
+    return functools.partial(execute_async, **kwargs)
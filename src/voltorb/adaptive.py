@@ -0,0 +1,272 @@
+"""Adaptive concurrency control, so that requests are sent as concurrently as the API sustains, and no more.
+
+The limit of requests in flight follows an additive-increase/multiplicative-decrease (AIMD) rule:
+
+* healthy responses raise the limit by about one request per limit's worth of responses (i.e. per round trip),
+  as long as the limit is being used,
+* congested responses (429s, 5xx, errors, or latencies well above the usual one) cut the limit by a factor, at most once
+  per round trip, so that a burst of congested responses to the same requests only cuts it once.
+
+Requests over the limit wait for one in flight to complete, whether sent from threads (e.g. the workers of a sync
+:class:`voltorb.Batch`) or from tasks (e.g. of an async one).
+"""
+
+import asyncio
+import logging
+import threading
+import time
+from collections import Counter
+from collections.abc import Callable
+from typing import Any
+
+import snug
+
+from voltorb.batch import DEFAULT_MAX_CONCURRENCY
+from voltorb.clients import ClientWrapper
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MIN_LIMIT = 1
+DEFAULT_MAX_LIMIT = 64
+DEFAULT_BACKOFF = 0.5
+DEFAULT_LATENCY_TOLERANCE = 2.0
+
+_SMOOTHING = 0.1  # of the moving average of latencies
+
+
+def _is_congested(response: snug.Response) -> bool:
+    # throttled, or the host degrading
+    status_code: int = response.status_code
+    return status_code == 429 or status_code >= 500  # noqa: PLR2004
+
+
+def _wake(waiter: "asyncio.Future[None]") -> None:
+    if not waiter.done():
+        waiter.set_result(None)
+
+
+class AdaptiveLimiter:
+    """An additive-increase/multiplicative-decrease limit of the requests in flight, shared by threads and tasks.
+
+    Args:
+        initial (optional): The initial limit.
+        minimum (optional): The lowest limit.
+        maximum (optional): The highest limit.
+        backoff (optional): The factor by which congestion cuts the limit.
+        latency_tolerance (optional): The multiple of the moving average of latencies above which a response counts as
+            congested.
+        clock (optional): The monotonic clock measuring latencies.
+    """
+
+    def __init__(  # noqa: PLR0913
+        self,
+        *,
+        initial: int = DEFAULT_MAX_CONCURRENCY,
+        minimum: int = DEFAULT_MIN_LIMIT,
+        maximum: int = DEFAULT_MAX_LIMIT,
+        backoff: float = DEFAULT_BACKOFF,
+        latency_tolerance: float = DEFAULT_LATENCY_TOLERANCE,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        if not 1 <= minimum <= initial <= maximum:
+            msg = f"Expected 1 <= minimum <= initial <= maximum, got {minimum!r}, {initial!r}, {maximum!r}"
+            raise ValueError(msg)
+        if not 0 < backoff < 1:
+            msg = f"backoff must be in (0, 1), got {backoff!r}"
+            raise ValueError(msg)
+
+        self.minimum = minimum
+        self.maximum = maximum
+        self.backoff = backoff
+        self.latency_tolerance = latency_tolerance
+        self.clock = clock
+        self.stats: Counter[str] = Counter()
+        """The number of requests sent, of those which had to wait, and of congested responses and cuts of the
+        limit."""
+
+        self._limit = float(initial)
+        self._in_flight = 0
+        self._latency: float | None = None
+        self._cut_at = float("-inf")
+        self._condition = threading.Condition()
+        self._waiters: list[asyncio.Future[None]] = []
+
+    @property
+    def limit(self) -> int:
+        """The current limit of requests in flight."""
+        return int(self._limit)
+
+    @property
+    def in_flight(self) -> int:
+        """The number of requests in flight."""
+        return self._in_flight
+
+    @property
+    def latency(self) -> float | None:
+        """The moving average of the latencies of the responses not throttled (or failed), in seconds (`None` until the
+        first one)."""
+        return self._latency
+
+    def _try_acquire(self) -> float | None:
+        # to be called with the lock held
+        if self._in_flight >= int(self._limit):
+            return None
+        self._in_flight += 1
+        self.stats["requests"] += 1
+        return self.clock()
+
+    def acquire(self) -> float:
+        """Waits for the number of requests in flight to be under the limit, and counts one more.
+
+        Returns:
+            When the request was let through, to pass on to :meth:`release`.
+        """
+        with self._condition:
+            started = self._try_acquire()
+            if started is None:
+                self.stats["waits"] += 1
+            while started is None:
+                self._condition.wait()
+                started = self._try_acquire()
+            return started
+
+    async def acquire_async(self) -> float:
+        """Asynchronously waits for the number of requests in flight to be under the limit (see :meth:`acquire`)."""
+        waited = False
+        while True:
+            with self._condition:
+                started = self._try_acquire()
+                if started is not None:
+                    self.stats["waits"] += waited
+                    return started
+                waiter = asyncio.get_running_loop().create_future()
+                self._waiters.append(waiter)
+            waited = True
+            try:
+                await waiter
+            finally:
+                with self._condition:
+                    if waiter in self._waiters:
+                        self._waiters.remove(waiter)
+
+    def release(self, started: float, *, congested: bool | None) -> None:
+        """Counts a request out of flight, and adapts the limit to its outcome.
+
+        Args:
+            started: When the request was let through (see :meth:`acquire`).
+            congested: Whether the response was congested, or `None` if the request didn't complete (e.g. cancelled),
+                so that its outcome says nothing of the API.
+        """
+        now = self.clock()
+        latency = now - started
+        with self._condition:
+            saturated = self._in_flight >= int(self._limit)
+            self._in_flight -= 1
+            if congested is False:
+                spike = (
+                    self._latency is not None
+                    and latency > self.latency_tolerance * self._latency
+                )
+                # spikes are averaged in too, so that the usual latency follows lasting shifts (rather than cutting
+                # the limit for good)
+                self._latency = (
+                    latency
+                    if self._latency is None
+                    else self._latency + _SMOOTHING * (latency - self._latency)
+                )
+                if spike:
+                    self.stats["latency_spikes"] += 1
+                    congested = True
+
+            if congested:
+                self.stats["congested"] += 1
+                # the requests sent before the last cut were sent at the higher limit, which was already cut
+                if started >= self._cut_at:
+                    self._limit = max(self.minimum, self._limit * self.backoff)
+                    self._cut_at = now
+                    self.stats["cuts"] += 1
+                    logger.debug(
+                        "Congestion, cut the concurrency limit to %d", self.limit
+                    )
+            elif congested is False and saturated:
+                self._limit = min(self.maximum, self._limit + 1 / self._limit)
+
+            self._condition.notify_all()
+            waiters, self._waiters = self._waiters, []
+        for waiter in waiters:
+            # waiters might be on another event loop (or thread) than the one releasing
+            waiter.get_loop().call_soon_threadsafe(_wake, waiter)
+
+    def __repr__(self) -> str:
+        return f"AdaptiveLimiter(limit={self.limit}, in_flight={self._in_flight})"
+
+
+class AdaptiveConcurrencyClient(ClientWrapper):
+    """A client wrapper limiting the requests in flight to the limit the API currently sustains (see :mod:`voltorb.adaptive`).
+
+    The limit applies to all the requests sent through the client, whichever queries (and executors) they are sent
+    from, so that batches can be given a generous `max_concurrency`, as a ceiling, and let the client find the actual
+    one.
+
+    Examples:
+        >>> import voltorb
+        >>> client = AdaptiveConcurrencyClient(maximum=32)
+        >>> query = voltorb.Batch({}, max_concurrency=32)
+        >>> voltorb.execute(query, client=client)
+        {}
+        >>> client.limit
+        8
+
+    Args:
+        client (optional): The wrapped client.
+        limiter (optional): The limiter of the requests in flight, e.g. to share it among clients. Defaults to a limiter
+            configured by the other arguments.
+        **config: The configuration of the default limiter (see :class:`AdaptiveLimiter`).
+    """
+
+    def __init__(
+        self, client: Any = None, limiter: AdaptiveLimiter | None = None, **config: Any
+    ) -> None:
+        super().__init__(client)
+        self.limiter = AdaptiveLimiter(**config) if limiter is None else limiter
+
+    @property
+    def limit(self) -> int:
+        """The current limit of requests in flight."""
+        return self.limiter.limit
+
+    @property
+    def stats(self) -> Counter[str]:
+        """The number of requests sent, of those which had to wait, and of congested responses and cuts of the
+        limit."""
+        return self.limiter.stats
+
+    def send(self, request: snug.Request) -> snug.Response:
+        started = self.limiter.acquire()
+        congested = None
+        try:
+            response = super().send(request)
+            congested = _is_congested(response)
+        except Exception:
+            # e.g. timeouts, or connections refused
+            congested = True
+            raise
+        finally:
+            self.limiter.release(started, congested=congested)
+        return response
+
+    async def send_async(self, request: snug.Request) -> snug.Response:
+        started = await self.limiter.acquire_async()
+        congested = None
+        try:
+            response = await super().send_async(request)
+            congested = _is_congested(response)
+        except Exception:
+            congested = True
+            raise
+        finally:
+            self.limiter.release(started, congested=congested)
+        return response
+
+    def __repr__(self) -> str:
+        return f"AdaptiveConcurrencyClient({self.client!r}, limit={self.limit})"
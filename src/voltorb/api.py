@@ -1,25 +1,43 @@
-"""Electricity Maps API queries."""
+"""Electricity Maps API queries.
 
-from datetime import datetime, timezone
+All API routes are declared as :class:`Endpoint` objects (path, parameters, response schema), from which both the
+queries and their batch variants are generated.
+"""
+
+import functools
+import inspect
+from collections.abc import Callable, Iterable, Mapping
+from datetime import datetime
+from typing import Any, Generic, TypeVar
 
 import snug
-from typing_extensions import assert_never
+from attrs import field, frozen
+from typing_extensions import ParamSpec, assert_never
 
 from voltorb import schemas
+from voltorb._helpers import utc
 from voltorb._patches import Query
-from voltorb.middlewares import rest_query
+from voltorb.batch import DEFAULT_MAX_CONCURRENCY, Batch, Mapped, OrNone
+from voltorb.exceptions import ForbiddenError, UnauthorisedError
+from voltorb.lookups import lookup_past
+from voltorb.middlewares import Deduplicator, RestQuery, request_template
+from voltorb.streaming import (
+    aiter_past_range,
+    aiter_updated_since,
+    iter_past_range,
+    iter_updated_since,
+)
 from voltorb.typing import Coordinates, EmissionFactorType, Geolocation, ZoneKey
 
+P = ParamSpec("P")
+T = TypeVar("T")
+
 _API_PREFIX = "https://api.electricitymap.org"
 
 
 def _as_utc_isoformat(dt: datetime) -> str:
     """Converts a datetime object to a UTC ISO 8601 format string."""
-    is_naive = dt.tzinfo is None or dt.tzinfo.utcoffset(dt) is None
-    if is_naive:
-        dt = dt.replace(tzinfo=timezone.utc)
-
-    return dt.astimezone(timezone.utc).isoformat().replace("+00:00", "Z")
+    return utc(dt).isoformat().replace("+00:00", "Z")
 
 
 def _geolocation_to_params(geolocation: Geolocation) -> dict[str, str | float]:
@@ -33,64 +51,281 @@ def _geolocation_to_params(geolocation: Geolocation) -> dict[str, str | float]:
             assert_never(unreachable)
 
 
-def get_health() -> Query[snug.Response]:
-    """This endpoint can be used to automatically verify that the Electricity Maps API is up."""
-    request = snug.Request("GET", f"{_API_PREFIX}/health")
-    return (yield request)
+# how each endpoint argument is converted into query parameters
+_PARAMS: dict[str, Callable[[Any], Mapping[str, Any]]] = {
+    "geolocation": _geolocation_to_params,
+    "date_time": lambda v: {"datetime": _as_utc_isoformat(v)},
+    "since": lambda v: {"since": _as_utc_isoformat(v)},
+    "start": lambda v: {"start": _as_utc_isoformat(v)},
+    "end": lambda v: {"end": _as_utc_isoformat(v)},
+    "emission_factor_type": lambda v: {"emissionFactorType": v.value},
+    "disable_estimations": lambda v: {"disableEstimations": v},
+    "limit": lambda v: {"limit": v},
+    "threshold": lambda v: {"threshold": v},
+}
 
 
-# using class structure of queries for simple namespacing
-class Api:
-    @staticmethod
-    @rest_query(response_schema=schemas.Zones)
-    def get_zones() -> Query[snug.Response]:
-        """This endpoint returns all zones available if no auth-token is provided.
+# the signatures of the endpoints (typing their calls), whose arguments are converted as above
 
-        If an auth-token is provided, it returns a list of zones and routes available with this token.
+
+def _no_arguments() -> None: ...
+
+
+def _geolocation(geolocation: Geolocation) -> None: ...
+
+
+def _latest(
+    geolocation: Geolocation, disable_estimations: bool | None = None
+) -> None: ...
+
+
+def _latest_emissions(
+    geolocation: Geolocation,
+    emission_factor_type: EmissionFactorType | None = None,
+    disable_estimations: bool | None = None,
+) -> None: ...
+
+
+def _past(
+    geolocation: Geolocation,
+    date_time: datetime,
+    disable_estimations: bool | None = None,
+) -> None: ...
+
+
+def _past_emissions(
+    geolocation: Geolocation,
+    date_time: datetime,
+    emission_factor_type: EmissionFactorType | None = None,
+    disable_estimations: bool | None = None,
+) -> None: ...
+
+
+def _past_range(
+    geolocation: Geolocation,
+    start: datetime,
+    end: datetime,
+    disable_estimations: bool | None = None,
+) -> None: ...
+
+
+def _updated_since(
+    geolocation: Geolocation,
+    since: datetime,
+    start: datetime | None = None,
+    end: datetime | None = None,
+    limit: int | None = None,
+    threshold: str | None = None,
+    disable_estimations: bool | None = None,
+) -> None: ...
+
+
+@frozen
+class CachePolicy:
+    """How stale the cached responses of an endpoint may be served (see :class:`voltorb.CachingClient`).
+
+    Args:
+        stale_while_revalidate (optional): For how long past their freshness responses are still served immediately,
+            while revalidated in the background, in seconds.
+        max_staleness (optional): For how long past their freshness responses are still served by offline clients,
+            in seconds.
+    """
+
+    stale_while_revalidate: float = 0.0
+    max_staleness: float = 0.0
+
+    @property
+    def retention(self) -> float:
+        """For how long past their freshness responses must be kept, in seconds."""
+        return max(self.stale_while_revalidate, self.max_staleness)
+
+
+DEFAULT_CACHE_POLICY = CachePolicy()
+"""Responses are only served while fresh."""
+
+LIVE_CACHE_POLICY = CachePolicy(stale_while_revalidate=3600.0, max_staleness=86400.0)
+"""Responses of the polled endpoints (e.g. latest values, histories, forecasts) are served up to an hour past their
+freshness while revalidated, and up to a day past it offline."""
+
+
+@frozen(slots=False)
+class Endpoint(Generic[P, T]):
+    """A declarative Electricity Maps API endpoint.
+
+    Calling the endpoint with its arguments returns a (reusable) query for it. Endpoints taking a geolocation also
+    have a batch variant (:meth:`Endpoint.many`), querying several geolocations concurrently.
+
+    Args:
+        path: The path of the endpoint route.
+        response_schema: The schema into which responses are deserialised.
+        signature: A stub declaring the arguments of the endpoint, against which calls are typed (and checked).
+            Arguments with a default are optional, and omitted from the request when `None`.
+        doc: The documentation of the endpoint.
+        cache_policy: How stale the cached responses of the endpoint may be served.
+        deduplicator: The deduplicator through which responses are deserialised, if any (e.g. for polled endpoints,
+            whose responses mostly don't change between their hourly updates).
+    """
+
+    path: str
+    response_schema: type[T]
+    signature: Callable[P, object] = field(repr=False, eq=False)
+    doc: str | None = field(default=None, repr=False)
+    cache_policy: CachePolicy = field(default=DEFAULT_CACHE_POLICY, repr=False)
+    deduplicator: Deduplicator | None = field(default=None, repr=False, eq=False)
+    _signature: inspect.Signature = field(init=False, repr=False, eq=False)
+    _required: frozenset[str] = field(init=False, repr=False, eq=False)
+
+    def __attrs_post_init__(self) -> None:
+        # expose the endpoint arguments and documentation to introspection (e.g. help(), IDEs)
+        signature = inspect.signature(self.signature).replace(
+            return_annotation=Query[self.response_schema]  # type: ignore[name-defined]
+        )
+        required = frozenset(
+            name
+            for name, parameter in signature.parameters.items()
+            if parameter.default is inspect.Parameter.empty
+        )
+        object.__setattr__(self, "_signature", signature)
+        object.__setattr__(self, "_required", required)
+        object.__setattr__(self, "__signature__", signature)
+        object.__setattr__(self, "__doc__", self.doc)
+
+    @property
+    def geolocated(self) -> bool:
+        """Whether the endpoint takes a geolocation."""
+        return "geolocation" in self._signature.parameters
+
+    def params(self, *args: Any, **kwargs: Any) -> dict[str, Any]:
+        """Converts the endpoint arguments into query parameters."""
+        names = self._signature.parameters.keys()
+        arguments = dict(zip(names, args, strict=False), **kwargs)
+
+        # only fall back on the (slower) signature binding to raise the appropriate errors on invalid arguments
+        if (
+            len(args) > len(names)
+            or len(arguments) != len(args) + len(kwargs)
+            or not arguments.keys() <= names
+            or not arguments.keys() >= self._required
+        ):
+            self._signature.bind(*args, **kwargs)
+
+        params: dict[str, Any] = {}
+        for name in names:
+            value = arguments.get(name)
+            if value is not None:
+                params.update(_PARAMS[name](value))
+        return params
+
+    def request(self, params: Mapping[str, Any]) -> Query[snug.Response]:
+        """The request to the endpoint, with the given query parameters."""
+        return (
+            yield request_template("GET", f"{_API_PREFIX}{self.path}").with_params(
+                params
+            )
+        )
+
+    def __call__(self, *args: P.args, **kwargs: P.kwargs) -> Query[T]:
+        return RestQuery(
+            self.request,
+            self.params(*args, **kwargs),
+            response_schema=self.response_schema,
+            deduplicator=self.deduplicator,
+        )
+
+    def many(
+        self,
+        geolocations: Iterable[Geolocation],
+        *args: Any,
+        max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+        **kwargs: Any,
+    ) -> Query[dict[Geolocation, T]]:
+        """The batch variant of the endpoint, querying several geolocations concurrently.
+
+        Args:
+            geolocations: The geolocations for which to get data.
+            *args: The other arguments of the endpoint, shared by all geolocations.
+            max_concurrency (optional): The maximum number of queries in flight at any time.
+            **kwargs: The other arguments of the endpoint, shared by all geolocations.
+
+        Returns:
+            A query for the results of all geolocations, keyed by geolocation.
         """
-        request = snug.Request("GET", f"{_API_PREFIX}/v3/zones")
-        return (yield request)
+        if not self.geolocated:
+            msg = f"Endpoint {self.path!r} does not take a geolocation"
+            raise TypeError(msg)
+
+        # the arguments besides the geolocation are checked at runtime only
+        endpoint: Callable[..., Query[T]] = self
+        return Batch(
+            {
+                geolocation: endpoint(geolocation, *args, **kwargs)
+                for geolocation in geolocations
+            },
+            max_concurrency=max_concurrency,
+        )
+
+
+ENDPOINTS: dict[str, Endpoint[..., Any]] = {}
+"""All API endpoints, by path."""
+
+
+class _Routes:
+    """Base class for namespaces of API routes, registering all the endpoints of the namespace.
+
+    Namespaces declare (so that they type-check) a batch variant (``<name>_many``) of each geolocated endpoint,
+    streaming (``iter_past_range`` / ``aiter_past_range``) and point lookup (``lookup_past``) variants of range
+    endpoints, and paginating variants (``iter_updated_since`` / ``aiter_updated_since``) of the updates endpoint.
+    """
+
+    def __init_subclass__(cls, **kwargs: Any) -> None:
+        super().__init_subclass__(**kwargs)
+        for endpoint in vars(cls).values():
+            if isinstance(endpoint, Endpoint):
+                ENDPOINTS[endpoint.path] = endpoint
 
-    @staticmethod
-    @rest_query(response_schema=schemas.Health)
-    def get_health() -> Query[snug.Response]:
-        """This endpoint can be used to automatically verify that the Electricity Maps API is up."""
-        request = snug.Request("GET", f"{_API_PREFIX}/health")
-        return (yield request)
-
-    class carbon_intensity:
-        @staticmethod
-        @rest_query(response_schema=schemas.CarbonIntensity)
-        def get_latest(
-            geolocation: Geolocation,
-            emission_factor_type: EmissionFactorType | None = None,
-            disable_estimations: bool | None = None,
-        ) -> Query[snug.Response]:
-            """This endpoint retrieves the last known carbon intensity (in gCO2eq/kWh) of electricity consumed in an area.
+
+# using class structure of queries for simple namespacing
+class Api(_Routes):
+    get_zones = Endpoint(
+        "/v3/zones",
+        response_schema=schemas.Zones,
+        signature=_no_arguments,
+        doc="""This endpoint returns all zones available if no auth-token is provided.
+
+        If an auth-token is provided, it returns a list of zones and routes available with this token.
+        """,
+    )
+
+    get_health = Endpoint(
+        "/health",
+        response_schema=schemas.Health,
+        signature=_no_arguments,
+        doc="""This endpoint can be used to automatically verify that the Electricity Maps API is up.""",
+    )
+
+    class carbon_intensity(_Routes):
+        get_latest = Endpoint(
+            "/v3/carbon-intensity/latest",
+            response_schema=schemas.CarbonIntensity,
+            signature=_latest_emissions,
+            cache_policy=LIVE_CACHE_POLICY,
+            deduplicator=Deduplicator(),
+            doc="""This endpoint retrieves the last known carbon intensity (in gCO2eq/kWh) of electricity consumed in an area.
 
             Args:
                 geolocation: The geolocation for which to get data.
                 emission_factor_type (optional): The emission factor type.
                 disable_estimations (optional): Whether estimated data should be disabled.
-            """
-            request = snug.Request("GET", f"{_API_PREFIX}/v3/carbon-intensity/latest")
-
-            params = _geolocation_to_params(geolocation)
-            if emission_factor_type is not None:
-                params.update(emissionFactorType=emission_factor_type.value)
-            if disable_estimations is not None:
-                params.update(disableEstimations=disable_estimations)
-
-            return (yield request.with_params(params))
-
-        @staticmethod
-        @rest_query(response_schema=schemas.CarbonIntensityHistory)
-        def get_history(
-            geolocation: Geolocation,
-            emission_factor_type: EmissionFactorType | None = None,
-            disable_estimations: bool | None = None,
-        ) -> Query[snug.Response]:
-            """This endpoint retrieves the last 24 hours of carbon intensity (in gCO2eq/kWh) of an area.
+            """,
+        )
+
+        get_history = Endpoint(
+            "/v3/carbon-intensity/history",
+            response_schema=schemas.CarbonIntensityHistory,
+            signature=_latest_emissions,
+            cache_policy=LIVE_CACHE_POLICY,
+            deduplicator=Deduplicator(),
+            doc="""This endpoint retrieves the last 24 hours of carbon intensity (in gCO2eq/kWh) of an area.
 
             The resolution is 60 minutes.
 
@@ -98,27 +333,15 @@ class Api:
                 geolocation: The geolocation for which to get data.
                 emission_factor_type (optional): The emission factor type.
                 disable_estimations (optional): Whether estimated data should be disabled.
-            """
-            request = snug.Request("GET", f"{_API_PREFIX}/v3/carbon-intensity/history")
-
-            params = _geolocation_to_params(geolocation)
-            if emission_factor_type is not None:
-                params.update(emissionFactorType=emission_factor_type.value)
-            if disable_estimations is not None:
-                params.update(disableEstimations=disable_estimations)
-
-            return (yield request.with_params(params))
+            """,
+        )
 
         # TODO(avianello): requires commercial auth
-        @staticmethod
-        @rest_query(response_schema=schemas.CarbonIntensity)
-        def get_past(
-            geolocation: Geolocation,
-            date_time: datetime,
-            emission_factor_type: EmissionFactorType | None = None,
-            disable_estimations: bool | None = None,
-        ) -> Query[snug.Response]:
-            """This endpoint retrieves a past carbon intensity (in gCO2eq/kWh) of an area.
+        get_past = Endpoint(
+            "/v3/carbon-intensity/past",
+            response_schema=schemas.CarbonIntensity,
+            signature=_past_emissions,
+            doc="""This endpoint retrieves a past carbon intensity (in gCO2eq/kWh) of an area.
 
             The resolution is 60 minutes.
 
@@ -127,28 +350,15 @@ class Api:
                 date_time: The datetime for which to get data.
                 emission_factor_type (optional): The emission factor type.
                 disable_estimations (optional): Whether estimated data should be disabled.
-            """
-            request = snug.Request("GET", f"{_API_PREFIX}/v3/carbon-intensity/past")
-
-            params = _geolocation_to_params(geolocation)
-            params.update(datetime=_as_utc_isoformat(date_time))
-            if emission_factor_type is not None:
-                params.update(emissionFactorType=emission_factor_type.value)
-            if disable_estimations is not None:
-                params.update(disableEstimations=disable_estimations)
-
-            return (yield request.with_params(params))
+            """,
+        )
 
         # TODO(avianello): requires commercial auth
-        @staticmethod
-        @rest_query(response_schema=schemas.CarbonIntensityRange)
-        def get_past_range(
-            geolocation: Geolocation,
-            start: datetime,
-            end: datetime,
-            disable_estimations: bool | None = None,
-        ) -> Query[snug.Response]:
-            """This endpoint retrieves a past carbon intensity (in gCO2eq/kWh) of an area within a given date range.
+        get_past_range = Endpoint(
+            "/v3/carbon-intensity/past-range",
+            response_schema=schemas.CarbonIntensityRange,
+            signature=_past_range,
+            doc="""This endpoint retrieves a past carbon intensity (in gCO2eq/kWh) of an area within a given date range.
 
             The resolution is 60 minutes. The time range is limited to 10 days.
 
@@ -157,23 +367,16 @@ class Api:
                 start: The start datetime for which to get data.
                 end: The end datetime for which to get data (excluded).
                 disable_estimations (optional): Whether estimated data should be disabled.
-            """
-            request = snug.Request(
-                "GET", f"{_API_PREFIX}/v3/carbon-intensity/past-range"
-            )
-
-            params = _geolocation_to_params(geolocation)
-            params.update(start=_as_utc_isoformat(start), end=_as_utc_isoformat(end))
-            if disable_estimations is not None:
-                params.update(disableEstimations=disable_estimations)
-
-            return (yield request.with_params(params))
+            """,
+        )
 
         # TODO(avianello): requires commercial auth
-        @staticmethod
-        @rest_query(response_schema=schemas.CarbonIntensityForecast)
-        def get_forecast(geolocation: Geolocation) -> Query[snug.Response]:
-            """This endpoint retrieves the forecasted carbon intensity (in gCO2eq/kWh) of an area.
+        get_forecast = Endpoint(
+            "/v3/carbon-intensity/forecast",
+            response_schema=schemas.CarbonIntensityForecast,
+            signature=_geolocation,
+            cache_policy=LIVE_CACHE_POLICY,
+            doc="""This endpoint retrieves the forecasted carbon intensity (in gCO2eq/kWh) of an area.
 
             The endpoint returns 24 hours of forecasts. The forecasts span from horizon 0, which is the start of the current
             hour, to horizon 23. Ex: if the date and time is currently 2024-03-02 13:12:39 GMT, then the forecasts will cover
@@ -181,23 +384,25 @@ class Api:
 
             Args:
                 geolocation: The geolocation for which to get data.
-            """
-            request = snug.Request("GET", f"{_API_PREFIX}/v3/carbon-intensity/forecast")
-
-            params = _geolocation_to_params(geolocation)
-
-            return (yield request.with_params(params))
-
-    class marginal_carbon_intensity:
+            """,
+        )
+
+        get_latest_many = get_latest.many
+        get_history_many = get_history.many
+        get_past_many = get_past.many
+        get_past_range_many = get_past_range.many
+        get_forecast_many = get_forecast.many
+        iter_past_range = functools.partial(iter_past_range, get_past_range)
+        aiter_past_range = functools.partial(aiter_past_range, get_past_range)
+        lookup_past = functools.partial(lookup_past, get_past_range)
+
+    class marginal_carbon_intensity(_Routes):
         # TODO(avianello): requires commercial auth
-        @staticmethod
-        @rest_query(response_schema=schemas.CarbonIntensity)
-        def get_past(
-            geolocation: Geolocation,
-            date_time: datetime,
-            disable_estimations: bool | None = None,
-        ) -> Query[snug.Response]:
-            """This endpoint retrieves a past marginal carbon intensity (in gCO2eq/kWh) of an area.
+        get_past = Endpoint(
+            "/v3/marginal-carbon-intensity/past",
+            response_schema=schemas.CarbonIntensity,
+            signature=_past,
+            doc="""This endpoint retrieves a past marginal carbon intensity (in gCO2eq/kWh) of an area.
 
             The resolution is 60 minutes. The delay with the latest available data is between 1 and 2 months.
 
@@ -205,28 +410,15 @@ class Api:
                 geolocation: The geolocation for which to get data.
                 date_time: The datetime for which to get data.
                 disable_estimations (optional): Whether estimated data should be disabled.
-            """
-            request = snug.Request(
-                "GET", f"{_API_PREFIX}/v3/marginal-carbon-intensity/past"
-            )
-
-            params = _geolocation_to_params(geolocation)
-            params.update(datetime=_as_utc_isoformat(date_time))
-            if disable_estimations is not None:
-                params.update(disableEstimations=disable_estimations)
-
-            return (yield request.with_params(params))
+            """,
+        )
 
         # TODO(avianello): requires commercial auth
-        @staticmethod
-        @rest_query(response_schema=schemas.CarbonIntensityRange)
-        def get_past_range(
-            geolocation: Geolocation,
-            start: datetime,
-            end: datetime,
-            disable_estimations: bool | None = None,
-        ) -> Query[snug.Response]:
-            """This endpoint retrieves a past marginal carbon intensity (in gCO2eq/kWh) of an area within a given date range.
+        get_past_range = Endpoint(
+            "/v3/marginal-carbon-intensity/past-range",
+            response_schema=schemas.CarbonIntensityRange,
+            signature=_past_range,
+            doc="""This endpoint retrieves a past marginal carbon intensity (in gCO2eq/kWh) of an area within a given date range.
 
             The resolution is 60 minutes. The time range is limited to 10 days. The delay with the latest available data is
             between 1 and 2 months.
@@ -236,25 +428,23 @@ class Api:
                 start: The start datetime for which to get data.
                 end: The end datetime for which to get data (excluded).
                 disable_estimations (optional): Whether estimated data should be disabled.
-            """
-            request = snug.Request(
-                "GET", f"{_API_PREFIX}/v3/marginal-carbon-intensity/past-range"
-            )
-
-            params = _geolocation_to_params(geolocation)
-            params.update(start=_as_utc_isoformat(start), end=_as_utc_isoformat(end))
-            if disable_estimations is not None:
-                params.update(disableEstimations=disable_estimations)
-
-            return (yield request.with_params(params))
-
-    class power_breakdown:
-        @staticmethod
-        @rest_query(response_schema=schemas.PowerBreakdown)
-        def get_latest(
-            geolocation: Geolocation, disable_estimations: bool | None = None
-        ) -> Query[snug.Response]:
-            """This endpoint retrieves the last known data about the origin of electricity in an area.
+            """,
+        )
+
+        get_past_many = get_past.many
+        get_past_range_many = get_past_range.many
+        iter_past_range = functools.partial(iter_past_range, get_past_range)
+        aiter_past_range = functools.partial(aiter_past_range, get_past_range)
+        lookup_past = functools.partial(lookup_past, get_past_range)
+
+    class power_breakdown(_Routes):
+        get_latest = Endpoint(
+            "/v3/power-breakdown/latest",
+            response_schema=schemas.PowerBreakdown,
+            signature=_latest,
+            cache_policy=LIVE_CACHE_POLICY,
+            deduplicator=Deduplicator(),
+            doc="""This endpoint retrieves the last known data about the origin of electricity in an area.
 
             "powerProduction" (in MW) represents the electricity produced in the zone, broken down by production type
             "powerConsumption" (in MW) represents the electricity consumed in the zone, after taking into account imports and exports, and broken down by production type.
@@ -264,21 +454,16 @@ class Api:
             Args:
                 geolocation: The geolocation for which to get data.
                 disable_estimations (optional): Whether estimated data should be disabled.
-            """
-            request = snug.Request("GET", f"{_API_PREFIX}/v3/power-breakdown/latest")
-
-            params = _geolocation_to_params(geolocation)
-            if disable_estimations is not None:
-                params.update(disableEstimations=disable_estimations)
-
-            return (yield request.with_params(params))
-
-        @staticmethod
-        @rest_query(response_schema=schemas.PowerBreakdownHistory)
-        def get_history(
-            geolocation: Geolocation, disable_estimations: bool | None = None
-        ) -> Query[snug.Response]:
-            """This endpoint retrieves the last 24 hours of power consumption and production breakdown of an area,
+            """,
+        )
+
+        get_history = Endpoint(
+            "/v3/power-breakdown/history",
+            response_schema=schemas.PowerBreakdownHistory,
+            signature=_latest,
+            cache_policy=LIVE_CACHE_POLICY,
+            deduplicator=Deduplicator(),
+            doc="""This endpoint retrieves the last 24 hours of power consumption and production breakdown of an area,
             which represents the physical origin of electricity broken down by production type.
 
             The resolution is 60 minutes.
@@ -286,24 +471,15 @@ class Api:
             Args:
                 geolocation: The geolocation for which to get data.
                 disable_estimations (optional): Whether estimated data should be disabled.
-            """
-            request = snug.Request("GET", f"{_API_PREFIX}/v3/power-breakdown/history")
-
-            params = _geolocation_to_params(geolocation)
-            if disable_estimations is not None:
-                params.update(disableEstimations=disable_estimations)
-
-            return (yield request.with_params(params))
+            """,
+        )
 
         # TODO(avianello): requires commercial auth
-        @staticmethod
-        @rest_query(response_schema=schemas.PowerBreakdown)
-        def get_past(
-            geolocation: Geolocation,
-            date_time: datetime,
-            disable_estimations: bool | None = None,
-        ) -> Query[snug.Response]:
-            """This endpoint retrieves a past power breakdown of an area.
+        get_past = Endpoint(
+            "/v3/power-breakdown/past",
+            response_schema=schemas.PowerBreakdown,
+            signature=_past,
+            doc="""This endpoint retrieves a past power breakdown of an area.
 
             The resolution is 60 minutes.
 
@@ -311,26 +487,15 @@ class Api:
                 geolocation: The geolocation for which to get data.
                 date_time: The datetime for which to get data.
                 disable_estimations (optional): Whether estimated data should be disabled.
-            """
-            request = snug.Request("GET", f"{_API_PREFIX}/v3/power-breakdown/past")
-
-            params = _geolocation_to_params(geolocation)
-            params.update(datetime=_as_utc_isoformat(date_time))
-            if disable_estimations is not None:
-                params.update(disableEstimations=disable_estimations)
-
-            return (yield request.with_params(params))
+            """,
+        )
 
         # TODO(avianello): requires commercial auth
-        @staticmethod
-        @rest_query(response_schema=schemas.PowerBreakdownRange)
-        def get_past_range(
-            geolocation: Geolocation,
-            start: datetime,
-            end: datetime,
-            disable_estimations: bool | None = None,
-        ) -> Query[snug.Response]:
-            """This endpoint retrieves a past power breakdown of an area within a given date range.
+        get_past_range = Endpoint(
+            "/v3/power-breakdown/past-range",
+            response_schema=schemas.PowerBreakdownRange,
+            signature=_past_range,
+            doc="""This endpoint retrieves a past power breakdown of an area within a given date range.
 
             The resolution is 60 minutes. The time range is limited to 10 days.
 
@@ -339,23 +504,16 @@ class Api:
                 start: The start datetime for which to get data.
                 end: The end datetime for which to get data (excluded).
                 disable_estimations (optional): Whether estimated data should be disabled.
-            """
-            request = snug.Request(
-                "GET", f"{_API_PREFIX}/v3/power-breakdown/past-range"
-            )
-
-            params = _geolocation_to_params(geolocation)
-            params.update(start=_as_utc_isoformat(start), end=_as_utc_isoformat(end))
-            if disable_estimations is not None:
-                params.update(disableEstimations=disable_estimations)
-
-            return (yield request.with_params(params))
+            """,
+        )
 
         # TODO(avianello): requires commercial auth
-        @staticmethod
-        @rest_query(response_schema=schemas.PowerBreakdownForecast)
-        def get_forecast(geolocation: Geolocation) -> Query[snug.Response]:
-            """This endpoint retrieves the most recent forecasted data about the origin of electricity in an area.
+        get_forecast = Endpoint(
+            "/v3/power-breakdown/forecast",
+            response_schema=schemas.PowerBreakdownForecast,
+            signature=_geolocation,
+            cache_policy=LIVE_CACHE_POLICY,
+            doc="""This endpoint retrieves the most recent forecasted data about the origin of electricity in an area.
 
             Note that for some zones, only the power production, or power consumption breakdown is available.
             Forecasts of imports and exports are unavailable at the moment.
@@ -366,19 +524,26 @@ class Api:
 
             Args:
                 geolocation: The geolocation for which to get data.
-            """
-            request = snug.Request("GET", f"{_API_PREFIX}/v3/power-breakdown/forecast")
-
-            params = _geolocation_to_params(geolocation)
-
-            return (yield request.with_params(params))
-
-    class power_production_breakdown:
+            """,
+        )
+
+        get_latest_many = get_latest.many
+        get_history_many = get_history.many
+        get_past_many = get_past.many
+        get_past_range_many = get_past_range.many
+        get_forecast_many = get_forecast.many
+        iter_past_range = functools.partial(iter_past_range, get_past_range)
+        aiter_past_range = functools.partial(aiter_past_range, get_past_range)
+        lookup_past = functools.partial(lookup_past, get_past_range)
+
+    class power_production_breakdown(_Routes):
         # TODO(avianello): requires commercial auth
-        @staticmethod
-        @rest_query(response_schema=schemas.PowerProductionBreakdownForecast)
-        def get_forecast(geolocation: Geolocation) -> Query[snug.Response]:
-            """This endpoint retrieves the forecasted power production breakdown of an area by production type.
+        get_forecast = Endpoint(
+            "/v3/power-production-breakdown/forecast",
+            response_schema=schemas.PowerProductionBreakdownForecast,
+            signature=_geolocation,
+            cache_policy=LIVE_CACHE_POLICY,
+            doc="""This endpoint retrieves the forecasted power production breakdown of an area by production type.
 
             The endpoint returns 24 hours of forecasts. The forecasts span from horizon 0, which is the start of the current
             hour, to horizon 23. Ex: if the date and time is currently 2024-03-02 13:12:39 GMT, then the forecasts will cover
@@ -386,21 +551,19 @@ class Api:
 
             Args:
                 geolocation: The geolocation for which to get data.
-            """
-            request = snug.Request(
-                "GET", f"{_API_PREFIX}/v3/power-production-breakdown/forecast"
-            )
+            """,
+        )
 
-            params = _geolocation_to_params(geolocation)
+        get_forecast_many = get_forecast.many
 
-            return (yield request.with_params(params))
-
-    class power_consumption_breakdown:
+    class power_consumption_breakdown(_Routes):
         # TODO(avianello): requires commercial auth
-        @staticmethod
-        @rest_query(response_schema=schemas.PowerConsumptionBreakdownForecast)
-        def get_forecast(geolocation: Geolocation) -> Query[snug.Response]:
-            """This endpoint retrieves the forecasted power consumption breakdown of an area, which represents the physical
+        get_forecast = Endpoint(
+            "/v3/power-consumption-breakdown/forecast",
+            response_schema=schemas.PowerConsumptionBreakdownForecast,
+            signature=_geolocation,
+            cache_policy=LIVE_CACHE_POLICY,
+            doc="""This endpoint retrieves the forecasted power consumption breakdown of an area, which represents the physical
             origin of electricity broken down by production type.
 
             The endpoint returns 24 hours of forecasts. The forecasts span from horizon 0, which is the start of the current
@@ -409,28 +572,17 @@ class Api:
 
             Args:
                 geolocation: The geolocation for which to get data.
-            """
-            request = snug.Request(
-                "GET", f"{_API_PREFIX}/v3/power-consumption-breakdown/forecast"
-            )
+            """,
+        )
 
-            params = _geolocation_to_params(geolocation)
-
-            return (yield request.with_params(params))
+        get_forecast_many = get_forecast.many
 
     # TODO(avianello): requires commercial auth
-    @staticmethod
-    @rest_query(response_schema=schemas.Updates)
-    def get_updated_since(
-        geolocation: Geolocation,
-        since: datetime,
-        start: datetime | None = None,
-        end: datetime | None = None,
-        limit: int | None = None,
-        threshold: str | None = None,
-        disable_estimations: bool | None = None,
-    ) -> Query[snug.Response]:
-        """This endpoint returns a list of timestamps where data has been updated since a specified date for a specified zone.
+    get_updated_since = Endpoint(
+        "/v3/updated-since",
+        response_schema=schemas.Updates,
+        signature=_updated_since,
+        doc="""This endpoint returns a list of timestamps where data has been updated since a specified date for a specified zone.
 
         Access to this endpoint is only authorized if the token has access to one or more 'past' endpoints.
 
@@ -443,20 +595,42 @@ class Api:
             threshold (optional): A duration in ISO 8601 format by which to filter entries to include only those where the
                 difference between their timestamp and 'updated_at' is higher than 'threshold'. For example 'P1D'.
             disable_estimations (optional): Whether estimated data should be disabled.
+        """,
+    )
+
+    get_updated_since_many = get_updated_since.many
+    iter_updated_since = functools.partial(iter_updated_since, get_updated_since)
+    aiter_updated_since = functools.partial(aiter_updated_since, get_updated_since)
+
+    @staticmethod
+    def get_zone_snapshot(
+        geolocation: Geolocation, *, partial: bool = True
+    ) -> Query[schemas.ZoneSnapshot]:
+        """Retrieves the latest carbon intensity and power breakdown of an area, together with their forecasts.
+
+        All the underlying endpoints are queried concurrently (sharing the client the query is executed with), so
+        that the snapshot costs a single round trip of latency.
+
+        Args:
+            geolocation: The geolocation for which to get data.
+            partial (optional): Whether to allow snapshots without forecasts (`None`) if the token does not have access
+                to the commercial forecast routes, rather than raising.
         """
-        request = snug.Request("GET", f"{_API_PREFIX}/v3/updated-since")
-
-        params = _geolocation_to_params(geolocation)
-        params.update(since=_as_utc_isoformat(since))
-        if start is not None:
-            params.update(start=_as_utc_isoformat(start))
-        if end is not None:
-            params.update(end=_as_utc_isoformat(end))
-        if limit is not None:
-            params.update(limit=limit)
-        if threshold is not None:
-            params.update(threshold=threshold)
-        if disable_estimations is not None:
-            params.update(disableEstimations=disable_estimations)
-
-        return (yield request.with_params(params))
+        queries: dict[str, Query[Any]] = {
+            "carbon_intensity": Api.carbon_intensity.get_latest(geolocation),
+            "power_breakdown": Api.power_breakdown.get_latest(geolocation),
+            "carbon_intensity_forecast": Api.carbon_intensity.get_forecast(geolocation),
+            "power_breakdown_forecast": Api.power_breakdown.get_forecast(geolocation),
+        }
+        if partial:
+            for name in ("carbon_intensity_forecast", "power_breakdown_forecast"):
+                queries[name] = OrNone(
+                    queries[name], errors=(UnauthorisedError, ForbiddenError)
+                )
+
+        return Mapped(
+            Batch(queries, max_concurrency=len(queries)),
+            lambda results: schemas.ZoneSnapshot(
+                zone=results["carbon_intensity"].zone, **results
+            ),
+        )
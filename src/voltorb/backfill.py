@@ -0,0 +1,374 @@
+"""Resumable backfills of the range endpoints, for many zones over many years.
+
+A backfill is planned as API sized (zone, window) tasks, which are run in batches across a pool of processes (so that
+deserialisation is not bound to a single CPU), each running the tasks of its batch concurrently. The records of each
+task are written to their own file, and the task is then reported back as soon as it completes (rather than with its
+batch), to be recorded in a durable checkpoint, so that a backfill restarted after a crash resumes exactly where it
+stopped.
+"""
+
+import asyncio
+import contextlib
+import json
+import multiprocessing
+import os
+import queue
+from collections.abc import AsyncIterator, Callable, Iterator, Sequence
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from datetime import datetime
+from pathlib import Path
+from typing import IO, Any
+
+from attrs import define, field, frozen
+
+from voltorb._helpers import optional_import
+from voltorb._patches import async_executor
+from voltorb.auth import token_auth
+from voltorb.clients import RedirectingClient
+from voltorb.export import DATASETS, write
+from voltorb.streaming import MAX_WINDOW, windows
+from voltorb.typing import ZoneKey
+
+httpx = optional_import("httpx")
+
+DEFAULT_CONCURRENCY = 8
+DEFAULT_BATCH_SIZE = 32
+
+_POLL_INTERVAL = (
+    0.1  # seconds, between checks of the batches in flight while waiting for results
+)
+
+
+@frozen
+class BackfillTask:
+    """A query of a backfill, for a single zone and (API sized) window.
+
+    Args:
+        dataset: The name of the dataset (see :data:`voltorb.export.DATASETS`).
+        zone: The zone to query.
+        start: The start of the window.
+        end: The end of the window (excluded).
+    """
+
+    dataset: str
+    zone: ZoneKey
+    start: datetime
+    end: datetime
+
+    @property
+    def key(self) -> str:
+        """The unique key of the task, as recorded in checkpoints."""
+        return f"{self.dataset}/{self.zone}/{self.start.isoformat()}/{self.end.isoformat()}"
+
+    def path(self, output: Path, fmt: str) -> Path:
+        """The file the records of the task are written to."""
+        name = f"{self.start:%Y%m%dT%H%M%S}_{self.end:%Y%m%dT%H%M%S}.{fmt}"
+        return output / self.dataset / self.zone / name
+
+
+def plan(
+    dataset: str, zones: Sequence[ZoneKey], start: datetime, end: datetime
+) -> list[BackfillTask]:
+    """Plans the (API sized) tasks of a backfill, zone by zone and in chronological order.
+
+    Raises:
+        ValueError: on unknown datasets.
+    """
+    if dataset not in DATASETS:
+        msg = f"Unknown dataset {dataset!r}, expected one of {sorted(DATASETS)}"
+        raise ValueError(msg)
+    return [
+        BackfillTask(dataset, zone, *window)
+        for zone in zones
+        for window in windows(start, end, MAX_WINDOW)
+    ]
+
+
+class Checkpoint:
+    """A durable, append-only record of the completed tasks of a backfill.
+
+    Each completed task is appended (and synced to disk) as a JSON line, so that at most the task being recorded is
+    lost on a crash. A torn last line (e.g. on power loss) is ignored, and its task simply run again.
+
+    Args:
+        path: The path of the checkpoint file (created if it doesn't exist).
+    """
+
+    def __init__(self, path: str | os.PathLike[str]) -> None:
+        self.path = Path(path)
+        self.completed: set[str] = set()
+        if self.path.exists():
+            for line in self.path.read_text().splitlines():
+                with contextlib.suppress(json.JSONDecodeError, KeyError, TypeError):
+                    self.completed.add(json.loads(line)["task"])
+        self._file: IO[str] | None = None
+
+    def __contains__(self, task: object) -> bool:
+        return isinstance(task, BackfillTask) and task.key in self.completed
+
+    def __len__(self) -> int:
+        return len(self.completed)
+
+    def record(self, task: BackfillTask, records: int) -> None:
+        """Records a task as completed."""
+        if self._file is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._file = self.path.open("a+", encoding="utf-8")
+            self._file.seek(0, os.SEEK_END)
+            if self._file.tell():
+                # start on a new line, in case the last one was torn
+                self._file.seek(self._file.tell() - 1)
+                torn = self._file.read(1) != "\n"
+                self._file.seek(0, os.SEEK_END)
+                if torn:
+                    self._file.write("\n")
+        self._file.write(json.dumps({"task": task.key, "records": records}) + "\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self.completed.add(task.key)
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self) -> "Checkpoint":
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+
+@frozen
+class TaskResult:
+    """The outcome of a task.
+
+    Args:
+        task: The task.
+        records: The number of records written.
+        error: The error the task failed with, if any.
+    """
+
+    task: BackfillTask
+    records: int = 0
+    error: str | None = None
+
+
+@frozen
+class _Settings:
+    """The (picklable) settings of the workers."""
+
+    output: Path
+    fmt: str
+    concurrency: int
+    token: str | None
+    url: str | None
+    params: dict[str, Any]
+
+
+@contextlib.asynccontextmanager
+async def _client(settings: _Settings) -> AsyncIterator[Any]:
+    async with contextlib.AsyncExitStack() as stack:
+        client = None
+        if httpx is not None:
+            limits = httpx.Limits(max_connections=settings.concurrency)
+            client = await stack.enter_async_context(httpx.AsyncClient(limits=limits))
+        yield (
+            client if settings.url is None else RedirectingClient(settings.url, client)
+        )
+
+
+def _write(task: BackfillTask, records: Sequence[Any], settings: _Settings) -> int:
+    # atomically, so that files of completed tasks are never torn
+    path = task.path(settings.output, settings.fmt)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    count = write(task.dataset, task.zone, records, tmp_path, fmt=settings.fmt)
+    tmp_path.replace(path)
+    return count
+
+
+async def _run_batch_async(
+    tasks: Sequence[BackfillTask],
+    settings: _Settings,
+    report: Callable[[TaskResult], None],
+) -> None:
+    semaphore = asyncio.Semaphore(settings.concurrency)
+    auth = None if settings.token is None else token_auth(settings.token)
+
+    async with _client(settings) as client:
+        execute = async_executor(auth=auth, client=client)
+
+        async def run(task: BackfillTask) -> None:
+            endpoint = DATASETS[task.dataset]
+            try:
+                async with semaphore:
+                    result = await execute(
+                        endpoint(task.zone, task.start, task.end, **settings.params)
+                    )
+                outcome = TaskResult(task, _write(task, result.data, settings))
+            except Exception as e:  # noqa: BLE001
+                outcome = TaskResult(task, error=f"{type(e).__name__}: {e}")
+            report(outcome)
+
+        await asyncio.gather(*(run(task) for task in tasks))
+
+
+def _run_batch(
+    tasks: Sequence[BackfillTask],
+    settings: _Settings,
+    report: Callable[[TaskResult], None],
+) -> None:
+    """Runs a batch of tasks concurrently (e.g. in a worker process), reporting the result of each as it completes."""
+    asyncio.run(_run_batch_async(tasks, settings, report))
+
+
+@define
+class BackfillProgress:
+    """The progress of a backfill.
+
+    Args:
+        total: The number of tasks of the backfill.
+        skipped: The number of tasks already completed by previous runs.
+        completed: The number of tasks completed by this run.
+        records: The number of records written by this run.
+        failed: The errors of the tasks which failed in this run, by task key (to be retried by the next run).
+    """
+
+    total: int
+    skipped: int = 0
+    completed: int = 0
+    records: int = 0
+    failed: dict[str, str] = field(factory=dict)
+
+    @property
+    def done(self) -> bool:
+        """Whether all the tasks of the backfill are completed."""
+        return self.skipped + self.completed == self.total
+
+
+def _batches(
+    tasks: Sequence[BackfillTask], size: int
+) -> Iterator[Sequence[BackfillTask]]:
+    for i in range(0, len(tasks), size):
+        yield tasks[i : i + size]
+
+
+def _collect_completed(
+    in_flight: set[Future[None]],
+    results: "queue.Queue[TaskResult]",
+    collect: Callable[[TaskResult], None],
+) -> set[Future[None]]:
+    """Collects the results of the tasks completed while briefly waiting for the batches in flight.
+
+    The errors of batches which failed (e.g. on a crashed worker) are raised once the results of all the tasks completed
+    so far are collected.
+
+    Returns:
+        The batches still in flight.
+    """
+    done, in_flight = wait(
+        in_flight, timeout=_POLL_INTERVAL, return_when=FIRST_COMPLETED
+    )
+    with contextlib.suppress(queue.Empty):
+        while True:
+            collect(results.get_nowait())
+    for future in done:
+        future.result()
+    return in_flight
+
+
+def _run_pool(
+    tasks: Sequence[BackfillTask],
+    settings: _Settings,
+    workers: int,
+    batch_size: int,
+    collect: Callable[[TaskResult], None],
+) -> None:
+    """Runs batches of tasks across a pool of worker processes, collecting the result of each task as it completes."""
+    if workers == 0:
+        for batch in _batches(tasks, batch_size):
+            _run_batch(batch, settings, collect)
+        return
+
+    context = multiprocessing.get_context("spawn")
+    with (
+        context.Manager() as manager,
+        ProcessPoolExecutor(workers, mp_context=context) as pool,
+    ):
+        # managed, so that the results of a batch are all put by the time it completes
+        results: queue.Queue[TaskResult] = manager.Queue()
+        in_flight: set[Future[None]] = set()
+        try:
+            for batch in _batches(tasks, batch_size):
+                in_flight.add(pool.submit(_run_batch, batch, settings, results.put))
+                # only a couple of batches per worker are queued at a time, so that a crash loses little work
+                while len(in_flight) >= 2 * workers:
+                    in_flight = _collect_completed(in_flight, results, collect)
+            while in_flight:
+                in_flight = _collect_completed(in_flight, results, collect)
+        finally:
+            for future in in_flight:
+                future.cancel()
+
+
+def backfill(  # noqa: PLR0913
+    tasks: Sequence[BackfillTask],
+    output: str | os.PathLike[str],
+    *,
+    checkpoint: Checkpoint,
+    fmt: str = "ndjson",
+    processes: int | None = None,
+    concurrency: int = DEFAULT_CONCURRENCY,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    token: str | None = None,
+    url: str | None = None,
+    progress: Callable[[BackfillProgress], None] | None = None,
+    **kwargs: Any,
+) -> BackfillProgress:
+    """Runs the tasks of a backfill which are not completed yet, recording each task in the checkpoint as it completes.
+
+    Tasks failing (e.g. on persistent API errors) are reported, but don't abort the backfill: they are retried by the
+    next run with the same checkpoint.
+
+    Examples:
+        >>> tasks = plan("carbon-intensity", ["IT", "FR"], datetime(2019, 1, 1), datetime(2024, 1, 1))
+        >>> with Checkpoint("backfill/checkpoint.jsonl") as checkpoint:  # doctest: +SKIP
+        ...     backfill(tasks, "backfill", checkpoint=checkpoint, token="...")
+
+    Args:
+        tasks: The tasks of the backfill (see :func:`plan`).
+        output: The directory to write the records of the tasks to, one file per task.
+        checkpoint: The checkpoint of the backfill.
+        fmt (optional): The format of the files (see :func:`voltorb.export.export`).
+        processes (optional): The number of worker processes. Defaults to the number of CPUs, 0 runs all tasks in
+            this process.
+        concurrency (optional): The maximum number of queries in flight in each process.
+        batch_size (optional): The number of tasks sent to a worker process at a time.
+        token (optional): The API token.
+        url (optional): The base URL of the API (e.g. of a proxy).
+        progress (optional): A callback notified of the progress of the backfill, upfront and after each task.
+        **kwargs: The other arguments of the endpoint (e.g. `disable_estimations`).
+
+    Returns:
+        The final progress of the backfill.
+    """
+    pending = [task for task in tasks if task not in checkpoint]
+    state = BackfillProgress(total=len(tasks), skipped=len(tasks) - len(pending))
+    settings = _Settings(Path(output), fmt, concurrency, token, url, kwargs)
+
+    def collect(result: TaskResult) -> None:
+        if result.error is None:
+            checkpoint.record(result.task, result.records)
+            state.completed += 1
+            state.records += result.records
+        else:
+            state.failed[result.task.key] = result.error
+        if progress is not None:
+            progress(state)
+
+    if progress is not None:
+        progress(state)
+    workers = (os.cpu_count() or 1) if processes is None else processes
+    _run_pool(pending, settings, workers, batch_size, collect)
+    return state
@@ -0,0 +1,189 @@
+"""Combinators for composing queries, and executing batches of them concurrently.
+
+The combinators preserve the custom execution logic of the queries they wrap (e.g. the concurrent execution of a
+:class:`Batch`), whichever executor they are executed with.
+"""
+
+import asyncio
+from collections.abc import Callable, Generator, Hashable, Iterable, Mapping
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Generic, TypeVar
+
+import snug
+
+from voltorb._patches import Query, iterate
+
+K = TypeVar("K", bound=Hashable)
+T = TypeVar("T")
+R = TypeVar("R")
+
+DEFAULT_MAX_CONCURRENCY = 8
+
+
+def _first_requests(queries: Iterable[Query[Any]]) -> list[snug.Request]:
+    """The first request of each query, without sending them."""
+    requests = []
+    for query in queries:
+        generator = iterate(query)
+        try:
+            requests.append(next(generator))
+        except StopIteration:  # pragma: no cover
+            pass
+        finally:
+            generator.close()
+    return requests
+
+
+class Batch(snug.Query[dict[K, T]], Generic[K, T]):  # type: ignore[misc]
+    """A query executing a mapping of queries concurrently, and returning their results under the same keys.
+
+    The batch plugs into whichever executor is in use: sync executors (e.g. :func:`voltorb.execute`) fan the queries
+    out over a pool of threads, and async executors (e.g. :func:`voltorb.execute_async`) over concurrent tasks, all
+    sharing the same client and authentication method.
+
+    Examples:
+        >>> from voltorb import electricity_maps
+        >>> query = Batch({zone: electricity_maps.carbon_intensity.get_latest(zone) for zone in ["IT", "FR"]})
+
+    Args:
+        queries: The queries to execute, by key.
+        max_concurrency (optional): The maximum number of queries in flight at any time.
+    """
+
+    __slots__ = ("queries", "max_concurrency")
+
+    def __init__(
+        self,
+        queries: Mapping[K, Query[T]],
+        *,
+        max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+    ) -> None:
+        if max_concurrency < 1:
+            msg = f"max_concurrency must be a positive integer, got {max_concurrency!r}"
+            raise ValueError(msg)
+
+        self.queries = dict(queries)
+        self.max_concurrency = max_concurrency
+
+    def __iter__(self) -> Generator[snug.Request, snug.Response, dict[K, T]]:
+        # executors driving the query through the plain generator protocol can only resolve it sequentially
+        results: dict[K, T] = {}
+        for key, query in self.queries.items():
+            results[key] = yield from iterate(query)
+        return results
+
+    def __execute__(self, client: Any, auth: Any) -> dict[K, T]:
+        if not self.queries:
+            return {}
+
+        # e.g. so that caching clients look up all the queries in a single round trip
+        prefetch = getattr(client, "prefetch", None)
+        if prefetch is not None:
+            prefetch(_first_requests(self.queries.values()))
+
+        max_workers = min(self.max_concurrency, len(self.queries))
+        pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="voltorb")
+        try:
+            futures = {
+                key: pool.submit(snug.execute, query, auth=auth, client=client)
+                for key, query in self.queries.items()
+            }
+            return {key: future.result() for key, future in futures.items()}
+        finally:
+            # fail fast: don't wait on queries which have not been started yet
+            pool.shutdown(cancel_futures=True)
+
+    async def __execute_async__(self, client: Any, auth: Any) -> dict[K, T]:
+        prefetch = getattr(client, "prefetch", None)
+        if prefetch is not None and self.queries:
+            await asyncio.to_thread(prefetch, _first_requests(self.queries.values()))
+
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def execute_bounded(query: Query[T]) -> T:
+            async with semaphore:
+                return await snug.execute_async(query, auth=auth, client=client)  # type: ignore[no-any-return]
+
+        tasks = [
+            asyncio.ensure_future(execute_bounded(query))
+            for query in self.queries.values()
+        ]
+        try:
+            results = await asyncio.gather(*tasks)
+        except BaseException:
+            # fail fast: don't leave the other queries running in the background
+            for task in tasks:
+                task.cancel()
+            raise
+
+        return dict(zip(self.queries, results, strict=True))
+
+    def __repr__(self) -> str:
+        return f"Batch({list(self.queries)!r}, max_concurrency={self.max_concurrency})"
+
+
+class Mapped(snug.Query[R], Generic[T, R]):  # type: ignore[misc]
+    """A query mapping a function over the result of another query.
+
+    Args:
+        query: The query whose result to map.
+        func: The function to apply to the result of the query.
+    """
+
+    __slots__ = ("query", "func")
+
+    def __init__(self, query: Query[T], func: Callable[[T], R]) -> None:
+        self.query = query
+        self.func = func
+
+    def __iter__(self) -> Generator[snug.Request, snug.Response, R]:
+        return self.func((yield from iterate(self.query)))
+
+    def __execute__(self, client: Any, auth: Any) -> R:
+        return self.func(snug.execute(self.query, auth=auth, client=client))
+
+    async def __execute_async__(self, client: Any, auth: Any) -> R:
+        return self.func(await snug.execute_async(self.query, auth=auth, client=client))
+
+    def __repr__(self) -> str:
+        return f"Mapped({self.query!r}, {self.func!r})"
+
+
+class OrNone(snug.Query[T | None], Generic[T]):  # type: ignore[misc]
+    """A query returning `None` instead of raising the given errors.
+
+    Args:
+        query: The query to execute.
+        errors: The errors on which to return `None`.
+    """
+
+    __slots__ = ("query", "errors")
+
+    def __init__(
+        self,
+        query: Query[T],
+        errors: type[Exception] | tuple[type[Exception], ...],
+    ) -> None:
+        self.query = query
+        self.errors = errors
+
+    def __iter__(self) -> Generator[snug.Request, snug.Response, T | None]:
+        try:
+            return (yield from iterate(self.query))
+        except self.errors:
+            return None
+
+    def __execute__(self, client: Any, auth: Any) -> T | None:
+        try:
+            return snug.execute(self.query, auth=auth, client=client)  # type: ignore[no-any-return]
+        except self.errors:
+            return None
+
+    async def __execute_async__(self, client: Any, auth: Any) -> T | None:
+        try:
+            return await snug.execute_async(self.query, auth=auth, client=client)  # type: ignore[no-any-return]
+        except self.errors:
+            return None
+
+    def __repr__(self) -> str:
+        return f"OrNone({self.query!r}, {self.errors!r})"
@@ -0,0 +1,198 @@
+"""Compact binary serialisation of the schemas, e.g. to cache, send between processes or persist structured results.
+
+Values are packed with msgpack as positional arrays (i.e. without field names), with datetimes as integer
+microseconds since the epoch and enums as their values. Unpacking builds the schemas directly from these arrays,
+through codecs generated once per type, so that it skips the JSON parsing and validation of
+:func:`voltorb.serde.converter.structure` altogether.
+
+Each payload carries the version of the format and a fingerprint of the (recursive) fields of its type, so that
+payloads packed by other versions of the schemas are rejected rather than silently misread.
+"""
+
+import functools
+import typing
+import zlib
+from collections.abc import Callable
+from datetime import datetime, timedelta, timezone
+from enum import Enum
+from types import UnionType
+from typing import Any, TypeVar
+
+import attrs
+
+from voltorb._helpers import optional_import
+
+msgpack: Any = optional_import("msgpack")  # typed loosely, as msgpack is optional
+
+T = TypeVar("T")
+
+VERSION = 1
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+_MICROSECOND = timedelta(microseconds=1)
+
+_Codec = tuple[Callable[[Any], Any], Callable[[Any], Any]]
+
+
+def _identity(value: Any) -> Any:
+    return value
+
+
+def _encode_datetime(dt: datetime) -> int:
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return (dt - _EPOCH) // _MICROSECOND
+
+
+def _decode_datetime(microseconds: int) -> datetime:
+    return _EPOCH + microseconds * _MICROSECOND
+
+
+def _optional_args(tp: Any) -> tuple[Any, ...] | None:
+    """The arguments of optional types (e.g. `int | None`), without `None`."""
+    if typing.get_origin(tp) in (typing.Union, UnionType):
+        return tuple(arg for arg in typing.get_args(tp) if arg is not type(None))
+    return None
+
+
+def _attrs_codec(cl: type) -> _Codec:
+    fields = attrs.fields(cl)
+    names = tuple(f.name for f in fields)
+    codecs = [_codec(f.type) for f in fields]
+    encoders = tuple(zip(names, (encode for encode, _ in codecs), strict=True))
+    decoders = tuple(decode for _, decode in codecs)
+
+    if all(decode is _identity for decode in decoders):
+
+        def decode(values: list[Any]) -> Any:
+            return cl(*values)
+
+    else:
+
+        def decode(values: list[Any]) -> Any:
+            return cl(*[d(v) for d, v in zip(decoders, values, strict=True)])
+
+    def encode(value: Any) -> list[Any]:
+        return [e(getattr(value, name)) for name, e in encoders]
+
+    return encode, decode
+
+
+@functools.cache
+def _codec(tp: Any) -> _Codec:  # noqa: C901, PLR0911
+    """The (encoding, decoding) functions of a type, between its values and msgpack compatible values."""
+    if tp in (str, int, float, bool, type(None), Any):
+        return _identity, _identity
+    if tp is datetime:
+        return _encode_datetime, _decode_datetime
+    if isinstance(tp, type) and issubclass(tp, Enum):
+        members = {member.value: member for member in tp}
+        return (lambda member: member.value), members.__getitem__
+    if attrs.has(tp):
+        return _attrs_codec(tp)
+
+    args = _optional_args(tp)
+    if args is not None:
+        (arg,) = args
+        encode, decode = _codec(arg)
+        if encode is decode is _identity:
+            return _identity, _identity
+        return (
+            lambda v: None if v is None else encode(v),
+            lambda v: None if v is None else decode(v),
+        )
+
+    origin, args = typing.get_origin(tp), typing.get_args(tp)
+    if origin is list:
+        encode, decode = _codec(args[0])
+        if encode is decode is _identity:
+            return _identity, _identity
+        return (
+            lambda values: [encode(v) for v in values],
+            lambda values: [decode(v) for v in values],
+        )
+    if origin is dict:
+        (encode_key, decode_key), (encode, decode) = map(_codec, args)
+        if encode_key is decode_key is encode is decode is _identity:
+            return _identity, _identity
+        return (
+            lambda values: {encode_key(k): encode(v) for k, v in values.items()},
+            lambda values: {decode_key(k): decode(v) for k, v in values.items()},
+        )
+
+    msg = f"Type {tp!r} is not supported"
+    raise TypeError(msg)
+
+
+def _describe(tp: Any) -> str:
+    if attrs.has(tp):
+        fields = ",".join(f"{f.name}:{_describe(f.type)}" for f in attrs.fields(tp))
+        return f"{tp.__qualname__}({fields})"
+    if isinstance(tp, type) and issubclass(tp, Enum):
+        return f"{tp.__qualname__}[{','.join(repr(m.value) for m in tp)}]"
+    if isinstance(tp, type):
+        return tp.__qualname__
+    origin, args = typing.get_origin(tp), typing.get_args(tp)
+    if origin in (typing.Union, UnionType):
+        origin = typing.Union
+    return (
+        f"{getattr(origin, '__qualname__', origin)}[{','.join(map(_describe, args))}]"
+    )
+
+
+@functools.cache
+def fingerprint(cl: Any) -> int:
+    """The fingerprint of the (recursive) fields of a type, which changes whenever its schema does."""
+    return zlib.crc32(_describe(cl).encode())
+
+
+def _require_msgpack() -> None:
+    if msgpack is None:
+        msg = "Binary serialisation requires the optional msgpack package (pip install voltorb[binary])"
+        raise ImportError(msg)
+
+
+def dumps(value: Any, cl: Any = None) -> bytes:
+    """Packs a value of a schema (or of a container of schemas, e.g. `dict[str, CarbonIntensity]`) into bytes.
+
+    Examples:
+        >>> from voltorb import schemas
+        >>> payload = dumps(schemas.Health(schemas.Health.MonitorHealth("ok"), "ok"))
+        >>> loads(payload, schemas.Health)
+        Health(monitors=Health.MonitorHealth(state='ok'), status='ok')
+
+    Args:
+        value: The value to pack.
+        cl (optional): The type of the value. Defaults to the type of the value (i.e. for schema instances).
+
+    Raises:
+        TypeError: on unsupported types.
+    """
+    _require_msgpack()
+    cl = type(value) if cl is None else cl
+    encode, _ = _codec(cl)
+    return typing.cast(bytes, msgpack.packb([VERSION, fingerprint(cl), encode(value)]))
+
+
+def loads(data: bytes, cl: type[T]) -> T:
+    """Unpacks a value packed by :func:`dumps`.
+
+    Args:
+        data: The packed value.
+        cl: The type of the value.
+
+    Raises:
+        ValueError: on payloads which are not packed values of the type (e.g. packed by another version of its schema).
+    """
+    _require_msgpack()
+    tp: Any = cl  # e.g. aliases, which are not all types
+    _, decode = _codec(tp)
+    try:
+        version, packed_fingerprint, body = msgpack.unpackb(data)
+    except (ValueError, TypeError) as e:
+        msg = "Not a packed value"
+        raise ValueError(msg) from e
+    if version != VERSION or packed_fingerprint != fingerprint(tp):
+        msg = f"Not a version {VERSION} packed value of {cl!r} (mismatched schema)"
+        raise ValueError(msg)
+    return typing.cast(T, decode(body))
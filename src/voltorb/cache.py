@@ -0,0 +1,510 @@
+"""Caching of API responses, in process or shared by a fleet of nodes through a Redis server.
+
+A :class:`CachingClient` stores the successful responses of the API in a :class:`CacheBackend`, for as long as their
+data is fresh (see :func:`cadence_ttl`), so that every node sharing the backend pays for a single request per endpoint,
+zone and parameters. Past their freshness, responses may still be served according to the
+:class:`~voltorb.api.CachePolicy` of their endpoint: while revalidated in the background, or by offline clients.
+
+* :class:`MemoryBackend` keeps responses in process.
+* :class:`RedisBackend` keeps responses in a Redis (protocol compatible) server, over a pool of connections, looking
+  up the requests of batches (see :class:`voltorb.Batch`) in a single pipelined round trip.
+"""
+
+import asyncio
+import contextlib
+import logging
+import socket
+import struct
+import threading
+import time
+import urllib.parse
+import zlib
+from collections import Counter, OrderedDict
+from collections.abc import Callable, Iterable, Iterator, Mapping, Sequence
+from datetime import datetime, timedelta, timezone
+from typing import IO, Any, Protocol
+
+import snug
+from attrs import frozen
+
+from voltorb.api import DEFAULT_CACHE_POLICY, ENDPOINTS, CachePolicy
+from voltorb.clients import ClientWrapper
+from voltorb.exceptions import CacheError, OfflineError
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PREFIX = "voltorb:"
+DEFAULT_MAX_ENTRIES = 10_000
+DEFAULT_POOL_SIZE = 8
+DEFAULT_TIMEOUT = 1.0  # seconds
+DEFAULT_CHUNK_SIZE = 256  # keys per MGET
+
+MIN_TTL = 60.0  # seconds
+FINAL_AFTER = timedelta(days=2)
+"""How long after the fact records are considered final (i.e. not revised anymore)."""
+FINAL_TTL = 7 * 24 * 3600.0  # seconds
+ZONES_TTL = 24 * 3600.0  # seconds
+
+_FORMAT = b"\x02"  # the version of the format of the entries
+_FRESH_UNTIL = struct.Struct("<d")  # epoch seconds, following the format
+
+_NOT_PREFETCHED: Any = object()
+
+
+def _seconds_to_next_hour(now: datetime) -> float:
+    next_hour = now.replace(minute=0, second=0, microsecond=0) + timedelta(hours=1)
+    return max((next_hour - now).total_seconds(), MIN_TTL)
+
+
+def _parse_datetime(value: str) -> datetime:
+    return datetime.fromisoformat(value.replace("Z", "+00:00"))
+
+
+def cadence_ttl(request: snug.Request, now: datetime | None = None) -> float | None:
+    """How long the response to a request stays fresh, in seconds, derived from the cadence of its data.
+
+    * Hourly data (e.g. latest values, histories and forecasts) is fresh until the next hour.
+    * Past data which is final (i.e. older than :data:`FINAL_AFTER`) is fresh for :data:`FINAL_TTL`, and more recent
+      past data until the next hour, as it may still be revised.
+    * Zones are fresh for a day, while health checks are never cached.
+
+    Examples:
+        >>> request = snug.GET("https://api.electricitymap.org/v3/carbon-intensity/latest", params={"zone": "FR"})
+        >>> cadence_ttl(request, now=datetime(2024, 1, 1, 12, 45, tzinfo=timezone.utc))
+        900.0
+    """
+    now = now or datetime.now(timezone.utc)
+    path = urllib.parse.urlsplit(request.url).path
+    if path.endswith("/health"):
+        return None
+    if path.endswith("/zones"):
+        return ZONES_TTL
+    until = request.params.get("end") or request.params.get("datetime")
+    if until is not None and _parse_datetime(until) <= now - FINAL_AFTER:
+        return FINAL_TTL
+    return _seconds_to_next_hour(now)
+
+
+def endpoint_policy(request: snug.Request) -> CachePolicy:
+    """The cache policy of the endpoint of a request (see :class:`voltorb.api.Endpoint`), if any."""
+    endpoint = ENDPOINTS.get(urllib.parse.urlsplit(request.url).path)
+    return DEFAULT_CACHE_POLICY if endpoint is None else endpoint.cache_policy
+
+
+def _encode(content: bytes, fresh_until: float) -> bytes:
+    return _FORMAT + _FRESH_UNTIL.pack(fresh_until) + zlib.compress(content, 1)
+
+
+def _decode(entry: bytes) -> tuple[float, bytes] | None:
+    # entries of other (e.g. previous) formats are misses
+    if entry[:1] != _FORMAT:
+        return None
+    (fresh_until,) = _FRESH_UNTIL.unpack_from(entry, 1)
+    return fresh_until, zlib.decompress(entry[1 + _FRESH_UNTIL.size :])
+
+
+class CacheBackend(Protocol):
+    """The interface of the stores of cached responses, by key."""
+
+    def get_many(self, keys: Sequence[str]) -> list[bytes | None]:
+        """The entries of the given keys, if any (and not expired), in the same order."""
+        ...
+
+    def set(self, key: str, value: bytes, ttl: float) -> None:
+        """Stores an entry, expiring after `ttl` seconds."""
+        ...
+
+
+class MemoryBackend:
+    """An in process backend, evicting the least recently used entries when full.
+
+    Args:
+        max_entries (optional): The maximum number of entries.
+    """
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES) -> None:
+        self.max_entries = max_entries
+        self._entries: OrderedDict[str, tuple[float, bytes]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_many(self, keys: Sequence[str]) -> list[bytes | None]:
+        now = time.monotonic()
+        values: list[bytes | None] = []
+        with self._lock:
+            for key in keys:
+                entry = self._entries.get(key)
+                if entry is None or entry[0] <= now:
+                    self._entries.pop(key, None)
+                    values.append(None)
+                else:
+                    self._entries.move_to_end(key)
+                    values.append(entry[1])
+        return values
+
+    def set(self, key: str, value: bytes, ttl: float) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __repr__(self) -> str:
+        return f"MemoryBackend(max_entries={self.max_entries})"
+
+
+def _command(*args: str | bytes | int) -> bytes:
+    """Encodes a command in the Redis serialisation protocol (RESP)."""
+    parts = [b"*%d\r\n" % len(args)]
+    for arg in args:
+        value = arg if isinstance(arg, bytes) else str(arg).encode()
+        parts.append(b"$%d\r\n%s\r\n" % (len(value), value))
+    return b"".join(parts)
+
+
+def _reply(file: IO[bytes]) -> Any:
+    """Decodes a reply in the Redis serialisation protocol (RESP), returning (rather than raising) errors."""
+    line = file.readline()
+    if not line.endswith(b"\r\n"):
+        msg = "Connection closed by the Redis server"
+        raise ConnectionError(msg)
+    kind, value = line[:1], line[1:-2]
+    if kind == b"+":
+        return value.decode()
+    if kind == b"-":
+        return CacheError(value.decode())
+    if kind == b":":
+        return int(value)
+    if kind == b"$":
+        length = int(value)
+        return None if length < 0 else file.read(length + 2)[:-2]
+    if kind == b"*":
+        length = int(value)
+        return None if length < 0 else [_reply(file) for _ in range(length)]
+    msg = f"Unexpected reply from the Redis server: {line!r}"
+    raise CacheError(msg)
+
+
+class _Connection:
+    def __init__(self, url: urllib.parse.SplitResult, timeout: float) -> None:
+        self.socket = socket.create_connection(
+            (url.hostname or "localhost", url.port or 6379), timeout=timeout
+        )
+        self.socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.file = self.socket.makefile("rb")
+        setup: list[tuple[str, ...]] = []
+        if url.password:
+            setup.append(("AUTH", url.username or "default", url.password))
+        if url.path.strip("/") not in ("", "0"):
+            setup.append(("SELECT", url.path.strip("/")))
+        try:
+            errors = [e for e in self.pipeline(setup) if isinstance(e, CacheError)]
+        except OSError:
+            self.close()
+            raise
+        if errors:
+            self.close()
+            raise errors[0]
+
+    def pipeline(self, commands: Sequence[Sequence[str | bytes | int]]) -> list[Any]:
+        """Sends commands in a single write, then reads all their replies."""
+        if not commands:
+            return []
+        self.socket.sendall(b"".join(_command(*command) for command in commands))
+        return [_reply(self.file) for _ in commands]
+
+    def close(self) -> None:
+        self.file.close()
+        self.socket.close()
+
+
+class RedisBackend:
+    """A backend storing entries in a Redis (protocol compatible) server, shared by all the nodes using it.
+
+    Connections are pooled (and opened on demand), and many entries are read or written in pipelined round trips.
+
+    Examples:
+        >>> backend = RedisBackend("redis://cache.internal:6379/0", pool_size=16)
+
+    Args:
+        url (optional): The URL of the server, as ``redis://[[user]:password@]host[:port][/db]``.
+        pool_size (optional): The maximum number of connections to the server.
+        timeout (optional): The timeout of connections and replies, in seconds.
+        chunk_size (optional): The maximum number of keys read by each (pipelined) MGET command.
+    """
+
+    def __init__(
+        self,
+        url: str = "redis://localhost:6379/0",
+        *,
+        pool_size: int = DEFAULT_POOL_SIZE,
+        timeout: float = DEFAULT_TIMEOUT,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+    ) -> None:
+        if pool_size < 1:
+            msg = f"pool_size must be a positive integer, got {pool_size!r}"
+            raise ValueError(msg)
+
+        self.url = url
+        self.timeout = timeout
+        self.chunk_size = chunk_size
+        self._url = urllib.parse.urlsplit(url)
+        self._idle: list[_Connection] = []
+        self._slots = threading.BoundedSemaphore(pool_size)
+        self._lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def _connection(self) -> Iterator[_Connection]:
+        if not self._slots.acquire(timeout=self.timeout):
+            msg = f"No connection to {self.url!r} available"
+            raise CacheError(msg)
+        try:
+            with self._lock:
+                connection = self._idle.pop() if self._idle else None
+            try:
+                connection = connection or _Connection(self._url, self.timeout)
+                yield connection
+            except (OSError, CacheError) as e:
+                # the connection may be out of sync with the server, so is discarded
+                if connection is not None:
+                    connection.close()
+                if isinstance(e, CacheError):
+                    raise
+                msg = f"Failed to reach {self.url!r}: {e}"
+                raise CacheError(msg) from e
+            with self._lock:
+                self._idle.append(connection)
+        finally:
+            self._slots.release()
+
+    def pipeline(self, commands: Sequence[Sequence[str | bytes | int]]) -> list[Any]:
+        """Sends commands in a single round trip, returning their replies.
+
+        Raises:
+            CacheError: if the server is unreachable, or replies to any command with an error.
+        """
+        with self._connection() as connection:
+            replies = connection.pipeline(commands)
+        for reply in replies:
+            if isinstance(reply, CacheError):
+                raise reply
+        return replies
+
+    def get_many(self, keys: Sequence[str]) -> list[bytes | None]:
+        chunks = [
+            keys[i : i + self.chunk_size] for i in range(0, len(keys), self.chunk_size)
+        ]
+        replies = self.pipeline([("MGET", *chunk) for chunk in chunks])
+        return [value for reply in replies for value in reply]
+
+    def set(self, key: str, value: bytes, ttl: float) -> None:
+        self.pipeline([("SET", key, value, "PX", max(int(ttl * 1000), 1))])
+
+    def set_many(self, entries: Mapping[str, bytes], ttl: float) -> None:
+        """Stores many entries at once, expiring after `ttl` seconds."""
+        ttl_ms = max(int(ttl * 1000), 1)
+        self.pipeline([("SET", k, v, "PX", ttl_ms) for k, v in entries.items()])
+
+    def close(self) -> None:
+        """Closes the idle connections of the pool."""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for connection in idle:
+            connection.close()
+
+    def __enter__(self) -> "RedisBackend":
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+    def __repr__(self) -> str:
+        return f"RedisBackend({self.url!r})"
+
+
+@frozen
+class _Lookup:
+    key: str
+    ttl: float
+    policy: CachePolicy
+    response: snug.Response | None = None
+    stale: bool = False
+
+
+class CachingClient(ClientWrapper):
+    """A client wrapper answering GET requests from a cache backend, and caching the successful responses of the API.
+
+    Responses are cached by method, URL and parameters (but not headers, e.g. authentication), so that nodes with
+    different tokens share their entries. Backend failures are logged, and fall back on the API.
+
+    Past their freshness, responses are still served according to the cache policy of their endpoint (see
+    :class:`voltorb.api.CachePolicy`): immediately, while revalidated in the background (so that requests don't wait on
+    the API), or, when offline, without sending any request at all.
+
+    Examples:
+        >>> from voltorb import execute, electricity_maps
+        >>> client = CachingClient(RedisBackend("redis://cache.internal:6379/0"))
+        >>> execute(electricity_maps.carbon_intensity.get_latest("FR"), client=client)  # doctest: +SKIP
+
+    Args:
+        backend: The backend storing the responses.
+        client (optional): The wrapped client.
+        ttl (optional): How long the response to a request stays fresh, in seconds (`None` to not cache it).
+        prefix (optional): The prefix of the keys of the entries (e.g. to share a backend with other applications).
+        policy (optional): The cache policy of a request. Defaults to the policy of its endpoint.
+        offline (optional): Whether to only serve responses from the backend, raising :class:`OfflineError` otherwise.
+    """
+
+    def __init__(  # noqa: PLR0913
+        self,
+        backend: CacheBackend,
+        client: Any = None,
+        *,
+        ttl: Callable[[snug.Request], float | None] = cadence_ttl,
+        prefix: str = DEFAULT_PREFIX,
+        policy: Callable[[snug.Request], CachePolicy] = endpoint_policy,
+        offline: bool = False,
+    ) -> None:
+        super().__init__(client)
+        self.backend = backend
+        self.ttl = ttl
+        self.prefix = prefix
+        self.policy = policy
+        self.offline = offline
+        self.stats: Counter[str] = Counter()
+        """The number of cache hits (fresh or stale), misses, revalidations and backend errors."""
+        # entries looked up ahead of their requests (see :meth:`prefetch`), by key (`None` for misses)
+        self._prefetched: dict[str, bytes | None] = {}
+        # the keys being revalidated, and the tasks revalidating them in the background (when async)
+        self._revalidating: set[str] = set()
+        self._tasks: set[asyncio.Task[None]] = set()
+        self._lock = threading.Lock()
+
+    def _key(self, request: snug.Request) -> str:
+        query = urllib.parse.urlencode(sorted(request.params.items()))
+        return f"{self.prefix}{request.method} {request.url}?{query}"
+
+    def _get_many(self, keys: Sequence[str]) -> list[bytes | None]:
+        try:
+            return self.backend.get_many(keys)
+        except CacheError as e:
+            self.stats["errors"] += 1
+            logger.warning("Failed to look up cached responses: %s", e)
+            return [None] * len(keys)
+
+    def _lookup(self, request: snug.Request) -> _Lookup:
+        ttl = self.ttl(request) if request.method == "GET" else None
+        if ttl is None:
+            if self.offline:
+                msg = f"Offline, and responses to {request.url!r} are never cached"
+                raise OfflineError(msg)
+            return _Lookup("", 0.0, DEFAULT_CACHE_POLICY)
+        policy = self.policy(request)
+        key = self._key(request)
+        entry = self._prefetched.pop(key, _NOT_PREFETCHED)
+        if entry is _NOT_PREFETCHED:
+            entry = self._get_many([key])[0]
+        decoded = None if entry is None else _decode(entry)
+        if decoded is not None:
+            fresh_until, content = decoded
+            staleness = time.time() - fresh_until
+            headers = {"content-type": "application/json"}
+            if staleness < 0:
+                self.stats["hits"] += 1
+                return _Lookup(key, ttl, policy, snug.Response(200, content, headers))
+            if staleness <= (
+                policy.max_staleness if self.offline else policy.stale_while_revalidate
+            ):
+                self.stats["stale_hits"] += 1
+                response = snug.Response(200, content, headers)
+                return _Lookup(key, ttl, policy, response, stale=True)
+        self.stats["misses"] += 1
+        if self.offline:
+            msg = f"Offline, and no response to {request.url!r} is cached within {policy.max_staleness}s of staleness"
+            raise OfflineError(msg)
+        return _Lookup(key, ttl, policy)
+
+    def _store(self, lookup: _Lookup, response: snug.Response) -> None:
+        if not lookup.key or response.status_code != 200:  # noqa: PLR2004
+            return
+        entry = _encode(response.content, time.time() + lookup.ttl)
+        try:
+            # kept past their freshness for as long as the policy may serve them
+            self.backend.set(lookup.key, entry, lookup.ttl + lookup.policy.retention)
+        except CacheError as e:
+            self.stats["errors"] += 1
+            logger.warning("Failed to cache the response to %s: %s", lookup.key, e)
+
+    def _start_revalidating(self, lookup: _Lookup) -> bool:
+        """Whether the response of a stale lookup must be revalidated (i.e. isn't being revalidated already)."""
+        if self.offline:
+            return False
+        with self._lock:
+            if lookup.key in self._revalidating:
+                return False
+            self._revalidating.add(lookup.key)
+        self.stats["revalidations"] += 1
+        return True
+
+    def _revalidate(self, request: snug.Request, lookup: _Lookup) -> None:
+        try:
+            self._store(lookup, super().send(request))
+        except Exception:
+            logger.exception("Failed to revalidate the response to %s", lookup.key)
+        finally:
+            self._revalidating.discard(lookup.key)
+
+    async def _revalidate_async(self, request: snug.Request, lookup: _Lookup) -> None:
+        try:
+            response = await super().send_async(request)
+            await asyncio.to_thread(self._store, lookup, response)
+        except Exception:
+            logger.exception("Failed to revalidate the response to %s", lookup.key)
+        finally:
+            self._revalidating.discard(lookup.key)
+
+    def prefetch(self, requests: Iterable[snug.Request]) -> None:
+        """Looks up the entries of many requests (e.g. of a batch) in a single round trip, ahead of their sending."""
+        keys = [
+            self._key(request)
+            for request in requests
+            if request.method == "GET" and self.ttl(request) is not None
+        ]
+        if not keys:
+            return
+        entries = self._get_many(keys)
+        if len(self._prefetched) > DEFAULT_MAX_ENTRIES:
+            # e.g. left over by failed batches
+            self._prefetched.clear()
+        # misses included, so that they are not looked up again
+        self._prefetched.update(zip(keys, entries, strict=True))
+
+    def send(self, request: snug.Request) -> snug.Response:
+        lookup = self._lookup(request)
+        if lookup.response is not None:
+            if lookup.stale and self._start_revalidating(lookup):
+                threading.Thread(
+                    target=self._revalidate, args=(request, lookup), daemon=True
+                ).start()
+            return lookup.response
+        response = super().send(request)
+        self._store(lookup, response)
+        return response
+
+    async def send_async(self, request: snug.Request) -> snug.Response:
+        # the backends are blocking, so are not used from within the event loop
+        lookup = await asyncio.to_thread(self._lookup, request)
+        if lookup.response is not None:
+            if lookup.stale and self._start_revalidating(lookup):
+                task = asyncio.create_task(self._revalidate_async(request, lookup))
+                self._tasks.add(task)
+                task.add_done_callback(self._tasks.discard)
+            return lookup.response
+        response = await super().send_async(request)
+        await asyncio.to_thread(self._store, lookup, response)
+        return response
+
+    def __repr__(self) -> str:
+        return f"CachingClient({self.backend!r}, {self.client!r})"
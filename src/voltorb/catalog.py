@@ -0,0 +1,174 @@
+"""A persisted and indexed catalog of the zones available from the API."""
+
+import json
+import os
+from collections import defaultdict
+from collections.abc import Callable, Iterator, Mapping
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any
+
+from attrs import asdict, field, frozen
+
+from voltorb import schemas
+from voltorb._patches import Query, execute
+from voltorb.api import Api
+from voltorb.typing import ZoneKey
+
+DEFAULT_TTL = timedelta(days=1)
+
+_ZONE_KEY_SEPARATOR = "-"
+
+
+def _index(pairs: Iterator[tuple[str, ZoneKey]]) -> dict[str, tuple[ZoneKey, ...]]:
+    index: defaultdict[str, list[ZoneKey]] = defaultdict(list)
+    for key, zone_key in pairs:
+        index[key].append(zone_key)
+    return {key: tuple(sorted(zone_keys)) for key, zone_keys in index.items()}
+
+
+def _parents(zone_key: ZoneKey) -> Iterator[ZoneKey]:
+    """All the parent zones of a zone, e.g. 'US' and 'US-CAR' for 'US-CAR-DUK'."""
+    parts = zone_key.split(_ZONE_KEY_SEPARATOR)
+    for i in range(1, len(parts)):
+        yield _ZONE_KEY_SEPARATOR.join(parts[:i])
+
+
+@frozen
+class ZoneCatalog(Mapping[ZoneKey, schemas.ZoneMetadata]):
+    """A catalog of the zones (and their metadata) available from the API, indexed for offline lookups.
+
+    Examples:
+        >>> catalog = ZoneCatalog({"DK-DK1": schemas.ZoneMetadata("West Denmark", country_name="Denmark")})
+        >>> catalog.children("DK")
+        ('DK-DK1',)
+        >>> catalog.by_country("Denmark")
+        ('DK-DK1',)
+
+    Args:
+        zones: The zones, as returned by :meth:`Api.get_zones`.
+        fetched_at (optional): When the zones were fetched from the API. Defaults to now.
+    """
+
+    zones: schemas.Zones
+    fetched_at: datetime = field(factory=lambda: datetime.now(timezone.utc))
+
+    _by_country: dict[str, tuple[ZoneKey, ...]] = field(
+        init=False, repr=False, eq=False
+    )
+    _by_parent: dict[ZoneKey, tuple[ZoneKey, ...]] = field(
+        init=False, repr=False, eq=False
+    )
+    _by_route: dict[str, tuple[ZoneKey, ...]] = field(init=False, repr=False, eq=False)
+
+    def __attrs_post_init__(self) -> None:
+        indexes = {
+            "_by_country": _index(
+                (metadata.country_name, zone_key)
+                for zone_key, metadata in self.zones.items()
+                if metadata.country_name is not None
+            ),
+            "_by_parent": _index(
+                (parent, zone_key)
+                for zone_key in self.zones
+                for parent in _parents(zone_key)
+            ),
+            "_by_route": _index(
+                (route, zone_key)
+                for zone_key, metadata in self.zones.items()
+                for route in metadata.access or ()
+            ),
+        }
+        for name, index in indexes.items():
+            object.__setattr__(self, name, index)
+
+    def __getitem__(self, zone_key: ZoneKey) -> schemas.ZoneMetadata:
+        return self.zones[zone_key]
+
+    def __iter__(self) -> Iterator[ZoneKey]:
+        return iter(self.zones)
+
+    def __len__(self) -> int:
+        return len(self.zones)
+
+    def by_country(self, country_name: str) -> tuple[ZoneKey, ...]:
+        """The zones of a country."""
+        return self._by_country.get(country_name, ())
+
+    def children(self, zone_key: ZoneKey) -> tuple[ZoneKey, ...]:
+        """The sub-zones of a zone (at any depth), e.g. 'DK-DK1' and 'DK-DK2' for 'DK'."""
+        return self._by_parent.get(zone_key, ())
+
+    def with_route(self, route: str) -> tuple[ZoneKey, ...]:
+        """The zones which can be queried on the given route (e.g. 'carbon-intensity/past')."""
+        return self._by_route.get(route, ())
+
+    def is_expired(self, ttl: timedelta = DEFAULT_TTL) -> bool:
+        """Whether the catalog is older than the given time-to-live."""
+        return datetime.now(timezone.utc) - self.fetched_at > ttl
+
+    @classmethod
+    def fetch(
+        cls: type["ZoneCatalog"],
+        execute: Callable[[Query[schemas.Zones]], schemas.Zones] = execute,
+    ) -> "ZoneCatalog":
+        """Fetches the catalog from the API.
+
+        Args:
+            execute (optional): The executor with which to query the API (e.g. to add authentication).
+        """
+        return cls(execute(Api.get_zones()))
+
+    def save(self, path: str | os.PathLike[str]) -> None:
+        """Persists the catalog to disk (atomically, so that concurrent processes never read a partial file)."""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+        payload = {
+            "fetched_at": self.fetched_at.isoformat(),
+            "zones": {
+                zone_key: asdict(metadata) for zone_key, metadata in self.zones.items()
+            },
+        }
+
+        tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+        tmp_path.write_text(json.dumps(payload))
+        tmp_path.replace(path)
+
+    @classmethod
+    def load(cls: type["ZoneCatalog"], path: str | os.PathLike[str]) -> "ZoneCatalog":
+        """Loads a catalog persisted to disk."""
+        payload: dict[str, Any] = json.loads(Path(path).read_text())
+
+        return cls(
+            {
+                zone_key: schemas.ZoneMetadata(**metadata)
+                for zone_key, metadata in payload["zones"].items()
+            },
+            fetched_at=datetime.fromisoformat(payload["fetched_at"]),
+        )
+
+    @classmethod
+    def cached(
+        cls: type["ZoneCatalog"],
+        path: str | os.PathLike[str],
+        execute: Callable[[Query[schemas.Zones]], schemas.Zones] = execute,
+        ttl: timedelta = DEFAULT_TTL,
+    ) -> "ZoneCatalog":
+        """Loads the catalog from disk, only fetching (and persisting) it from the API if missing or expired.
+
+        Args:
+            path: Where the catalog is persisted.
+            execute (optional): The executor with which to query the API (e.g. to add authentication).
+            ttl (optional): How long a persisted catalog is considered fresh for.
+        """
+        try:
+            catalog = cls.load(path)
+        except (OSError, ValueError, KeyError, TypeError):
+            catalog = None
+
+        if catalog is None or catalog.is_expired(ttl):
+            catalog = cls.fetch(execute)
+            catalog.save(path)
+
+        return catalog
@@ -0,0 +1,311 @@
+"""Circuit breaking, so that requests fail fast while the API is degraded rather than tying up threads and connections.
+
+Each host has its own circuit, shared by all the threads and tasks sending requests to it:
+
+* closed: requests are sent, and their outcome (errors and slow responses) recorded.
+* open: too many recent requests failed, so requests fail fast with a :class:`voltorb.CircuitOpenError`.
+* half-open: the open circuit cooled down, so the host's (cheap) health endpoint is probed to decide whether to close
+  the circuit again, or to keep it open.
+"""
+
+import contextlib
+import logging
+import threading
+import time
+import urllib.parse
+from collections import deque
+from collections.abc import Callable, Iterator, Mapping
+from enum import Enum, unique
+from typing import Any
+
+import snug
+from attrs import frozen
+
+from voltorb.api import Api
+from voltorb.clients import ClientWrapper
+from voltorb.exceptions import CircuitOpenError
+from voltorb.middlewares import request_template
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_FAILURE_RATE = 0.5
+DEFAULT_SLOW_CALL_DURATION = 10.0  # seconds
+DEFAULT_WINDOW = 20
+DEFAULT_MIN_CALLS = 10
+DEFAULT_RESET_TIMEOUT = 30.0  # seconds
+
+
+@unique
+class CircuitState(Enum):
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half-open"
+
+
+@frozen
+class CircuitEvent:
+    """A transition of the state of the circuit of a host.
+
+    Args:
+        host: The host of the circuit.
+        previous: The state the circuit transitioned from.
+        state: The state the circuit transitioned to.
+        at: When the transition happened (as a :func:`time.monotonic` timestamp).
+    """
+
+    host: str
+    previous: CircuitState
+    state: CircuitState
+    at: float
+
+
+Listener = Callable[[CircuitEvent], None]
+
+
+def _is_failure(response: snug.Response) -> bool:
+    # client errors (e.g. 4xx, 429) are not a sign of the host degrading
+    status_code: int = response.status_code
+    return status_code >= 500  # noqa: PLR2004
+
+
+class CircuitBreaker:
+    """The circuit of a host, tripping open when too many recent requests failed or were too slow.
+
+    Args:
+        host: The host of the circuit.
+        failure_rate (optional): The rate of failed requests (over the window) above which the circuit opens.
+        slow_call_duration (optional): The duration (in seconds) above which requests count as failed.
+        window (optional): The number of most recent requests over which the failure rate is computed.
+        min_calls (optional): The number of requests below which the circuit never opens.
+        reset_timeout (optional): How long (in seconds) an open circuit waits before probing the host again.
+        listeners (optional): The callbacks notified of transitions of the circuit.
+        clock (optional): The monotonic clock measuring time.
+    """
+
+    def __init__(  # noqa: PLR0913
+        self,
+        host: str,
+        *,
+        failure_rate: float = DEFAULT_FAILURE_RATE,
+        slow_call_duration: float = DEFAULT_SLOW_CALL_DURATION,
+        window: int = DEFAULT_WINDOW,
+        min_calls: int = DEFAULT_MIN_CALLS,
+        reset_timeout: float = DEFAULT_RESET_TIMEOUT,
+        listeners: list[Listener] | None = None,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        if not 0 < failure_rate <= 1:
+            msg = f"failure_rate must be in (0, 1], got {failure_rate!r}"
+            raise ValueError(msg)
+
+        self.host = host
+        self.failure_rate = failure_rate
+        self.slow_call_duration = slow_call_duration
+        self.min_calls = min_calls
+        self.reset_timeout = reset_timeout
+        self.listeners = [] if listeners is None else listeners
+        self.clock = clock
+
+        self._state = CircuitState.CLOSED
+        self._opened_at = 0.0
+        self._outcomes: deque[bool] = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> CircuitState:
+        """The current state of the circuit."""
+        return self._state
+
+    def _transition(self, state: CircuitState) -> CircuitEvent:
+        # to be called with the lock held
+        event = CircuitEvent(self.host, self._state, state, self.clock())
+        self._state = state
+        if state is CircuitState.OPEN:
+            self._opened_at = event.at
+        if state is CircuitState.CLOSED:
+            self._outcomes.clear()
+        return event
+
+    def _notify(self, event: CircuitEvent | None) -> None:
+        # to be called without the lock held, so that listeners can inspect the circuit
+        if event is None:
+            return
+        logger.warning(
+            "Circuit to %s is now %s (was %s)",
+            event.host,
+            event.state.value,
+            event.previous.value,
+        )
+        for listener in self.listeners:
+            listener(event)
+
+    def open_error(self) -> CircuitOpenError:
+        """The error failing requests fast while the circuit is not closed."""
+        retry_after = max(self._opened_at + self.reset_timeout - self.clock(), 0)
+        msg = f"Circuit to {self.host} is {self._state.value}, retry in {retry_after:.1f}s"
+        return CircuitOpenError(msg, host=self.host, retry_after=retry_after)
+
+    def acquire(self) -> bool:
+        """Checks whether a request can be sent.
+
+        Returns:
+            Whether the caller must probe the host (see :meth:`probed`) before sending its request.
+
+        Raises:
+            :class:`voltorb.CircuitOpenError`: if the circuit is open (or already being probed).
+        """
+        with self._lock:
+            if self._state is CircuitState.CLOSED:
+                return False
+            if (
+                self._state is CircuitState.OPEN
+                and self.clock() - self._opened_at >= self.reset_timeout
+            ):
+                event = self._transition(CircuitState.HALF_OPEN)
+            else:
+                raise self.open_error()
+        self._notify(event)
+        return True
+
+    def probed(self, *, healthy: bool) -> None:
+        """Records the outcome of the probe of the host, closing the circuit if healthy, or re-opening it otherwise."""
+        with self._lock:
+            event = self._transition(
+                CircuitState.CLOSED if healthy else CircuitState.OPEN
+            )
+        self._notify(event)
+
+    def record(self, *, failed: bool, duration: float = 0.0) -> None:
+        """Records the outcome of a request, opening the circuit if too many recent requests failed."""
+        failed = failed or duration > self.slow_call_duration
+        event = None
+        with self._lock:
+            if self._state is not CircuitState.CLOSED:
+                return
+            self._outcomes.append(failed)
+            if (
+                len(self._outcomes) >= self.min_calls
+                and sum(self._outcomes) / len(self._outcomes) >= self.failure_rate
+            ):
+                event = self._transition(CircuitState.OPEN)
+        self._notify(event)
+
+    def __repr__(self) -> str:
+        return f"CircuitBreaker({self.host!r}, state={self._state.value!r})"
+
+
+class CircuitBreakers(Mapping[str, CircuitBreaker]):
+    """The circuits of all hosts, all sharing the same configuration and listeners.
+
+    Circuits are created on first access.
+
+    Args:
+        **config: The configuration of the circuits (see :class:`CircuitBreaker`).
+    """
+
+    def __init__(self, **config: Any) -> None:
+        self.config = config
+        self.listeners: list[Listener] = []
+        self._breakers: dict[str, CircuitBreaker] = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, listener: Listener) -> None:
+        """Adds a callback notified of the transitions of all circuits."""
+        self.listeners.append(listener)
+
+    def __getitem__(self, host: str) -> CircuitBreaker:
+        try:
+            return self._breakers[host]
+        except KeyError:
+            with self._lock:
+                return self._breakers.setdefault(
+                    host, CircuitBreaker(host, listeners=self.listeners, **self.config)
+                )
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._breakers)
+
+    def __len__(self) -> int:
+        return len(self._breakers)
+
+
+BREAKERS = CircuitBreakers()
+"""The circuits shared by all circuit breaking clients, unless given their own."""
+
+
+class CircuitBreakingClient(ClientWrapper):
+    """A client wrapper failing requests fast while the circuit to their host is open.
+
+    Examples:
+        >>> import voltorb
+        >>> client = CircuitBreakingClient()
+        >>> execute = voltorb.executor(client=client)
+
+    Args:
+        client (optional): The wrapped client.
+        breakers (optional): The circuits of the hosts. Defaults to circuits shared by all circuit breaking clients.
+    """
+
+    def __init__(
+        self, client: Any = None, breakers: CircuitBreakers = BREAKERS
+    ) -> None:
+        super().__init__(client)
+        self.breakers = breakers
+
+    @staticmethod
+    def _probe(request: snug.Request) -> snug.Request:
+        # the health endpoint of the same host as the request
+        scheme, netloc, *_ = urllib.parse.urlsplit(request.url)
+        return request_template("GET", f"{scheme}://{netloc}{Api.get_health.path}")
+
+    def send(self, request: snug.Request) -> snug.Response:
+        breaker = self.breakers[urllib.parse.urlsplit(request.url).netloc]
+        if breaker.acquire():
+            healthy = False
+            try:
+                # any failure to get a response (e.g. connection errors, timeouts) means the host is still unavailable
+                with contextlib.suppress(Exception):
+                    healthy = not _is_failure(super().send(self._probe(request)))
+            finally:
+                breaker.probed(healthy=healthy)
+            if not healthy:
+                raise breaker.open_error()
+
+        start = time.perf_counter()
+        try:
+            response = super().send(request)
+        except Exception:
+            breaker.record(failed=True)
+            raise
+        breaker.record(
+            failed=_is_failure(response), duration=time.perf_counter() - start
+        )
+        return response
+
+    async def send_async(self, request: snug.Request) -> snug.Response:
+        breaker = self.breakers[urllib.parse.urlsplit(request.url).netloc]
+        if breaker.acquire():
+            healthy = False
+            try:
+                with contextlib.suppress(Exception):
+                    response = await super().send_async(self._probe(request))
+                    healthy = not _is_failure(response)
+            finally:
+                # even if cancelled, so that the circuit is not left half-open forever
+                breaker.probed(healthy=healthy)
+            if not healthy:
+                raise breaker.open_error()
+
+        start = time.perf_counter()
+        try:
+            response = await super().send_async(request)
+        except Exception:
+            breaker.record(failed=True)
+            raise
+        breaker.record(
+            failed=_is_failure(response), duration=time.perf_counter() - start
+        )
+        return response
+
+    def __repr__(self) -> str:
+        return f"CircuitBreakingClient({self.client!r})"
@@ -0,0 +1,176 @@
+"""The `voltorb` command line.
+
+Examples:
+    voltorb export carbon-intensity --zones IT,FR,DE --start 2023-01-01 --end 2024-01-01 --format parquet
+    voltorb backfill power-breakdown backfill/ --zones IT,FR,DE --start 2019-01-01 --end 2024-01-01 --processes 8
+"""
+
+import argparse
+import os
+import sys
+from collections.abc import Sequence
+from datetime import datetime
+from pathlib import Path
+from typing import Any
+
+from voltorb._helpers import utc
+from voltorb._patches import executor
+from voltorb.auth import token_auth
+from voltorb.backfill import BackfillProgress, Checkpoint, backfill, plan
+from voltorb.clients import RedirectingClient
+from voltorb.export import (
+    DATASETS,
+    DEFAULT_CONCURRENCY,
+    FORMATS,
+    ExportProgress,
+    export,
+)
+
+TOKEN_ENV_VAR = "ELECTRICITY_MAPS_API_TOKEN"  # noqa: S105
+"""The environment variable holding the API token, unless given on the command line."""
+
+
+def _datetime(value: str) -> datetime:
+    return utc(datetime.fromisoformat(value))
+
+
+def _zones(value: str) -> list[str]:
+    return [zone.strip() for zone in value.split(",") if zone.strip()]
+
+
+def _print_progress(progress: ExportProgress) -> None:
+    print(  # noqa: T201
+        f"\r{progress.done}/{progress.total} queries, {progress.records} records, "
+        f"{progress.throughput:.0f} records/s",
+        end="\n" if progress.done == progress.total else "",
+        file=sys.stderr,
+        flush=True,
+    )
+
+
+def _export(args: argparse.Namespace) -> None:
+    client: Any = None
+    if args.url is not None:
+        client = RedirectingClient(args.url)
+    auth = None if args.token is None else token_auth(args.token)
+
+    export(
+        args.dataset,
+        args.zones,
+        args.start,
+        args.end,
+        args.output or f"{args.dataset}.{args.format}",
+        fmt=args.format,
+        execute=executor(auth=auth, client=client),
+        concurrency=args.concurrency,
+        progress=None if args.quiet else _print_progress,
+        disable_estimations=args.disable_estimations or None,
+    )
+
+
+def _print_backfill_progress(progress: BackfillProgress) -> None:
+    done = progress.skipped + progress.completed
+    print(  # noqa: T201
+        f"\r{done}/{progress.total} tasks ({progress.skipped} resumed), "
+        f"{progress.records} records, {len(progress.failed)} failed",
+        end="\n" if done + len(progress.failed) == progress.total else "",
+        file=sys.stderr,
+        flush=True,
+    )
+
+
+def _backfill(args: argparse.Namespace) -> None:
+    tasks = plan(args.dataset, args.zones, args.start, args.end)
+    checkpoint_path = args.checkpoint or Path(args.output) / "checkpoint.jsonl"
+
+    with Checkpoint(checkpoint_path) as checkpoint:
+        progress = backfill(
+            tasks,
+            args.output,
+            checkpoint=checkpoint,
+            fmt=args.format,
+            processes=args.processes,
+            concurrency=args.concurrency,
+            token=args.token,
+            url=args.url,
+            progress=None if args.quiet else _print_backfill_progress,
+            disable_estimations=args.disable_estimations or None,
+        )
+
+    for key, error in progress.failed.items():
+        print(f"{key}: {error}", file=sys.stderr)  # noqa: T201
+    if not progress.done:
+        # the failed tasks are retried by running the same command again
+        raise SystemExit(1)
+
+
+def _range_arguments() -> argparse.ArgumentParser:
+    """The arguments shared by the commands querying the range endpoints."""
+    parser = argparse.ArgumentParser(add_help=False)
+    parser.add_argument("dataset", choices=sorted(DATASETS))
+    parser.add_argument(
+        "--zones", type=_zones, required=True, help="comma separated zones"
+    )
+    parser.add_argument(
+        "--start", type=_datetime, required=True, help="ISO 8601 (default UTC)"
+    )
+    parser.add_argument(
+        "--end", type=_datetime, required=True, help="ISO 8601, excluded (default UTC)"
+    )
+    parser.add_argument(
+        "--concurrency", type=int, default=DEFAULT_CONCURRENCY, help="queries in flight"
+    )
+    parser.add_argument("--disable-estimations", action="store_true")
+    parser.add_argument(
+        "--token",
+        default=os.environ.get(TOKEN_ENV_VAR),
+        help=f"the API token, defaults to ${TOKEN_ENV_VAR}",
+    )
+    parser.add_argument("--url", help="the base URL of the API (e.g. of a proxy)")
+    parser.add_argument("--quiet", "-q", action="store_true", help="hide progress")
+    return parser
+
+
+def _parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="voltorb", description="A simple unofficial Electricity Maps client."
+    )
+    commands = parser.add_subparsers(required=True, metavar="command")
+    range_arguments = _range_arguments()
+
+    export_ = commands.add_parser(
+        "export",
+        parents=[range_arguments],
+        help="export the records of a range endpoint to a file",
+    )
+    export_.set_defaults(command=_export)
+    export_.add_argument("--format", choices=FORMATS, default="csv")
+    export_.add_argument(
+        "--output", "-o", help="the file to write, defaults to DATASET.FORMAT"
+    )
+
+    backfill_ = commands.add_parser(
+        "backfill",
+        parents=[range_arguments],
+        help="backfill the records of a range endpoint, resuming where previous runs stopped",
+    )
+    backfill_.set_defaults(command=_backfill)
+    backfill_.add_argument("output", help="the directory to write the records to")
+    backfill_.add_argument("--format", choices=FORMATS, default="ndjson")
+    backfill_.add_argument(
+        "--checkpoint", help="the checkpoint file, defaults to OUTPUT/checkpoint.jsonl"
+    )
+    backfill_.add_argument(
+        "--processes", type=int, help="worker processes, defaults to the CPUs"
+    )
+
+    return parser
+
+
+def main(argv: Sequence[str] | None = None) -> None:
+    args = _parser().parse_args(argv)
+    args.command(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""Client wrappers, adding behaviour to any HTTP client registered with snug.
+
+Wrappers are clients themselves, so they can be passed anywhere a client is expected (e.g. :func:`voltorb.execute`,
+:func:`voltorb.async_executor`), and stacked on top of each other. Since they act on requests, rather than on queries,
+they also apply to every query of composite queries (e.g. :class:`voltorb.Batch`).
+
+Wrappers decode the compressed responses of the clients which don't decode them themselves (i.e. :mod:`urllib` and the
+default :mod:`asyncio` client), so that wrappers, and queries, always get decoded responses.
+"""
+
+import urllib.parse
+import urllib.request
+from collections.abc import Iterable
+from typing import Any
+
+import snug
+
+from voltorb.compression import decoded
+
+# the same client snug defaults to for synchronous requests
+_DEFAULT_CLIENT = urllib.request.build_opener()
+
+# the clients which return responses as sent by the server, without decoding them
+_UNDECODING_CLIENTS = (urllib.request.OpenerDirector, type(None))
+
+
+def undecoding(client: Any) -> bool:
+    """Whether a client returns compressed responses as they are."""
+    return isinstance(client, _UNDECODING_CLIENTS)
+
+
+class ClientWrapper:
+    """Base class for clients wrapping another client.
+
+    Subclasses override :meth:`send` and/or :meth:`send_async` to add behaviour around the requests sent through the
+    wrapped client.
+
+    Args:
+        client (optional): The wrapped client. Defaults to the default sync (:mod:`urllib`) or async (:mod:`asyncio`)
+            client, depending on how the wrapper is used.
+    """
+
+    def __init__(self, client: Any = None) -> None:
+        self.client = client
+
+    def send(self, request: snug.Request) -> snug.Response:
+        """Sends a request through the wrapped client."""
+        client = _DEFAULT_CLIENT if self.client is None else self.client
+        response = snug.send(client, request)
+        return decoded(response) if undecoding(client) else response
+
+    async def send_async(self, request: snug.Request) -> snug.Response:
+        """Sends a request asynchronously through the wrapped client."""
+        response = await snug.send_async(self.client, request)
+        return decoded(response) if undecoding(self.client) else response
+
+    def prefetch(self, requests: Iterable[snug.Request]) -> None:
+        """Lets the wrapped client look up many requests at once (e.g. the requests of a batch), ahead of sending them.
+
+        Clients implementing this hook (e.g. :class:`voltorb.cache.CachingClient`) can answer them in a single round
+        trip, rather than one at a time as they are sent.
+        """
+        prefetch = getattr(self.client, "prefetch", None)
+        if prefetch is not None:
+            prefetch(requests)
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({self.client!r})"
+
+
+# dispatch through the methods, so that subclasses only need to override them
+snug.send.register(ClientWrapper, lambda client, request: client.send(request))
+snug.send_async.register(
+    ClientWrapper, lambda client, request: client.send_async(request)
+)
+
+
+class RedirectingClient(ClientWrapper):
+    """A client wrapper sending requests to another base URL (e.g. a proxy, or a local stand-in of the API).
+
+    Examples:
+        >>> client = RedirectingClient("http://127.0.0.1:8080")
+
+    Args:
+        base_url: The scheme and host (and optional path prefix) to send requests to.
+        client (optional): The wrapped client.
+    """
+
+    def __init__(self, base_url: str, client: Any = None) -> None:
+        super().__init__(client)
+        self.base_url = base_url.rstrip("/")
+
+    def _redirect(self, request: snug.Request) -> snug.Request:
+        url = urllib.parse.urlsplit(request.url)
+        path = urllib.parse.urlunsplit(("", "", url.path, url.query, url.fragment))
+        return request.replace(url=f"{self.base_url}{path}")
+
+    def prefetch(self, requests: Iterable[snug.Request]) -> None:
+        super().prefetch(self._redirect(request) for request in requests)
+
+    def send(self, request: snug.Request) -> snug.Response:
+        return super().send(self._redirect(request))
+
+    async def send_async(self, request: snug.Request) -> snug.Response:
+        return await super().send_async(self._redirect(request))
+
+    def __repr__(self) -> str:
+        return f"RedirectingClient({self.base_url!r}, {self.client!r})"
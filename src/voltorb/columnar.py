@@ -0,0 +1,413 @@
+"""A compact, memory-mapped, columnar on-disk format for hourly series of records (e.g. cached histories).
+
+Records are partitioned by dataset, zone and month (e.g. ``root/power-breakdown/FR/2024-01.vcol``). Each partition
+holds a sorted index of epoch hours, a fixed width column per numeric field of the records, and a bitmap of their
+non-null values, and is read through :mod:`mmap` as zero-copy NumPy views.
+
+Layout of a partition (little-endian, all blocks aligned to 8 bytes):
+
+* header: magic ``VCOL``, version (u16), number of columns (u16), capacity (u32, the hours of the month), count (u32,
+  the hours written so far).
+* column descriptors: name (64 bytes, utf-8) and type (u8: 0 for int8, 1 for int16, 2 for int32).
+* index: capacity x int32 epoch hours, of which the first `count` are sorted.
+* for each column: capacity values, then ceil(capacity / 8) bytes of validity bitmap (least significant bit first).
+
+Non-numeric fields (e.g. zones, enums) are not stored.
+"""
+
+import math
+import mmap
+import os
+import struct
+from collections.abc import Iterator, Mapping, Sequence
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any
+
+from attrs import frozen
+
+from voltorb._helpers import optional_import
+from voltorb.export import flat_columns, flatten, record_schema
+from voltorb.typing import ZoneKey
+
+np: Any = optional_import("numpy")  # typed loosely, as numpy is optional
+
+MAGIC = b"VCOL"
+VERSION = 1
+SUFFIX = ".vcol"
+
+_HEADER = struct.Struct("<4sHHII")
+_COUNT_OFFSET = 12  # of the count, in the header
+_DESCRIPTOR = struct.Struct("<64sB7x")
+_DTYPES = ("<i1", "<i2", "<i4")
+_SECONDS_PER_HOUR = 3600
+
+
+def _align(offset: int) -> int:
+    return (offset + 7) // 8 * 8
+
+
+def _epoch_hour(dt: datetime) -> int:
+    return int(dt.timestamp()) // _SECONDS_PER_HOUR
+
+
+def _epoch_hour_ceil(dt: datetime) -> int:
+    return math.ceil(dt.timestamp() / _SECONDS_PER_HOUR)
+
+
+def _month(hour: int) -> tuple[int, int]:
+    dt = datetime.fromtimestamp(hour * _SECONDS_PER_HOUR, timezone.utc)
+    return dt.year, dt.month
+
+
+def _month_hours(year: int, month: int) -> tuple[int, int]:
+    """The first hour of a month, and the number of hours in it."""
+    start = datetime(year, month, 1, tzinfo=timezone.utc)
+    end = datetime(year + month // 12, month % 12 + 1, 1, tzinfo=timezone.utc)
+    return _epoch_hour(start), _epoch_hour(end) - _epoch_hour(start)
+
+
+@frozen
+class Column:
+    """A stored column.
+
+    Args:
+        name: The name of the (flattened) field, e.g. 'power_consumption_breakdown.coal'.
+        dtype: The (little-endian) NumPy type of the values, one of '<i1', '<i2' or '<i4'.
+    """
+
+    name: str
+    dtype: str
+
+
+def schema_columns(dataset: str) -> tuple[Column, ...]:
+    """The columns stored for the records of a dataset.
+
+    Percentages are stored as int16, booleans as int8, and all other integers as int32.
+    """
+    columns = []
+    for name, tp in flat_columns(record_schema(dataset)):
+        if tp is bool:
+            columns.append(Column(name, "<i1"))
+        elif tp is int:
+            dtype = "<i2" if name.endswith("_percentage") else "<i4"
+            columns.append(Column(name, dtype))
+    return tuple(columns)
+
+
+@frozen
+class _Layout:
+    columns: tuple[Column, ...]
+    capacity: int
+
+    @property
+    def index_offset(self) -> int:
+        return _align(_HEADER.size + _DESCRIPTOR.size * len(self.columns))
+
+    def offsets(self) -> dict[str, tuple[int, int]]:
+        """The offsets of the values and bitmap of each column."""
+        offsets, offset = {}, self.index_offset + 4 * self.capacity
+        for column in self.columns:
+            values = _align(offset)
+            bitmap = _align(values + int(column.dtype[-1]) * self.capacity)
+            offsets[column.name] = (values, bitmap)
+            offset = bitmap + (self.capacity + 7) // 8
+        return offsets
+
+    @property
+    def size(self) -> int:
+        offset = self.index_offset + 4 * self.capacity
+        for _, bitmap in self.offsets().values():
+            offset = bitmap + (self.capacity + 7) // 8
+        return _align(offset)
+
+    def header(self, count: int) -> bytes:
+        descriptors = b"".join(
+            _DESCRIPTOR.pack(c.name.encode(), _DTYPES.index(c.dtype))
+            for c in self.columns
+        )
+        return (
+            _HEADER.pack(MAGIC, VERSION, len(self.columns), self.capacity, count)
+            + descriptors
+        )
+
+
+def _read_layout(buffer: Any) -> tuple[_Layout, int]:
+    magic, version, n_columns, capacity, count = _HEADER.unpack_from(buffer)
+    if magic != MAGIC or version != VERSION:
+        msg = f"Not a version {VERSION} columnar partition"
+        raise ValueError(msg)
+    columns = []
+    for i in range(n_columns):
+        name, dtype = _DESCRIPTOR.unpack_from(
+            buffer, _HEADER.size + i * _DESCRIPTOR.size
+        )
+        columns.append(Column(name.rstrip(b"\0").decode(), _DTYPES[dtype]))
+    return _Layout(tuple(columns), capacity), count
+
+
+class Partition:
+    """A memory-mapped partition, exposing its index and columns as zero-copy NumPy views.
+
+    The views are only valid until the partition is closed (see :meth:`close`), which they must not outlive.
+
+    Args:
+        path: The path of the partition.
+    """
+
+    def __init__(self, path: str | os.PathLike[str]) -> None:
+        if np is None:
+            msg = "Columnar files require the optional numpy package (pip install voltorb[columnar])"
+            raise ImportError(msg)
+        self.path = Path(path)
+        with self.path.open("rb") as file:
+            self._buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            self._layout, self.count = _read_layout(self._buffer)
+        except Exception:
+            self._buffer.close()
+            raise
+        self._offsets = self._layout.offsets()
+        self.capacity = self._layout.capacity
+
+    @property
+    def columns(self) -> tuple[Column, ...]:
+        return self._layout.columns
+
+    @property
+    def hours(self) -> Any:
+        """The (sorted) epoch hours of the rows."""
+        return np.frombuffer(self._buffer, "<i4", self.count, self._layout.index_offset)
+
+    def values(self, name: str) -> Any:
+        """The raw values of a column (zero-copy, with arbitrary values for nulls)."""
+        column = next(c for c in self.columns if c.name == name)
+        return np.frombuffer(
+            self._buffer, column.dtype, self.count, self._offsets[name][0]
+        )
+
+    def valid(self, name: str) -> Any:
+        """Whether the values of a column are non-null."""
+        bitmap = np.frombuffer(
+            self._buffer, "u1", (self._layout.capacity + 7) // 8, self._offsets[name][1]
+        )
+        return np.unpackbits(bitmap, count=self.count, bitorder="little").view(bool)
+
+    def column(self, name: str) -> Any:
+        """A column, as a masked array of its values (masking nulls)."""
+        return np.ma.MaskedArray(self.values(name), mask=~self.valid(name))
+
+    def bounds(
+        self, start: datetime | None = None, end: datetime | None = None
+    ) -> slice:
+        """The rows between two datetimes (the end excluded)."""
+        hours = self.hours
+        lo = 0 if start is None else int(np.searchsorted(hours, _epoch_hour(start)))
+        hi = (
+            self.count
+            if end is None
+            else int(np.searchsorted(hours, _epoch_hour_ceil(end)))
+        )
+        return slice(lo, hi)
+
+    def rows(self) -> dict[int, dict[str, Any]]:
+        """The rows of the partition, by epoch hour (e.g. to merge them with new ones)."""
+        columns = {
+            c.name: np.where(self.valid(c.name), self.values(c.name), None).tolist()
+            for c in self.columns
+        }
+        return {
+            hour: {name: values[i] for name, values in columns.items()}
+            for i, hour in enumerate(self.hours.tolist())
+        }
+
+    def close(self) -> None:
+        """Unmaps the partition.
+
+        Raises:
+            BufferError: if views of the partition are still referenced.
+        """
+        self._buffer.close()
+
+    def __enter__(self) -> "Partition":
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __repr__(self) -> str:
+        return f"Partition({str(self.path)!r}, rows={self.count})"
+
+
+def _write_rows(
+    path: Path,
+    layout: _Layout,
+    count: int,
+    hours: Sequence[int],
+    rows: Sequence[Mapping[str, Any]],
+) -> None:
+    """Writes rows into the free slots of a partition (creating it if needed), committing them by updating its count."""
+    offsets = layout.offsets()
+    exists = path.exists()
+    with path.open("r+b" if exists else "w+b") as file:
+        if not exists:
+            file.truncate(layout.size)
+            file.write(layout.header(0))
+
+        file.seek(layout.index_offset + 4 * count)
+        file.write(np.asarray(hours, "<i4").tobytes())
+
+        for column in layout.columns:
+            values_offset, bitmap_offset = offsets[column.name]
+            values = [row.get(column.name) for row in rows]
+
+            file.seek(values_offset + int(column.dtype[-1]) * count)
+            filled = [0 if v is None else int(v) for v in values]
+            file.write(np.asarray(filled, column.dtype).tobytes())
+
+            n_bytes = (layout.capacity + 7) // 8
+            file.seek(bitmap_offset)
+            bits = np.unpackbits(
+                np.frombuffer(file.read(n_bytes), "u1"),
+                count=layout.capacity,
+                bitorder="little",
+            )
+            bits[count : count + len(values)] = [v is not None for v in values]
+            file.seek(bitmap_offset)
+            file.write(np.packbits(bits, bitorder="little").tobytes())
+
+        # the rows only become visible to readers once counted
+        file.flush()
+        file.seek(_COUNT_OFFSET)
+        file.write(struct.pack("<I", count + len(hours)))
+
+
+class ColumnarStore:
+    """A store of hourly records, in memory-mapped columnar partitions by dataset, zone and month.
+
+    Examples:
+        >>> store = ColumnarStore("cache")
+        >>> store.write("carbon-intensity", "FR", history.data)  # doctest: +SKIP
+        >>> store.read("carbon-intensity", "FR", datetime(2024, 1, 1), datetime(2024, 7, 1))  # doctest: +SKIP
+        {'hour': array([...], dtype=int32), 'carbon_intensity': masked_array(...), ...}
+
+    Args:
+        root: The root directory of the store.
+    """
+
+    def __init__(self, root: str | os.PathLike[str]) -> None:
+        if np is None:
+            msg = "Columnar files require the optional numpy package (pip install voltorb[columnar])"
+            raise ImportError(msg)
+        self.root = Path(root)
+
+    def path(self, dataset: str, zone: ZoneKey, year: int, month: int) -> Path:
+        """The path of a partition."""
+        return self.root / dataset / zone / f"{year:04d}-{month:02d}{SUFFIX}"
+
+    @staticmethod
+    def _write_partition(
+        path: Path, columns: tuple[Column, ...], rows: dict[int, dict[str, Any]]
+    ) -> None:
+        hours = sorted(rows)
+        if path.exists():
+            with Partition(path) as existing:
+                if existing.columns != columns:
+                    msg = f"The columns of {path} don't match those of the records"
+                    raise ValueError(msg)
+                count, capacity = existing.count, existing.capacity
+                appended = not count or hours[0] > int(existing.hours[-1])
+                if not appended:
+                    # out of order (or overwritten) hours: merged with the existing rows
+                    rows = existing.rows() | rows
+            if appended:
+                # new hours: appended in place
+                layout = _Layout(columns, capacity)
+                _write_rows(path, layout, count, hours, [rows[h] for h in hours])
+                return
+            hours = sorted(rows)
+
+        # new or merged partitions are written aside, and atomically swapped in
+        _, capacity = _month_hours(*_month(hours[0]))
+        tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+        tmp_path.unlink(missing_ok=True)
+        _write_rows(
+            tmp_path, _Layout(columns, capacity), 0, hours, [rows[h] for h in hours]
+        )
+        tmp_path.replace(path)
+
+    def write(self, dataset: str, zone: ZoneKey, records: Sequence[Any]) -> int:
+        """Writes the records of a dataset (e.g. those of a range or history) for a zone.
+
+        Records of hours already stored overwrite them.
+
+        Returns:
+            The number of records written.
+        """
+        columns = schema_columns(dataset)
+        partitions: dict[tuple[int, int], dict[int, dict[str, Any]]] = {}
+        for record in records:
+            hour = _epoch_hour(record.datetime)
+            partitions.setdefault(_month(hour), {})[hour] = flatten(record)
+
+        for (year, month), rows in sorted(partitions.items()):
+            path = self.path(dataset, zone, year, month)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            self._write_partition(path, columns, rows)
+        return len(records)
+
+    def partitions(
+        self,
+        dataset: str,
+        zone: ZoneKey,
+        start: datetime | None = None,
+        end: datetime | None = None,
+    ) -> Iterator[Partition]:
+        """The partitions of a zone overlapping a date range (the end excluded), in chronological order.
+
+        The partitions are to be closed by the caller (see :meth:`Partition.close`).
+        """
+        lo = None if start is None else _month(_epoch_hour(start))
+        hi = None if end is None else _month(_epoch_hour_ceil(end) - 1)
+        for path in sorted((self.root / dataset / zone).glob(f"*{SUFFIX}")):
+            year, month = map(int, path.stem.split("-"))
+            # pruned by name, without opening the files
+            if (lo is None or (year, month) >= lo) and (
+                hi is None or (year, month) <= hi
+            ):
+                yield Partition(path)
+
+    def read(
+        self,
+        dataset: str,
+        zone: ZoneKey,
+        start: datetime | None = None,
+        end: datetime | None = None,
+    ) -> dict[str, Any]:
+        """Reads the records of a zone over a date range (the end excluded), as columns.
+
+        Returns:
+            The epoch hours of the records (under 'hour'), and a masked array (masking nulls) for each column.
+        """
+        hours: list[Any] = []
+        columns: dict[str, list[Any]] = {c.name: [] for c in schema_columns(dataset)}
+        for partition in self.partitions(dataset, zone, start, end):
+            # copied out of the partition, so that it can be unmapped
+            with partition:
+                rows = partition.bounds(start, end)
+                hours.append(partition.hours[rows].copy())
+                for name, chunks in columns.items():
+                    chunks.append(partition.column(name)[rows].copy())
+
+        def concatenate(chunks: list[Any], dtype: str) -> Any:
+            return np.ma.concatenate(chunks) if chunks else np.ma.array([], dtype)
+
+        dtypes = {c.name: c.dtype for c in schema_columns(dataset)}
+        return {
+            "hour": np.concatenate(hours) if hours else np.array([], "<i4"),
+        } | {
+            name: concatenate(chunks, dtypes[name]) for name, chunks in columns.items()
+        }
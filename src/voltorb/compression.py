@@ -0,0 +1,87 @@
+"""Negotiation and decoding of compressed responses.
+
+Responses are always negotiated with gzip and deflate compression, and with brotli and zstandard compression when the
+optional :mod:`brotli` and :mod:`zstandard` packages are installed.
+"""
+
+import gzip
+import zlib
+from collections.abc import Callable
+
+import snug
+
+from voltorb._helpers import optional_import
+
+brotli = optional_import("brotli")
+zstandard = optional_import("zstandard")
+
+
+def _inflate(content: bytes) -> bytes:
+    try:
+        return zlib.decompress(content)
+    except zlib.error:
+        # some servers send raw deflate streams, without the zlib wrapper
+        return zlib.decompress(content, -zlib.MAX_WBITS)
+
+
+def _unzstd(content: bytes) -> bytes:
+    # streaming decompression, as frames don't necessarily carry their decompressed size
+    return zstandard.ZstdDecompressor().decompressobj().decompress(content)  # type: ignore[no-any-return, union-attr]
+
+
+DECODERS: dict[str, Callable[[bytes], bytes]] = {
+    "gzip": gzip.decompress,
+    "x-gzip": gzip.decompress,
+    "deflate": _inflate,
+}
+"""The decoders of all supported content encodings, by name."""
+
+if brotli is not None:  # pragma: no cover
+    DECODERS["br"] = brotli.decompress
+if zstandard is not None:  # pragma: no cover
+    DECODERS["zstd"] = _unzstd
+
+ACCEPT_ENCODING = ", ".join(name for name in DECODERS if not name.startswith("x-"))
+"""The value of the `Accept-Encoding` header negotiating all supported content encodings."""
+
+
+def decompress(content: bytes, content_encoding: str) -> bytes:
+    """Decodes content compressed with the given (possibly multiple, e.g. 'deflate, gzip') content encodings.
+
+    Raises:
+        ValueError: on unsupported content encodings.
+    """
+    # encodings are listed in the order they were applied
+    for encoding in reversed(content_encoding.split(",")):
+        name = encoding.strip().lower()
+        if name in ("", "identity"):
+            continue
+        try:
+            decoder = DECODERS[name]
+        except KeyError:
+            msg = f"Unsupported content encoding: {name!r}"
+            raise ValueError(msg) from None
+        content = decoder(content)
+    return content
+
+
+def decoded(response: snug.Response) -> snug.Response:
+    """Decodes a compressed response, if needed.
+
+    Only for responses of clients which don't decode responses themselves (e.g. :mod:`urllib`).
+    """
+    content_encoding = next(
+        (v for k, v in response.headers.items() if k.lower() == "content-encoding"),
+        None,
+    )
+    if not content_encoding or not response.content:
+        return response
+
+    return response.replace(
+        content=decompress(response.content, content_encoding),
+        headers={
+            name: value
+            for name, value in response.headers.items()
+            if name.lower() not in ("content-encoding", "content-length")
+        },
+    )
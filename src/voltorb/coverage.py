@@ -0,0 +1,284 @@
+"""Caching of range queries, only fetching the hours not covered by previous queries.
+
+An interval index of the spans already fetched is kept for each dataset, zone and set of parameters, so that
+overlapping range queries (e.g. of dashboards and reports) only query the API for the gaps in their coverage.
+"""
+
+import bisect
+import threading
+from collections.abc import Iterator, Mapping, Sequence
+from datetime import datetime, timedelta, timezone
+from operator import attrgetter
+from typing import Any
+
+from voltorb._helpers import utc
+from voltorb._patches import Query
+from voltorb.api import ENDPOINTS, Endpoint
+from voltorb.batch import DEFAULT_MAX_CONCURRENCY, Batch, Mapped
+from voltorb.export import DATASETS
+from voltorb.streaming import MAX_WINDOW, windows
+from voltorb.typing import ZoneKey
+
+HISTORY_SPAN = timedelta(hours=24)
+"""How far back the history endpoints go."""
+
+_HOUR = timedelta(hours=1)
+
+_Key = tuple[str, ZoneKey, tuple[tuple[str, Any], ...]]
+
+
+def _floor_hour(dt: datetime) -> datetime:
+    return dt.replace(minute=0, second=0, microsecond=0)
+
+
+def _ceil_hour(dt: datetime) -> datetime:
+    floor = _floor_hour(dt)
+    return floor if floor == dt else floor + _HOUR
+
+
+class Coverage:
+    """A set of disjoint (half-open) spans of time, merged as they are added.
+
+    Examples:
+        >>> coverage = Coverage()
+        >>> coverage.add(datetime(2024, 1, 1), datetime(2024, 1, 5))
+        >>> coverage.add(datetime(2024, 1, 10), datetime(2024, 1, 15))
+        >>> [(s.day, e.day) for s, e in coverage.gaps(datetime(2024, 1, 3), datetime(2024, 1, 20))]
+        [(5, 10), (15, 20)]
+    """
+
+    def __init__(self) -> None:
+        # the starts and ends of the spans, in order
+        self._starts: list[datetime] = []
+        self._ends: list[datetime] = []
+
+    def add(self, start: datetime, end: datetime) -> None:
+        """Adds a span, merging it with the spans it overlaps or touches."""
+        if start >= end:
+            return
+        i = bisect.bisect_left(self._ends, start)
+        j = bisect.bisect_right(self._starts, end)
+        if i < j:
+            start = min(start, self._starts[i])
+            end = max(end, self._ends[j - 1])
+        self._starts[i:j] = [start]
+        self._ends[i:j] = [end]
+
+    def gaps(self, start: datetime, end: datetime) -> list[tuple[datetime, datetime]]:
+        """The spans of a range which are not covered."""
+        gaps = []
+        i = bisect.bisect_right(self._ends, start)
+        while i < len(self._starts) and self._starts[i] < end:
+            if self._starts[i] > start:
+                gaps.append((start, self._starts[i]))
+            start = max(start, self._ends[i])
+            i += 1
+        if start < end:
+            gaps.append((start, end))
+        return gaps
+
+    def copy(self) -> "Coverage":
+        """A copy of the coverage, unaffected by spans added to this one."""
+        copy = Coverage()
+        copy._starts = self._starts.copy()  # noqa: SLF001
+        copy._ends = self._ends.copy()  # noqa: SLF001
+        return copy
+
+    def covers(self, start: datetime, end: datetime) -> bool:
+        """Whether a range is entirely covered."""
+        return not self.gaps(start, end)
+
+    def __iter__(self) -> Iterator[tuple[datetime, datetime]]:
+        return zip(self._starts, self._ends, strict=True)
+
+    def __len__(self) -> int:
+        return len(self._starts)
+
+    def __repr__(self) -> str:
+        return f"Coverage({list(self)!r})"
+
+
+class _Series:
+    """The records fetched for a dataset, zone and set of parameters, by datetime."""
+
+    def __init__(self) -> None:
+        self.coverage = Coverage()
+        self.datetimes: list[datetime] = []
+        self.records: dict[datetime, Any] = {}
+
+    def merge(self, records: Sequence[Any]) -> None:
+        added = False
+        for record in records:
+            dt = utc(record.datetime)
+            added = added or dt not in self.records
+            self.records[dt] = record
+        if added:
+            self.datetimes = sorted(self.records)
+
+    def slice(self, start: datetime, end: datetime) -> list[Any]:
+        i = bisect.bisect_left(self.datetimes, start)
+        j = bisect.bisect_left(self.datetimes, end)
+        return [self.records[dt] for dt in self.datetimes[i:j]]
+
+
+class RangeCache:
+    """Caches the records of the range endpoints, only querying the API for the hours not fetched yet.
+
+    The coverage of each dataset is tracked per zone and set of parameters (e.g. `disable_estimations`). Gaps within
+    the last 24 hours are fetched from the history endpoints (when the dataset has one), and older ones from the range
+    endpoints, in API sized windows. The current hour is never considered covered, as its records are not final yet.
+
+    Examples:
+        >>> from voltorb import execute
+        >>> cache = RangeCache()
+        >>> query = cache.get_range("carbon-intensity", "FR", datetime(2024, 1, 1), datetime(2024, 2, 1))
+        >>> records = execute(query)  # doctest: +SKIP
+    """
+
+    def __init__(self) -> None:
+        self._series: dict[_Key, _Series] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _endpoints(
+        dataset: str,
+    ) -> tuple[Endpoint[..., Any], Endpoint[..., Any] | None]:
+        try:
+            endpoint = DATASETS[dataset]
+        except KeyError:
+            msg = f"Unknown dataset {dataset!r}, expected one of {sorted(DATASETS)}"
+            raise ValueError(msg) from None
+        return endpoint, ENDPOINTS.get(f"/v3/{dataset}/history")
+
+    def _key(self, dataset: str, zone: ZoneKey, **kwargs: Any) -> _Key:
+        endpoint, _ = self._endpoints(dataset)
+        # normalised as query parameters, so that equivalent arguments share their coverage
+        params = endpoint.params(zone, datetime.min, datetime.min, **kwargs)
+        for name in ("zone", "start", "end"):
+            del params[name]
+        return dataset, zone, tuple(sorted(params.items()))
+
+    def coverage(self, dataset: str, zone: ZoneKey, **kwargs: Any) -> Coverage:
+        """The spans of time fetched for a dataset, zone and set of parameters (a copy, as of the call)."""
+        key = self._key(dataset, zone, **kwargs)
+        with self._lock:
+            series = self._series.get(key)
+            return Coverage() if series is None else series.coverage.copy()
+
+    def gaps(
+        self, dataset: str, zone: ZoneKey, start: datetime, end: datetime, **kwargs: Any
+    ) -> list[tuple[datetime, datetime]]:
+        """The (hour aligned) spans of a range which were not fetched yet."""
+        key = self._key(dataset, zone, **kwargs)
+        start, end = _floor_hour(utc(start)), _ceil_hour(utc(end))
+        with self._lock:
+            series = self._series.get(key)
+            coverage = Coverage() if series is None else series.coverage
+            # while holding the lock, as queries of the cache merge into the coverage
+            return coverage.gaps(start, end)
+
+    def get_range(  # noqa: PLR0913
+        self,
+        dataset: str,
+        zone: ZoneKey,
+        start: datetime,
+        end: datetime,
+        *,
+        max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+        **kwargs: Any,
+    ) -> Query[list[Any]]:
+        """The records of a dataset over a date range, only fetching the gaps in its coverage.
+
+        Args:
+            dataset: The name of the dataset (see :data:`voltorb.export.DATASETS`).
+            zone: The zone for which to get data.
+            start: The start of the date range.
+            end: The end of the date range (excluded).
+            max_concurrency (optional): The maximum number of queries in flight at any time.
+            **kwargs: The other arguments of the endpoint (e.g. `disable_estimations`).
+
+        Returns:
+            A query for the records of the range, in order.
+
+        Raises:
+            ValueError: on unknown datasets.
+        """
+        endpoint, history = self._endpoints(dataset)
+        start, end = utc(start), utc(end)
+        now = datetime.now(timezone.utc)
+
+        queries: dict[tuple[datetime, datetime], Query[Sequence[Any]]] = {}
+        for gap_start, gap_end in self.gaps(dataset, zone, start, end, **kwargs):
+            if history is not None and gap_start > now - HISTORY_SPAN:
+                queries[gap_start, gap_end] = Mapped(
+                    history(zone, **kwargs), attrgetter("history")
+                )
+                continue
+            for window in windows(gap_start, gap_end, MAX_WINDOW):
+                queries[window] = Mapped(
+                    endpoint(zone, *window, **kwargs), attrgetter("data")
+                )
+
+        return self.collect(
+            dataset,
+            zone,
+            start,
+            end,
+            queries,
+            max_concurrency=max_concurrency,
+            **kwargs,
+        )
+
+    def collect(  # noqa: PLR0913
+        self,
+        dataset: str,
+        zone: ZoneKey,
+        start: datetime,
+        end: datetime,
+        queries: Mapping[tuple[datetime, datetime], Query[Sequence[Any]]],
+        *,
+        max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+        **kwargs: Any,
+    ) -> Query[list[Any]]:
+        """The records of a dataset over a date range, after merging the records of the given queries into the cache.
+
+        This is the building block of :meth:`get_range`, for callers choosing their own queries for the gaps (e.g.
+        :class:`voltorb.QueryPlanner`).
+
+        Args:
+            dataset: The name of the dataset (see :data:`voltorb.export.DATASETS`).
+            zone: The zone for which to get data.
+            start: The start of the date range.
+            end: The end of the date range (excluded).
+            queries: The queries for the records of spans of time, by span (which is then covered).
+            max_concurrency (optional): The maximum number of queries in flight at any time.
+            **kwargs: The other arguments of the queries (e.g. `disable_estimations`).
+        """
+        key = self._key(dataset, zone, **kwargs)
+        start, end = utc(start), utc(end)
+        now = datetime.now(timezone.utc)
+
+        def merge(
+            results: dict[tuple[datetime, datetime], Sequence[Any]],
+        ) -> list[Any]:
+            horizon = _floor_hour(now)
+            with self._lock:
+                series = self._series.setdefault(key, _Series())
+                for (window_start, window_end), records in results.items():
+                    series.merge(
+                        [
+                            r
+                            for r in records
+                            if window_start <= utc(r.datetime) < window_end
+                        ]
+                    )
+                    series.coverage.add(window_start, min(window_end, horizon))
+                return series.slice(start, end)
+
+        return Mapped(Batch(dict(queries), max_concurrency=max_concurrency), merge)
+
+    def __len__(self) -> int:
+        return len(self._series)
+
+    def __repr__(self) -> str:
+        return f"RangeCache({len(self)} series)"
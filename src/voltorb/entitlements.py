@@ -0,0 +1,192 @@
+"""Preflight checks of the entitlements of tokens, so that requests they can't access fail without a round trip.
+
+The zones endpoint lists the routes (e.g. 'carbon-intensity/past') each zone can be queried on with the token of the
+request. An :class:`EntitlementClient` loads (and caches) these entitlements once per token, and answers the requests
+to routes their zone is not entitled to with a local 403 response, so that they raise a :class:`voltorb.ForbiddenError`
+as if sent to the API.
+"""
+
+import asyncio
+import contextlib
+import json
+import logging
+import threading
+import time
+import urllib.parse
+from collections import Counter
+from typing import Any
+
+import snug
+
+from voltorb import schemas
+from voltorb.api import ENDPOINTS, Api
+from voltorb.clients import ClientWrapper
+from voltorb.exceptions import ValidationError
+from voltorb.middlewares import deserialiser, request_template
+from voltorb.typing import ZoneKey
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TTL = 24 * 3600.0  # seconds
+RETRY_AFTER = 60.0  # seconds, after failing to load the entitlements of a token
+
+_API_VERSION_PREFIX = "/v3/"
+_UPDATED_SINCE = (
+    "updated-since"  # not a route of the zones' access, but allowed by any past one
+)
+
+Entitlements = dict[ZoneKey, frozenset[str] | None]
+"""The routes each zone is entitled to (`None` if unknown)."""
+
+
+def _route(request: snug.Request) -> str | None:
+    """The route of a request to a geolocated endpoint (e.g. 'carbon-intensity/past'), if any."""
+    path: str = urllib.parse.urlsplit(request.url).path
+    endpoint = ENDPOINTS.get(path)
+    if endpoint is None or not endpoint.geolocated:
+        return None
+    return path.removeprefix(_API_VERSION_PREFIX)
+
+
+def _is_entitled(route: str, routes: frozenset[str]) -> bool:
+    if route == _UPDATED_SINCE:
+        return any(r.split("/")[-1].startswith("past") for r in routes)
+    return route in routes
+
+
+def _entitlements(zones: schemas.Zones) -> Entitlements:
+    return {
+        zone_key: None if metadata.access is None else frozenset(metadata.access)
+        for zone_key, metadata in zones.items()
+    }
+
+
+class EntitlementClient(ClientWrapper):
+    """A client wrapper rejecting the requests to routes their zone is not entitled to with the token of the request,
+    without sending them.
+
+    Only requests by zone key are checked: requests by coordinates, or to zones (or routes) the entitlements of the
+    token don't mention, are always sent. The updated-since route is entitled to zones entitled to any past route.
+
+    Examples:
+        >>> import voltorb
+        >>> execute = voltorb.executor(auth=voltorb.token_auth("..."), client=EntitlementClient())
+
+    Args:
+        client (optional): The wrapped client.
+        ttl (optional): How long the entitlements of a token are cached for, in seconds.
+    """
+
+    def __init__(self, client: Any = None, *, ttl: float = DEFAULT_TTL) -> None:
+        super().__init__(client)
+        self.ttl = ttl
+        self.stats: Counter[str] = Counter()
+        """The number of requests rejected, and of entitlements loaded (or failed to)."""
+        # the entitlements of tokens, with when they expire (as time.monotonic() timestamps)
+        self._entitlements: dict[str | None, tuple[float, Entitlements]] = {}
+        self._lock = threading.Lock()
+        # so that threads wait for the load of the entitlements of their own token only
+        self._token_locks: dict[str | None, threading.Lock] = {}
+        self._loading: dict[str | None, asyncio.Task[Entitlements]] = {}
+
+    @staticmethod
+    def _token(request: snug.Request) -> str | None:
+        token: str | None = request.headers.get("auth-token")
+        return token
+
+    @staticmethod
+    def _zones_request(request: snug.Request) -> snug.Request:
+        # the zones endpoint of the same host as the request, with the same (e.g. authentication) headers
+        scheme, netloc, *_ = urllib.parse.urlsplit(request.url)
+        template = request_template("GET", f"{scheme}://{netloc}{Api.get_zones.path}")
+        return template.with_headers(request.headers)
+
+    def _cached(self, token: str | None) -> Entitlements | None:
+        cached = self._entitlements.get(token)
+        if cached is None or cached[0] <= time.monotonic():
+            return None
+        return cached[1]
+
+    def _token_lock(self, token: str | None) -> threading.Lock:
+        with self._lock:
+            return self._token_locks.setdefault(token, threading.Lock())
+
+    def _loaded(self, token: str | None, zones: snug.Response | None) -> Entitlements:
+        entitlements = None
+        if zones is not None and zones.status_code == 200:  # noqa: PLR2004
+            with contextlib.suppress(ValidationError):
+                entitlements = _entitlements(deserialiser(zones, schemas.Zones))
+        with self._lock:
+            if entitlements is None:
+                # requests are sent unchecked until retrying
+                self.stats["load_errors"] += 1
+                self._entitlements[token] = (time.monotonic() + RETRY_AFTER, {})
+                return {}
+            self.stats["loads"] += 1
+            self._entitlements[token] = (time.monotonic() + self.ttl, entitlements)
+            return entitlements
+
+    def _rejection(
+        self, request: snug.Request, route: str, entitlements: Entitlements
+    ) -> snug.Response | None:
+        zone = request.params.get("zone")
+        routes = entitlements.get(zone)
+        if routes is None or _is_entitled(route, routes):
+            return None
+        self.stats["rejected"] += 1
+        message = f"Zone {zone!r} is not entitled to route {route!r} with this token (checked locally)"
+        return snug.Response(
+            403,
+            json.dumps({"message": message}).encode(),
+            headers={"content-type": "application/json"},
+        )
+
+    def send(self, request: snug.Request) -> snug.Response:
+        route = _route(request)
+        if route is None:
+            return super().send(request)
+        token = self._token(request)
+        entitlements = self._cached(token)
+        if entitlements is None:
+            with self._token_lock(token):
+                # loaded by another thread while waiting
+                entitlements = self._cached(token)
+                if entitlements is None:
+                    try:
+                        zones = super().send(self._zones_request(request))
+                    except Exception:
+                        logger.exception("Failed to load the entitlements of the token")
+                        zones = None
+                    entitlements = self._loaded(token, zones)
+        return self._rejection(request, route, entitlements) or super().send(request)
+
+    async def _load_async(
+        self, token: str | None, request: snug.Request
+    ) -> Entitlements:
+        try:
+            zones = await super().send_async(self._zones_request(request))
+        except Exception:
+            logger.exception("Failed to load the entitlements of the token")
+            zones = None
+        return self._loaded(token, zones)
+
+    async def send_async(self, request: snug.Request) -> snug.Response:
+        route = _route(request)
+        if route is None:
+            return await super().send_async(request)
+        token = self._token(request)
+        entitlements = self._cached(token)
+        if entitlements is None:
+            # concurrent requests (e.g. of a batch) share a single load
+            task = self._loading.get(token)
+            if task is None or task.done():
+                task = asyncio.ensure_future(self._load_async(token, request))
+                self._loading[token] = task
+                task.add_done_callback(lambda _: self._loading.pop(token, None))
+            entitlements = await asyncio.shield(task)
+        return self._rejection(request, route, entitlements) or (
+            await super().send_async(request)
+        )
+
+    def __repr__(self) -> str:
+        return f"EntitlementClient({self.client!r})"
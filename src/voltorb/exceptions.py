@@ -5,7 +5,11 @@ Our exception hierarchy:
 * HTTPError
   x HTTPStatusError
     - UnauthorisedError
+    - ForbiddenError
+  x CircuitOpenError
+  x OfflineError
 * ValidationError
+* CacheError
 """
 
 from typing import Any
@@ -32,6 +36,23 @@ class UnauthorisedError(HTTPStatusError):
     """The response had a 401 HTTP status code."""
 
 
+class ForbiddenError(HTTPStatusError):
+    """The response had a 403 HTTP status code."""
+
+
+class CircuitOpenError(HTTPError):
+    """The request was not sent, as the circuit to its host is open (i.e. the host is deemed unavailable)."""
+
+    def __init__(self, message: str, *, host: str, retry_after: float) -> None:
+        self.host = host
+        self.retry_after = retry_after
+        super().__init__(message)
+
+
+class OfflineError(HTTPError):
+    """The request was not sent, as the client is offline, and has no cached response to it (recent enough)."""
+
+
 class ValidationError(Exception):
     """Raised on failed deserialisation of the API response."""
 
@@ -39,3 +60,7 @@ class ValidationError(Exception):
         self.response = response
         message = f"Error deserialising response into '{response_schema!r}'"
         super().__init__(message)
+
+
+class CacheError(Exception):
+    """The cache backend failed (e.g. its server is unreachable, or replied with an error)."""
@@ -0,0 +1,313 @@
+"""Bulk export of the records of the range endpoints to CSV, NDJSON or Parquet files.
+
+All (zone, window) queries are fanned out concurrently, but only a bounded number of them are in flight or buffered at
+any time, and their records are streamed to disk in order, so that memory use does not grow with the size of the
+export.
+"""
+
+import csv
+import json
+import os
+import time
+import typing
+from collections import deque
+from collections.abc import Callable, Iterator, Sequence
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime
+from enum import Enum
+from pathlib import Path
+from types import UnionType
+from typing import IO, Any, Protocol
+
+import attrs
+from attrs import define
+
+from voltorb._helpers import optional_import
+from voltorb._patches import Query, execute
+from voltorb.api import ENDPOINTS, Endpoint
+from voltorb.serde import converter
+from voltorb.streaming import MAX_WINDOW, windows
+from voltorb.typing import ZoneKey
+
+pa = optional_import("pyarrow")
+pq = optional_import("pyarrow.parquet")
+
+DEFAULT_CONCURRENCY = 8
+
+DATASETS: dict[str, Endpoint[..., Any]] = {
+    path.split("/")[2]: endpoint
+    for path, endpoint in ENDPOINTS.items()
+    if path.endswith("/past-range")
+}
+"""The range endpoints which can be exported, by dataset name (e.g. 'carbon-intensity')."""
+
+FORMATS = ("csv", "ndjson", "parquet")
+
+_PARQUET_ROW_GROUP_SIZE = 64 * 1024
+
+
+def record_schema(dataset: str) -> type:
+    """The schema of the records of a dataset."""
+    (schema,) = typing.get_args(
+        attrs.fields_dict(DATASETS[dataset].response_schema)["data"].type
+    )
+    return typing.cast(type, schema)
+
+
+def flat_columns(record_type: type, prefix: str = "") -> Iterator[tuple[str, Any]]:
+    """The (flattened, see :func:`flatten`) columns of records, and their types."""
+    for f in attrs.fields(record_type):
+        tp = f.type
+        if typing.get_origin(tp) in (typing.Union, UnionType):
+            (tp,) = (arg for arg in typing.get_args(tp) if arg is not type(None))
+        if attrs.has(tp):
+            yield from flat_columns(tp, f"{prefix}{f.name}.")
+        else:
+            yield f"{prefix}{f.name}", tp
+
+
+def flatten(record: Any, prefix: str = "") -> dict[str, Any]:
+    """Flattens a record into a row of scalar columns, e.g. for CSV or Parquet files.
+
+    Nested records are flattened into dotted columns (e.g. 'power_consumption_breakdown.coal'), enums into their value,
+    and mappings with arbitrary keys (e.g. the imports of each neighbouring zone) into JSON strings.
+    """
+    row: dict[str, Any] = {}
+    for f in attrs.fields(type(record)):
+        name, value = f"{prefix}{f.name}", getattr(record, f.name)
+        if attrs.has(type(value)):
+            row |= flatten(value, f"{name}.")
+        elif isinstance(value, Enum):
+            row[name] = value.value
+        elif isinstance(value, dict):
+            row[name] = json.dumps(value, sort_keys=True)
+        else:
+            row[name] = value
+    return row
+
+
+class _Writer(Protocol):
+    def write(self, zone: ZoneKey, records: Sequence[Any]) -> int: ...
+
+    def close(self) -> None: ...
+
+
+class _CsvWriter:
+    def __init__(self, file: IO[str], record_type: type) -> None:
+        self._file = file
+        columns = ["zone"] + [c for c, _ in flat_columns(record_type) if c != "zone"]
+        self._writer = csv.DictWriter(file, columns)
+        self._writer.writeheader()
+
+    def write(self, zone: ZoneKey, records: Sequence[Any]) -> int:
+        for record in records:
+            row = {"zone": zone} | flatten(record)
+            self._writer.writerow(
+                {
+                    k: v.isoformat() if isinstance(v, datetime) else v
+                    for k, v in row.items()
+                }
+            )
+        return len(records)
+
+    def close(self) -> None:
+        self._file.close()
+
+
+class _NdjsonWriter:
+    def __init__(self, file: IO[str], record_type: type) -> None:  # noqa: ARG002
+        self._file = file
+
+    def write(self, zone: ZoneKey, records: Sequence[Any]) -> int:
+        for record in records:
+            # records keep the shape of the API payloads
+            payload = {"zone": zone} | converter.unstructure(record)
+            self._file.write(json.dumps(payload) + "\n")
+        return len(records)
+
+    def close(self) -> None:
+        self._file.close()
+
+
+def _arrow_type(tp: Any) -> Any:
+    if tp is bool:
+        return pa.bool_()  # type: ignore[union-attr]
+    if tp is int:
+        return pa.int64()  # type: ignore[union-attr]
+    if tp is float:
+        return pa.float64()  # type: ignore[union-attr]
+    if tp is datetime:
+        return pa.timestamp("us", tz="UTC")  # type: ignore[union-attr]
+    return pa.string()  # type: ignore[union-attr]
+
+
+class _ParquetWriter:
+    def __init__(self, path: Path, record_type: type) -> None:
+        columns = [("zone", str)] + [
+            (c, t) for c, t in flat_columns(record_type) if c != "zone"
+        ]
+        self._schema = pa.schema([(c, _arrow_type(t)) for c, t in columns])  # type: ignore[union-attr]
+        self._writer = pq.ParquetWriter(path, self._schema)  # type: ignore[union-attr]
+        self._rows: list[dict[str, Any]] = []
+
+    def _flush(self) -> None:
+        if self._rows:
+            table = pa.Table.from_pylist(self._rows, schema=self._schema)  # type: ignore[union-attr]
+            self._writer.write_table(table)
+            self._rows = []
+
+    def write(self, zone: ZoneKey, records: Sequence[Any]) -> int:
+        self._rows.extend({"zone": zone} | flatten(record) for record in records)
+        if len(self._rows) >= _PARQUET_ROW_GROUP_SIZE:
+            self._flush()
+        return len(records)
+
+    def close(self) -> None:
+        self._flush()
+        self._writer.close()
+
+
+def _writer(path: Path, fmt: str, record_type: type) -> _Writer:
+    if fmt == "parquet":
+        if pa is None:
+            msg = "Parquet exports require the optional pyarrow package (pip install voltorb[export])"
+            raise ImportError(msg)
+        return _ParquetWriter(path, record_type)
+    file = path.open("w", newline="" if fmt == "csv" else None, encoding="utf-8")
+    return (
+        _CsvWriter(file, record_type)
+        if fmt == "csv"
+        else _NdjsonWriter(file, record_type)
+    )
+
+
+def write(
+    dataset: str,
+    zone: ZoneKey,
+    records: Sequence[Any],
+    path: str | os.PathLike[str],
+    *,
+    fmt: str = "csv",
+) -> int:
+    """Writes the records of a dataset to a file (overwritten if it exists), in the same format as :func:`export`.
+
+    Returns:
+        The number of records written.
+    """
+    writer = _writer(Path(path), fmt, record_schema(dataset))
+    try:
+        return writer.write(zone, records)
+    finally:
+        writer.close()
+
+
+@define
+class ExportProgress:
+    """The progress of an export.
+
+    Args:
+        total: The number of (zone, window) queries of the export.
+        done: The number of queries whose records were written.
+        records: The number of records written.
+        started_at: When the export started (as a :func:`time.perf_counter` timestamp).
+    """
+
+    total: int
+    done: int = 0
+    records: int = 0
+    started_at: float = attrs.field(factory=time.perf_counter)
+
+    @property
+    def elapsed(self) -> float:
+        """The time elapsed since the export started, in seconds."""
+        return time.perf_counter() - self.started_at
+
+    @property
+    def throughput(self) -> float:
+        """The number of records written per second."""
+        elapsed = self.elapsed
+        return self.records / elapsed if elapsed else 0.0
+
+
+def export(  # noqa: PLR0913
+    dataset: str,
+    zones: Sequence[ZoneKey],
+    start: datetime,
+    end: datetime,
+    path: str | os.PathLike[str],
+    *,
+    fmt: str = "csv",
+    execute: Callable[[Query[Any]], Any] = execute,
+    concurrency: int = DEFAULT_CONCURRENCY,
+    progress: Callable[[ExportProgress], None] | None = None,
+    **kwargs: Any,
+) -> ExportProgress:
+    """Exports the records of a range endpoint, for many zones over an arbitrarily long date range, to a file.
+
+    Examples:
+        >>> from voltorb import executor, token_auth
+        >>> execute = executor(auth=token_auth("..."))
+        >>> export(  # doctest: +SKIP
+        ...     "carbon-intensity", ["IT", "FR"], datetime(2023, 1, 1), datetime(2024, 1, 1), "ci.csv", execute=execute
+        ... )
+
+    Args:
+        dataset: The name of the dataset (see :data:`DATASETS`).
+        zones: The zones to export.
+        start: The start of the date range.
+        end: The end of the date range (excluded).
+        path: The path of the file to write (overwritten if it exists).
+        fmt (optional): The format of the file, one of 'csv', 'ndjson' or 'parquet'.
+        execute (optional): The executor with which to query the API (e.g. to add authentication).
+        concurrency (optional): The maximum number of queries in flight at any time.
+        progress (optional): A callback notified of the progress of the export, after each query.
+        **kwargs: The other arguments of the endpoint (e.g. `disable_estimations`).
+
+    Returns:
+        The final progress of the export.
+
+    Raises:
+        ValueError: on unknown datasets or formats.
+    """
+    try:
+        endpoint = DATASETS[dataset]
+    except KeyError:
+        msg = f"Unknown dataset {dataset!r}, expected one of {sorted(DATASETS)}"
+        raise ValueError(msg) from None
+    if fmt not in FORMATS:
+        msg = f"Unknown format {fmt!r}, expected one of {FORMATS}"
+        raise ValueError(msg)
+    if concurrency < 1:
+        msg = f"concurrency must be a positive integer, got {concurrency!r}"
+        raise ValueError(msg)
+
+    jobs = [
+        (zone, *window) for zone in zones for window in windows(start, end, MAX_WINDOW)
+    ]
+    state = ExportProgress(total=len(jobs))
+
+    writer = _writer(Path(path), fmt, record_schema(dataset))
+    pool = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="voltorb")
+    # queries are downloaded ahead of the one being written, up to twice the concurrency (so that workers never idle)
+    pending: deque[tuple[ZoneKey, Future[Any]]] = deque()
+
+    def drain() -> None:
+        zone, future = pending.popleft()
+        state.records += writer.write(zone, future.result().data)
+        state.done += 1
+        if progress is not None:
+            progress(state)
+
+    try:
+        for zone, window_start, window_end in jobs:
+            query = endpoint(zone, window_start, window_end, **kwargs)
+            pending.append((zone, pool.submit(execute, query)))
+            if len(pending) >= 2 * concurrency:
+                drain()
+        while pending:
+            drain()
+    finally:
+        pool.shutdown(cancel_futures=True)
+        writer.close()
+
+    return state
@@ -0,0 +1,401 @@
+"""A load-testing harness, comparing the throughput, latency and cost of HTTP transports and concurrency settings.
+
+Each scenario drives a number of queries, at a given concurrency, through :func:`voltorb.execute` (over a pool of
+threads) for sync transports, or :func:`voltorb.execute_async` (over concurrent tasks) for async ones. By default, each
+scenario runs in a fresh process, so that its CPU time and peak memory are measured in isolation, and against a local
+:class:`voltorb.testing.StandInServer` running in the parent process.
+
+Examples:
+    python -m voltorb.loadtest --requests 1000 --concurrency 8 32 --latency 0.05
+    python -m voltorb.loadtest --url https://api.electricitymap.org --token ... --transports urllib httpx-async
+"""
+
+import argparse
+import asyncio
+import contextlib
+import json
+import multiprocessing
+import statistics
+import sys
+import threading
+import time
+from collections.abc import AsyncIterator, Callable, Iterator, Sequence
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any
+
+from attrs import asdict, frozen
+
+from voltorb._helpers import optional_import
+from voltorb._patches import async_executor, executor
+from voltorb.api import Api
+from voltorb.auth import token_auth
+from voltorb.clients import RedirectingClient
+from voltorb.typing import ZoneKey
+
+httpx = optional_import("httpx")
+aiohttp = optional_import("aiohttp")
+h2 = optional_import("h2")
+
+DEFAULT_REQUESTS = 500
+DEFAULT_CONCURRENCY = 16
+DEFAULT_ZONES = ("DE", "FR", "IT-CSO", "DK-DK1")
+
+
+@contextlib.contextmanager
+def _urllib(concurrency: int) -> Iterator[Any]:  # noqa: ARG001
+    yield None  # the default client
+
+
+@contextlib.contextmanager
+def _httpx(concurrency: int) -> Iterator[Any]:
+    limits = httpx.Limits(max_connections=concurrency)  # type: ignore[union-attr]
+    with httpx.Client(limits=limits) as client:  # type: ignore[union-attr]
+        yield client
+
+
+@contextlib.asynccontextmanager
+async def _httpx_async(concurrency: int) -> AsyncIterator[Any]:
+    limits = httpx.Limits(max_connections=concurrency)  # type: ignore[union-attr]
+    async with httpx.AsyncClient(limits=limits) as client:  # type: ignore[union-attr]
+        yield client
+
+
+@contextlib.asynccontextmanager
+async def _httpx_http2(concurrency: int) -> AsyncIterator[Any]:
+    from voltorb.transports import Http2Client
+
+    async with Http2Client(max_connections=concurrency) as client:
+        yield client
+
+
+@contextlib.asynccontextmanager
+async def _aiohttp(concurrency: int) -> AsyncIterator[Any]:
+    connector = aiohttp.TCPConnector(limit=concurrency)  # type: ignore[union-attr]
+    async with aiohttp.ClientSession(connector=connector) as session:  # type: ignore[union-attr]
+        yield session
+
+
+@frozen
+class Transport:
+    """An HTTP transport under test.
+
+    Args:
+        name: The name of the transport.
+        is_async: Whether the transport is driven by :func:`voltorb.execute_async` (or :func:`voltorb.execute`).
+        client: The context manager providing the client, given the concurrency.
+        available: Whether the (optional) dependencies of the transport are installed.
+    """
+
+    name: str
+    is_async: bool
+    client: Callable[[int], Any]
+    available: bool = True
+
+
+TRANSPORTS = {
+    t.name: t
+    for t in (
+        Transport("urllib", is_async=False, client=_urllib),
+        Transport("httpx", is_async=False, client=_httpx, available=bool(httpx)),
+        Transport(
+            "httpx-async", is_async=True, client=_httpx_async, available=bool(httpx)
+        ),
+        Transport(
+            "httpx-http2",
+            is_async=True,
+            client=_httpx_http2,
+            available=bool(httpx and h2),
+        ),
+        Transport("aiohttp", is_async=True, client=_aiohttp, available=bool(aiohttp)),
+    )
+}
+"""All the transports which can be load-tested, by name."""
+
+
+@frozen
+class LoadTestResult:
+    """The measurements of a load-testing scenario.
+
+    Args:
+        transport: The name of the transport.
+        concurrency: The maximum number of requests in flight at any time.
+        requests: The number of requests sent.
+        errors: The number of requests which failed.
+        duration: The wall-clock duration of the scenario, in seconds.
+        latencies: The (sorted) latencies of the successful requests, in seconds.
+        cpu_time: The CPU time (user and system, of all threads) spent on the scenario, in seconds.
+        peak_rss: The peak resident memory of the process, in bytes (if known).
+    """
+
+    transport: str
+    concurrency: int
+    requests: int
+    errors: int
+    duration: float
+    latencies: tuple[float, ...]
+    cpu_time: float
+    peak_rss: int | None
+
+    @property
+    def throughput(self) -> float:
+        """The number of requests per second."""
+        return self.requests / self.duration if self.duration else 0.0
+
+    @property
+    def cpu_per_request(self) -> float:
+        """The CPU time per request, in seconds."""
+        return self.cpu_time / self.requests if self.requests else 0.0
+
+    def percentile(self, p: int) -> float:
+        """A percentile (e.g. 95) of the latencies of the successful requests, in seconds."""
+        if len(self.latencies) < 2:  # noqa: PLR2004
+            return self.latencies[0] if self.latencies else float("nan")
+        return statistics.quantiles(self.latencies, n=100, method="inclusive")[p - 1]
+
+    def summary(self) -> dict[str, Any]:
+        """The headline measurements, e.g. for JSON reports."""
+        summary = asdict(self, filter=lambda a, _: a.name != "latencies")
+        return summary | {
+            "throughput": self.throughput,
+            "p50": self.percentile(50),
+            "p95": self.percentile(95),
+            "p99": self.percentile(99),
+            "cpu_per_request": self.cpu_per_request,
+        }
+
+
+def _peak_rss() -> int | None:
+    try:
+        import resource
+    except ImportError:  # pragma: no cover
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kibibytes on linux, bytes on macOS
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def _run_sync(
+    transport: Transport, url: str, queries: Sequence[Any], concurrency: int, auth: Any
+) -> tuple[list[float], int]:
+    latencies: list[float] = []
+    errors = 0
+    lock = threading.Lock()
+
+    with transport.client(concurrency) as client:
+        execute = executor(auth=auth, client=RedirectingClient(url, client))
+
+        def timed(query: Any) -> None:
+            nonlocal errors
+            start = time.perf_counter()
+            try:
+                execute(query)
+            except Exception:  # noqa: BLE001
+                with lock:
+                    errors += 1
+            else:
+                with lock:
+                    latencies.append(time.perf_counter() - start)
+
+        with ThreadPoolExecutor(concurrency, thread_name_prefix="loadtest") as pool:
+            for future in [pool.submit(timed, query) for query in queries]:
+                future.result()
+
+    return latencies, errors
+
+
+async def _run_async(
+    transport: Transport, url: str, queries: Sequence[Any], concurrency: int, auth: Any
+) -> tuple[list[float], int]:
+    latencies: list[float] = []
+    errors = 0
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async with transport.client(concurrency) as client:
+        execute = async_executor(auth=auth, client=RedirectingClient(url, client))
+
+        async def timed(query: Any) -> None:
+            nonlocal errors
+            async with semaphore:
+                start = time.perf_counter()
+                try:
+                    await execute(query)
+                except Exception:  # noqa: BLE001
+                    errors += 1
+                else:
+                    latencies.append(time.perf_counter() - start)
+
+        await asyncio.gather(*(timed(query) for query in queries))
+
+    return latencies, errors
+
+
+def measure(  # noqa: PLR0913
+    transport: str,
+    *,
+    url: str,
+    requests: int = DEFAULT_REQUESTS,
+    concurrency: int = DEFAULT_CONCURRENCY,
+    zones: Sequence[ZoneKey] = DEFAULT_ZONES,
+    token: str | None = None,
+) -> LoadTestResult:
+    """Runs a load-testing scenario in the current process.
+
+    Args:
+        transport: The name of the transport (see :data:`TRANSPORTS`).
+        url: The base URL of the API (or of a stand-in).
+        requests (optional): The number of requests to send.
+        concurrency (optional): The maximum number of requests in flight at any time.
+        zones (optional): The zones to cycle through, requesting their latest carbon intensity.
+        token (optional): The API token.
+
+    Raises:
+        ValueError: if the transport is unknown or unavailable.
+    """
+    try:
+        transport_ = TRANSPORTS[transport]
+    except KeyError:
+        msg = f"Unknown transport {transport!r}, expected one of {sorted(TRANSPORTS)}"
+        raise ValueError(msg) from None
+    if not transport_.available:
+        msg = f"Transport {transport!r} is missing optional dependencies"
+        raise ValueError(msg)
+
+    auth = None if token is None else token_auth(token)
+    queries = [
+        Api.carbon_intensity.get_latest(zones[i % len(zones)]) for i in range(requests)
+    ]
+
+    cpu_start, start = time.process_time(), time.perf_counter()
+    if transport_.is_async:
+        latencies, errors = asyncio.run(
+            _run_async(transport_, url, queries, concurrency, auth)
+        )
+    else:
+        latencies, errors = _run_sync(transport_, url, queries, concurrency, auth)
+    duration, cpu_time = time.perf_counter() - start, time.process_time() - cpu_start
+
+    return LoadTestResult(
+        transport=transport,
+        concurrency=concurrency,
+        requests=requests,
+        errors=errors,
+        duration=duration,
+        latencies=tuple(sorted(latencies)),
+        cpu_time=cpu_time,
+        peak_rss=_peak_rss(),
+    )
+
+
+def run(
+    transports: Sequence[str],
+    concurrencies: Sequence[int],
+    *,
+    isolate: bool = True,
+    **kwargs: Any,
+) -> list[LoadTestResult]:
+    """Runs the matrix of load-testing scenarios of the given transports and concurrencies.
+
+    Args:
+        transports: The names of the transports (see :data:`TRANSPORTS`).
+        concurrencies: The concurrencies.
+        isolate (optional): Whether to run each scenario in a fresh process, so that CPU time and memory are measured
+            in isolation (including from a stand-in server running in this process).
+        **kwargs: The other settings of the scenarios (see :func:`measure`).
+    """
+    results = []
+    for transport in transports:
+        for concurrency in concurrencies:
+            if not isolate:
+                results.append(measure(transport, concurrency=concurrency, **kwargs))
+                continue
+            context = multiprocessing.get_context("spawn")
+            with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+                future = pool.submit(
+                    measure, transport, concurrency=concurrency, **kwargs
+                )
+                results.append(future.result())
+    return results
+
+
+def report(results: Sequence[LoadTestResult]) -> str:
+    """A table of the headline measurements of load-testing scenarios."""
+    header = (
+        f"{'transport':<12} {'conc':>5} {'reqs':>6} {'errors':>6} {'req/s':>9} "
+        f"{'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'cpu ms/req':>10} {'peak MiB':>9}"
+    )
+    lines = [header, "-" * len(header)]
+    for r in results:
+        rss = "n/a" if r.peak_rss is None else f"{r.peak_rss / 2**20:.1f}"
+        lines.append(
+            f"{r.transport:<12} {r.concurrency:>5} {r.requests:>6} {r.errors:>6} "
+            f"{r.throughput:>9.1f} {r.percentile(50) * 1e3:>8.1f} "
+            f"{r.percentile(95) * 1e3:>8.1f} {r.percentile(99) * 1e3:>8.1f} "
+            f"{r.cpu_per_request * 1e3:>10.3f} {rss:>9}"
+        )
+    return "\n".join(lines)
+
+
+def _parser() -> argparse.ArgumentParser:
+    available = [name for name, t in TRANSPORTS.items() if t.available]
+    parser = argparse.ArgumentParser(
+        prog="python -m voltorb.loadtest", description=__doc__.split("\n")[0]
+    )
+    parser.add_argument(
+        "--url",
+        help="the base URL of the API, defaults to a local stand-in of the API",
+    )
+    parser.add_argument("--token", help="the API token")
+    parser.add_argument(
+        "--transports", nargs="+", default=available, choices=sorted(TRANSPORTS)
+    )
+    parser.add_argument(
+        "--concurrency", nargs="+", type=int, default=[DEFAULT_CONCURRENCY]
+    )
+    parser.add_argument("--requests", type=int, default=DEFAULT_REQUESTS)
+    parser.add_argument("--zones", nargs="+", default=list(DEFAULT_ZONES))
+    stand_in = parser.add_argument_group("stand-in", "settings of the local stand-in")
+    stand_in.add_argument("--latency", type=float, default=0.0)
+    stand_in.add_argument("--jitter", type=float, default=0.0)
+    stand_in.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument(
+        "--no-isolate",
+        dest="isolate",
+        action="store_false",
+        help="run all scenarios in this process",
+    )
+    parser.add_argument("--json", action="store_true", help="report as JSON lines")
+    return parser
+
+
+def main(argv: Sequence[str] | None = None) -> None:
+    args = _parser().parse_args(argv)
+
+    with contextlib.ExitStack() as stack:
+        url = args.url
+        if url is None:
+            from voltorb.testing import StandInServer
+
+            server = StandInServer(
+                latency=args.latency, jitter=args.jitter, error_rate=args.error_rate
+            )
+            url = stack.enter_context(server).url
+
+        results = run(
+            args.transports,
+            args.concurrency,
+            isolate=args.isolate,
+            url=url,
+            requests=args.requests,
+            zones=args.zones,
+            token=args.token,
+        )
+
+    if args.json:
+        for result in results:
+            print(json.dumps(result.summary()))  # noqa: T201
+    else:
+        print(report(results))  # noqa: T201
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""Point lookups of many (geolocation, datetime) pairs, coalesced into the fewest range requests.
+
+Looking up scattered hours one past request at a time costs a request per hour. Instead, the hours of each
+geolocation are grouped into the fewest windows the range endpoints accept (10 days at most), which are queried
+concurrently, and the records of the looked up hours picked out of their results.
+"""
+
+from collections.abc import Iterable, Sequence
+from datetime import datetime, timedelta
+from typing import Any, TypeVar
+
+from voltorb._helpers import utc
+from voltorb._patches import Query
+from voltorb.batch import DEFAULT_MAX_CONCURRENCY, Batch, Mapped
+from voltorb.streaming import MAX_WINDOW, RangeEndpoint
+from voltorb.typing import Geolocation
+
+T = TypeVar("T")
+
+_HOUR = timedelta(hours=1)
+
+Point = tuple[Geolocation, datetime]
+
+_Span = tuple[datetime, datetime]
+
+
+def _hour(dt: datetime) -> datetime:
+    """The start of the (UTC) hour of a datetime, naive datetimes being UTC."""
+    return utc(dt).replace(minute=0, second=0, microsecond=0)
+
+
+def coalesce(
+    datetimes: Iterable[datetime], window: timedelta = MAX_WINDOW
+) -> list[_Span]:
+    """Groups the hours of datetimes into the fewest windows of (at most) the given size covering them.
+
+    Each window starts at the earliest hour not covered yet, and ends right after the last hour within its size.
+
+    Examples:
+        >>> spans = coalesce([datetime(2024, 1, 1), datetime(2024, 1, 9, 12, 30), datetime(2024, 1, 15)])
+        >>> [(f"{s:%d %H:%M}", f"{e:%d %H:%M}") for s, e in spans]
+        [('01 00:00', '09 13:00'), ('15 00:00', '15 01:00')]
+
+    Args:
+        datetimes: The datetimes to cover.
+        window (optional): The largest size of the windows.
+    """
+    if window < _HOUR:
+        msg = f"window must be at least an hour, got {window!r}"
+        raise ValueError(msg)
+
+    spans: list[_Span] = []
+    for hour in sorted(set(map(_hour, datetimes))):
+        if spans and hour + _HOUR - spans[-1][0] <= window:
+            spans[-1] = (spans[-1][0], hour + _HOUR)
+        else:
+            spans.append((hour, hour + _HOUR))
+    return spans
+
+
+def lookup_past(
+    endpoint: RangeEndpoint[T],
+    points: Iterable[Point],
+    *,
+    window: timedelta = MAX_WINDOW,
+    max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+    **kwargs: Any,
+) -> Query[dict[Point, T]]:
+    """The query for the records of many (geolocation, datetime) pairs, in the fewest requests to a range endpoint.
+
+    Pairs of hours the range endpoint returns no record for are left out of the results.
+
+    Examples:
+        >>> from voltorb import electricity_maps
+        >>> query = lookup_past(
+        ...     electricity_maps.carbon_intensity.get_past_range,
+        ...     [("FR", datetime(2024, 1, 1, 9)), ("FR", datetime(2024, 1, 3, 17)), ("DE", datetime(2024, 1, 1, 9))],
+        ... )
+
+    Args:
+        endpoint: The range endpoint to query (e.g. ``electricity_maps.carbon_intensity.get_past_range``).
+        points: The (geolocation, datetime) pairs for which to get data.
+        window (optional): The largest date range of each query.
+        max_concurrency (optional): The maximum number of queries in flight at any time.
+        **kwargs: The other arguments of the endpoint (e.g. `disable_estimations`).
+
+    Returns:
+        A query for the records of the pairs, keyed by pair (as given).
+    """
+    points = list(points)
+    datetimes: dict[Geolocation, list[datetime]] = {}
+    for geolocation, dt in points:
+        datetimes.setdefault(geolocation, []).append(dt)
+
+    queries: dict[tuple[Geolocation, _Span], Query[Sequence[T]]] = {
+        (geolocation, span): Mapped(
+            endpoint(geolocation, *span, **kwargs), lambda result: result.data
+        )
+        for geolocation, dts in datetimes.items()
+        for span in coalesce(dts, window)
+    }
+
+    def pick(results: dict[tuple[Geolocation, _Span], Sequence[Any]]) -> dict[Point, T]:
+        records = {
+            (geolocation, _hour(record.datetime)): record
+            for (geolocation, _), rs in results.items()
+            for record in rs
+        }
+        return {
+            point: records[key]
+            for point in points
+            if (key := (point[0], _hour(point[1]))) in records
+        }
+
+    return Mapped(Batch(queries, max_concurrency=max_concurrency), pick)
@@ -1,16 +1,21 @@
 """Common middlewares, decorators, and other higher-oder functions for handling request / response API interactions."""
 
+import hashlib
 import json
-from collections.abc import Callable
-from functools import partial
-from typing import ParamSpec, TypeVar
+import threading
+from collections import Counter, OrderedDict
+from collections.abc import Callable, Generator
+from functools import cache, wraps
+from typing import Any, Generic, ParamSpec, TypeVar
 
 import cattrs
 import snug
-from gentools import compose, map_return, relay, reusable
+from attrs import define, field
 
-from voltorb._patches import Query
+from voltorb._patches import Query, iterate
+from voltorb.compression import ACCEPT_ENCODING
 from voltorb.exceptions import (
+    ForbiddenError,
     HTTPStatusError,
     UnauthorisedError,
     ValidationError,
@@ -21,7 +26,11 @@ P = ParamSpec("P")
 T = TypeVar("T")
 
 
-_CUSTOM_HEADERS = {"content-type": "application/json", "user-agent": "voltorb/0.1.0"}
+_CUSTOM_HEADERS = {
+    "content-type": "application/json",
+    "user-agent": "voltorb/0.1.0",
+    "accept-encoding": ACCEPT_ENCODING,
+}
 
 
 def _raise_for_status(response: snug.Response, request: snug.Request) -> None:
@@ -30,6 +39,7 @@ def _raise_for_status(response: snug.Response, request: snug.Request) -> None:
     Raises:
         :class:`HTTPStatusError`: on a response with a HTTP status error.
         :class:`UnauthorisedError`: on a response with a 401 Unauthorized HTTP status errors.
+        :class:`ForbiddenError`: on a response with a 403 Forbidden HTTP status errors.
     """
 
     if response.status_code < 400:  # noqa: PLR2004
@@ -41,11 +51,30 @@ def _raise_for_status(response: snug.Response, request: snug.Request) -> None:
     # might be useful for users to be able to discriminate
     if response.status_code == 401:  # noqa: PLR2004
         raise UnauthorisedError(message, response=response, request=request)
+    if response.status_code == 403:  # noqa: PLR2004
+        raise ForbiddenError(message, response=response, request=request)
 
     # else raise basic error wrapper
     raise HTTPStatusError(message, response=response, request=request)
 
 
+def _prepare_request(request: snug.Request) -> snug.Request:
+    """Adds the custom headers to a request, unless it already carries them (e.g. it was built from a template)."""
+    if request.headers.items() >= _CUSTOM_HEADERS.items():
+        return request
+    return request.with_headers(_CUSTOM_HEADERS)
+
+
+@cache
+def request_template(method: str, url: str) -> snug.Request:
+    """Returns the static request template of an endpoint.
+
+    The template already carries the custom headers added by :func:`request_preparation_middleware`, and is only built
+    once per endpoint: queries then just need to merge their params into it (:meth:`snug.Request.with_params`).
+    """
+    return snug.Request(method, url, headers=dict(_CUSTOM_HEADERS))
+
+
 def request_preparation_middleware(request: snug.Request) -> Query[snug.Response]:
     """Performs common 'preparation' of requests relayed through the middleware."""
     response = yield request.with_headers(_CUSTOM_HEADERS)
@@ -72,26 +101,138 @@ def deserialiser(response: snug.Response, response_schema: type[T]) -> T:
         raise ValidationError(response=response, response_schema=response_schema) from e
 
 
+DEFAULT_MAX_ENTRIES = 256
+
+
+@define
+class Deduplicator:
+    """Deserialises responses, reusing the previous value of a request when its response body didn't change.
+
+    Polled endpoints (e.g. the latest or history ones) mostly return byte-identical bodies, as their data only changes
+    hourly: hashing a body is much cheaper than parsing and structuring it again. Deduplication is opt-in, per endpoint
+    (see :class:`voltorb.api.Endpoint`), as the last values are retained in memory and shared between the queries of
+    the same request, and so must be treated as immutable (including their lists and dicts).
+
+    Args:
+        max_entries (optional): The maximum number of requests whose last value is kept (0 to disable).
+
+    Attributes:
+        stats: The number of deserialisations skipped ("hits") and done ("misses").
+    """
+
+    max_entries: int = DEFAULT_MAX_ENTRIES
+    stats: Counter[str] = field(factory=Counter, init=False)
+    _last: OrderedDict[tuple[Any, ...], tuple[bytes, Any]] = field(
+        factory=OrderedDict, init=False, repr=False
+    )
+    _lock: threading.Lock = field(factory=threading.Lock, init=False, repr=False)
+
+    def deserialise(
+        self, response: snug.Response, request: snug.Request, response_schema: type[T]
+    ) -> T:
+        """Deserialises the response of a request into the given schema (see :func:`deserialiser`)."""
+        if self.max_entries <= 0:
+            return deserialiser(response, response_schema=response_schema)
+
+        key = (request.url, tuple(request.params.items()), response_schema)
+        digest = hashlib.blake2b(response.content, digest_size=16).digest()
+        with self._lock:
+            last = self._last.get(key)
+            if last is not None and last[0] == digest:
+                self._last.move_to_end(key)
+                self.stats["hits"] += 1
+                return last[1]  # type: ignore[no-any-return]
+
+        value = deserialiser(response, response_schema=response_schema)
+        with self._lock:
+            self.stats["misses"] += 1
+            self._last[key] = (digest, value)
+            self._last.move_to_end(key)
+            while len(self._last) > self.max_entries:
+                self._last.popitem(last=False)
+        return value
+
+    def clear(self) -> None:
+        """Forgets the last values of all requests."""
+        with self._lock:
+            self._last.clear()
+
+
+class RestQuery(snug.Query[T], Generic[T]):  # type: ignore[misc]
+    """A reusable query relaying the requests of an endpoint through the shared middleware, and returning the response
+    as a deserialised model.
+
+    This has the same semantics as relaying the endpoint through :func:`request_preparation_middleware` and
+    :func:`error_handling_middleware`, and mapping its return through :func:`deserialiser`, but does so in a single
+    generator frame (rather than in a stack of composed generators), as it sits on the hot path of every query.
+
+    Responses are deserialised through the given deduplicator, if any (see :class:`Deduplicator`).
+    """
+
+    __slots__ = ("_endpoint", "_args", "_kwargs", "response_schema", "deduplicator")
+
+    def __init__(
+        self,
+        endpoint: Callable[..., Query[snug.Response]],
+        *args: Any,
+        response_schema: type[T],
+        deduplicator: Deduplicator | None = None,
+        **kwargs: Any,
+    ) -> None:
+        self._endpoint = endpoint
+        self._args = args
+        self._kwargs = kwargs
+        self.response_schema = response_schema
+        self.deduplicator = deduplicator
+
+    def __iter__(self) -> Generator[snug.Request, snug.Response, T]:
+        # a new endpoint generator on each iteration, so that the query is reusable
+        endpoint = iterate(self._endpoint(*self._args, **self._kwargs))
+
+        request = next(endpoint)
+        while True:
+            request = _prepare_request(request)
+            response = yield request
+            _raise_for_status(response, request=request)
+            try:
+                request = endpoint.send(response)
+            except StopIteration as e:
+                if self.deduplicator is None:
+                    return deserialiser(e.value, response_schema=self.response_schema)
+                return self.deduplicator.deserialise(
+                    e.value, request, response_schema=self.response_schema
+                )
+
+    def __repr__(self) -> str:
+        return f"RestQuery({self._endpoint.__qualname__}, response_schema={self.response_schema.__qualname__})"
+
+
 def rest_query(
-    *, response_schema: type[T]
+    *, response_schema: type[T], deduplicator: Deduplicator | None = None
 ) -> Callable[[Callable[P, Query[snug.Response]]], Callable[P, Query[T]]]:
     """Decorator that instruments generic API interactions by relaying requests through shared middleware,
     and returning the response as a deserialised model.
 
+    The decorated endpoints return a (reusable) :class:`RestQuery`, deserialising responses through the given
+    deduplicator, if any.
+
     References:
         https://snug.readthedocs.io/en/latest/advanced.html#composing-queries
     """
 
-    return compose(  # type: ignore[no-any-return]
-        # START
-        # -> Generator[snug.Request, snug.Response, snug.Response]
-        reusable,  # convenience function to make query reusable
-        # -> Iterator[Generator[snug.Request, snug.Response, snug.Response]]
-        relay(request_preparation_middleware, error_handling_middleware),
-        #       YIELDED snug.Request -> first middleware -> second middleware -> ...
-        #       RETURN snug.Response <- first middleware <- second middleware <- ... <- SEND snug.Response
-        # -> Iterator[Generator[snug.Request, snug.Response, snug.Response]]
-        map_return(partial(deserialiser, response_schema=response_schema)),
-        # -> Iterator[Generator[snug.Request, snug.Response, T]]
-        # END
-    )
+    def decorator(
+        endpoint: Callable[P, Query[snug.Response]],
+    ) -> Callable[P, Query[T]]:
+        @wraps(endpoint)
+        def query(*args: P.args, **kwargs: P.kwargs) -> Query[T]:
+            return RestQuery(
+                endpoint,
+                *args,
+                response_schema=response_schema,
+                deduplicator=deduplicator,
+                **kwargs,
+            )
+
+        return query
+
+    return decorator
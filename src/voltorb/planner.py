@@ -0,0 +1,361 @@
+"""Planning of the cheapest requests for the records of a dataset over a date range.
+
+The API serves the same hourly records through several endpoints, with their own spans and limits:
+
+* the history endpoints return the last 24 hours in a single request (and are available to free tokens),
+* the range endpoints return up to 10 days per request,
+* the past endpoints return a single hour per request.
+
+A :class:`QueryPlanner` splits a range into the spans already cached (if given a :class:`voltorb.RangeCache`) and the
+gaps to fetch, and picks the endpoints fetching the gaps in the fewest requests (and records), among the routes the
+zone is entitled to (if given a :class:`voltorb.ZoneCatalog`).
+"""
+
+import contextlib
+import math
+import typing
+from collections.abc import Collection, Sequence
+from datetime import datetime, timedelta, timezone
+from operator import attrgetter
+from typing import Any
+
+from attrs import field, frozen
+
+from voltorb._helpers import utc
+from voltorb._patches import Query
+from voltorb.api import ENDPOINTS, Endpoint
+from voltorb.batch import DEFAULT_MAX_CONCURRENCY, Batch, Mapped
+from voltorb.catalog import ZoneCatalog
+from voltorb.coverage import (
+    HISTORY_SPAN,
+    RangeCache,
+    _ceil_hour,
+    _floor_hour,
+)
+from voltorb.export import DATASETS
+from voltorb.streaming import MAX_WINDOW, windows
+from voltorb.typing import ZoneKey
+
+DEFAULT_ROUND_TRIP = 0.3  # seconds
+DEFAULT_RECORD_COST = 0.0001  # seconds, to transfer and deserialise a record
+
+CACHE = "cache"
+"""The route of the spans served from the cache."""
+
+_HOUR = timedelta(hours=1)
+
+_Span = tuple[datetime, datetime]
+
+
+def _hours(start: datetime, end: datetime) -> int:
+    return (end - start) // _HOUR
+
+
+def _clip(spans: Sequence[_Span], start: datetime, end: datetime) -> list[_Span]:
+    return [
+        (max(s, start), min(e, end)) for s, e in spans if max(s, start) < min(e, end)
+    ]
+
+
+@frozen
+class Step:
+    """A span of the range of a plan, and how its records are obtained.
+
+    Args:
+        route: The route of the request (e.g. 'carbon-intensity/past-range'), or :data:`CACHE` for cached spans.
+        start: The start of the span.
+        end: The end of the span (excluded).
+        records: The number of records transferred.
+    """
+
+    route: str
+    start: datetime
+    end: datetime
+    records: int
+
+    @property
+    def cached(self) -> bool:
+        """Whether the span is served from the cache, without any request."""
+        return self.route == CACHE
+
+
+@frozen
+class Plan:
+    """The requests planned for the records of a dataset over a date range, and their estimated cost.
+
+    Args:
+        dataset: The name of the dataset.
+        zone: The zone of the records.
+        start: The start of the date range.
+        end: The end of the date range (excluded).
+        steps: The cached spans and requests covering the range, in order.
+        latency: The estimated duration of the requests, in seconds.
+        query: The query for the records of the range, in order.
+    """
+
+    dataset: str
+    zone: ZoneKey
+    start: datetime
+    end: datetime
+    steps: tuple[Step, ...]
+    latency: float
+    query: Query[list[Any]] = field(repr=False, eq=False)
+
+    @property
+    def requests(self) -> int:
+        """The number of requests planned."""
+        return sum(not step.cached for step in self.steps)
+
+    def explain(self) -> str:
+        """A description of the planned requests, and of their estimated cost."""
+        lines = [
+            f"{self.dataset} of {self.zone} from {self.start:%Y-%m-%d %H:%M} to {self.end:%Y-%m-%d %H:%M} UTC: "
+            f"{self.requests} request(s), ~{self.latency:.2f}s"
+        ]
+        lines.extend(
+            f"  {step.route:<36} {step.start:%Y-%m-%d %H:%M} -> {step.end:%Y-%m-%d %H:%M}"
+            f"  {step.records:>5} record(s)"
+            for step in self.steps
+        )
+        return "\n".join(lines)
+
+
+class QueryPlanner:
+    """Plans (and queries) the records of datasets over date ranges in the fewest requests.
+
+    Within each range, spans cached by the given cache are not fetched again. Gaps within the last 24 hours are fetched
+    with a single history request, if that takes fewer requests (or less time) than fetching them on their own. Older
+    gaps of a single hour are fetched with the past endpoints, and longer ones with the range endpoints (in windows of
+    10 days). Only the routes the zone is entitled to, according to the given catalog, are used.
+
+    Examples:
+        >>> planner = QueryPlanner()
+        >>> plan = planner.plan("carbon-intensity", "FR", datetime(2024, 1, 1), datetime(2024, 1, 21))
+        >>> print(plan.explain())
+        carbon-intensity of FR from 2024-01-01 00:00 to 2024-01-21 00:00 UTC: 2 request(s), ~0.35s
+          carbon-intensity/past-range          2024-01-01 00:00 -> 2024-01-11 00:00    240 record(s)
+          carbon-intensity/past-range          2024-01-11 00:00 -> 2024-01-21 00:00    240 record(s)
+        >>> records = execute(plan.query)  # doctest: +SKIP
+
+    Args:
+        cache (optional): The cache of the records already fetched, into which fetched records are merged.
+        catalog (optional): The catalog of the routes each zone is entitled to.
+        round_trip (optional): The estimated duration of a request, in seconds.
+        record_cost (optional): The estimated cost of transferring and deserialising a record, in seconds.
+        max_concurrency (optional): The maximum number of requests in flight at any time.
+    """
+
+    def __init__(  # noqa: PLR0913
+        self,
+        cache: RangeCache | None = None,
+        catalog: ZoneCatalog | None = None,
+        *,
+        round_trip: float = DEFAULT_ROUND_TRIP,
+        record_cost: float = DEFAULT_RECORD_COST,
+        max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+    ) -> None:
+        self.cache = cache
+        self.catalog = catalog
+        self.round_trip = round_trip
+        self.record_cost = record_cost
+        self.max_concurrency = max_concurrency
+
+    def _routes(self, dataset: str, zone: ZoneKey) -> Collection[str] | None:
+        if dataset not in DATASETS:
+            msg = f"Unknown dataset {dataset!r}, expected one of {sorted(DATASETS)}"
+            raise ValueError(msg)
+        metadata = None if self.catalog is None else self.catalog.get(zone)
+        return None if metadata is None else metadata.access
+
+    @staticmethod
+    def _endpoint(
+        dataset: str, kind: str, routes: Collection[str] | None
+    ) -> Endpoint[..., Any] | None:
+        route = f"{dataset}/{kind}"
+        if routes is not None and route not in routes:
+            return None
+        return ENDPOINTS.get(f"/v3/{route}")
+
+    def _latency(self, steps: Sequence[Step]) -> float:
+        rounds = math.ceil(len(steps) / self.max_concurrency)
+        return (
+            rounds * self.round_trip + sum(s.records for s in steps) * self.record_cost
+        )
+
+    def _cost(self, steps: Sequence[Step]) -> tuple[int, float]:
+        # the fewest requests first (e.g. for rate limits), then the lowest latency
+        return len(steps), self._latency(steps)
+
+    def _without_history(
+        self, dataset: str, gaps: Sequence[_Span], routes: Collection[str] | None
+    ) -> list[Step]:
+        past_range = self._endpoint(dataset, "past-range", routes)
+        past = self._endpoint(dataset, "past", routes)
+        steps: list[Step] = []
+        for start, end in gaps:
+            if past is not None and (past_range is None or _hours(start, end) == 1):
+                steps.extend(
+                    Step(f"{dataset}/past", s, e, 1)
+                    for s, e in windows(start, end, _HOUR)
+                )
+            elif past_range is not None:
+                steps.extend(
+                    Step(f"{dataset}/past-range", s, e, _hours(s, e))
+                    for s, e in windows(start, end, MAX_WINDOW)
+                )
+            else:
+                msg = f"No route available for the {dataset} of {start:%Y-%m-%d %H:%M} (entitled to {sorted(routes or ())})"
+                raise ValueError(msg)
+        return steps
+
+    def _steps(
+        self,
+        dataset: str,
+        gaps: Sequence[_Span],
+        now: datetime,
+        routes: Collection[str] | None,
+    ) -> list[Step]:
+        # the history endpoints return the last 24 hours, up to the current one (and there are no records after it)
+        horizon = _floor_hour(now) + _HOUR
+        boundary = horizon - HISTORY_SPAN
+        gaps = _clip(gaps, datetime.min.replace(tzinfo=timezone.utc), horizon)
+        recent = _clip(gaps, boundary, horizon)
+
+        options: list[list[Step]] = []
+        error = None
+        try:
+            options.append(self._without_history(dataset, gaps, routes))
+        except ValueError as e:
+            error = e
+        if recent and self._endpoint(dataset, "history", routes) is not None:
+            together = Step(
+                f"{dataset}/history",
+                recent[0][0],
+                recent[-1][1],
+                _hours(boundary, horizon),
+            )
+            older = _clip(gaps, gaps[0][0], boundary)
+            with contextlib.suppress(ValueError):
+                options.append(
+                    [*self._without_history(dataset, older, routes), together]
+                )
+        if not options:
+            raise typing.cast(ValueError, error)
+        return min(options, key=self._cost)
+
+    def plan(
+        self,
+        dataset: str,
+        zone: ZoneKey,
+        start: datetime,
+        end: datetime,
+        **kwargs: Any,
+    ) -> Plan:
+        """Plans the requests for the records of a dataset over a date range.
+
+        Args:
+            dataset: The name of the dataset (see :data:`voltorb.export.DATASETS`).
+            zone: The zone for which to get data.
+            start: The start of the date range.
+            end: The end of the date range (excluded).
+            **kwargs: The other arguments of the endpoints (e.g. `disable_estimations`).
+
+        Raises:
+            ValueError: on unknown datasets, or ranges which the zone is not entitled to any route for.
+        """
+        routes = self._routes(dataset, zone)
+        start, end = _floor_hour(utc(start)), _ceil_hour(utc(end))
+        gaps = (
+            [(start, end)]
+            if self.cache is None
+            else self.cache.gaps(dataset, zone, start, end, **kwargs)
+        )
+        fetched = self._steps(dataset, gaps, datetime.now(timezone.utc), routes)
+        cached = [Step(CACHE, s, e, 0) for s, e in _covered(gaps, start, end)]
+        steps = tuple(sorted(fetched + cached, key=attrgetter("start")))
+        latency = self._latency(fetched)
+        query = self._query(dataset, zone, start, end, fetched, **kwargs)
+        return Plan(dataset, zone, start, end, steps, latency, query)
+
+    def _query(  # noqa: PLR0913
+        self,
+        dataset: str,
+        zone: ZoneKey,
+        start: datetime,
+        end: datetime,
+        steps: Sequence[Step],
+        **kwargs: Any,
+    ) -> Query[list[Any]]:
+        queries: dict[_Span, Query[Sequence[Any]]] = {}
+        for step in steps:
+            endpoint = ENDPOINTS[f"/v3/{step.route}"]
+            span = step.start, step.end
+            if step.route.endswith("/history"):
+                queries[span] = Mapped(endpoint(zone, **kwargs), attrgetter("history"))
+            elif step.route.endswith("/past-range"):
+                queries[span] = Mapped(
+                    endpoint(zone, *span, **kwargs), attrgetter("data")
+                )
+            else:
+                queries[span] = Mapped(
+                    endpoint(zone, step.start, **kwargs), lambda record: [record]
+                )
+
+        if self.cache is not None:
+            return self.cache.collect(
+                dataset,
+                zone,
+                start,
+                end,
+                queries,
+                max_concurrency=self.max_concurrency,
+                **kwargs,
+            )
+
+        def merge(results: dict[_Span, Sequence[Any]]) -> list[Any]:
+            records = {
+                utc(r.datetime): r
+                for (span_start, span_end), rs in results.items()
+                for r in rs
+                if span_start <= utc(r.datetime) < span_end
+            }
+            return [records[dt] for dt in sorted(records)]
+
+        return Mapped(Batch(queries, max_concurrency=self.max_concurrency), merge)
+
+    def get_range(
+        self,
+        dataset: str,
+        zone: ZoneKey,
+        start: datetime,
+        end: datetime,
+        **kwargs: Any,
+    ) -> Query[list[Any]]:
+        """The query for the records of a dataset over a date range, in the fewest requests (see :meth:`plan`)."""
+        return self.plan(dataset, zone, start, end, **kwargs).query
+
+    def explain(
+        self,
+        dataset: str,
+        zone: ZoneKey,
+        start: datetime,
+        end: datetime,
+        **kwargs: Any,
+    ) -> str:
+        """A description of the requests planned for the records of a dataset over a date range (see :meth:`plan`)."""
+        return self.plan(dataset, zone, start, end, **kwargs).explain()
+
+    def __repr__(self) -> str:
+        return f"QueryPlanner({self.cache!r}, max_concurrency={self.max_concurrency})"
+
+
+def _covered(gaps: Sequence[_Span], start: datetime, end: datetime) -> list[_Span]:
+    """The spans of a range between its gaps."""
+    covered = []
+    for gap_start, gap_end in gaps:
+        if start < gap_start:
+            covered.append((start, gap_start))
+        start = max(start, gap_end)
+    if start < end:
+        covered.append((start, end))
+    return covered
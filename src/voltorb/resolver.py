@@ -0,0 +1,197 @@
+"""Resolution of coordinates into the zones they belong to."""
+
+import json
+import math
+import threading
+from collections.abc import Iterable
+from typing import Any
+
+import snug
+
+from voltorb import schemas
+from voltorb._patches import Query
+from voltorb.api import Api
+from voltorb.batch import DEFAULT_MAX_CONCURRENCY, Batch, Mapped
+from voltorb.clients import ClientWrapper
+from voltorb.typing import Coordinates, Geolocation, ZoneKey
+
+DEFAULT_PRECISION = 0.1  # degrees, i.e. cells of ~11km (of latitude) on each side
+
+_Cell = tuple[int, int]
+
+# cells straddling zone borders resolve to several zones, so can't be resolved without asking the API
+_AMBIGUOUS = object()
+
+
+class ZoneResolver:
+    """Learns which zones coordinates resolve to, bucketing them into a grid of cells of configurable precision.
+
+    Once a cell of the grid has been resolved to a zone, all coordinates in it are resolved to the same zone without
+    querying the API. Cells which are found to span more than one zone (e.g. along borders) are never resolved.
+
+    Examples:
+        >>> resolver = ZoneResolver(precision=0.1)
+        >>> resolver.learn(Coordinates(longitude=12.49, latitude=41.89), "IT-CSO")
+        >>> resolver.resolve(Coordinates(longitude=12.46, latitude=41.81))
+        'IT-CSO'
+
+    Args:
+        precision (optional): The size of the sides of the cells of the grid, in degrees.
+    """
+
+    def __init__(self, precision: float = DEFAULT_PRECISION) -> None:
+        if precision <= 0:
+            msg = f"precision must be positive, got {precision!r}"
+            raise ValueError(msg)
+
+        self.precision = precision
+        self._cells: dict[_Cell, Any] = {}
+        self._lock = threading.Lock()
+
+    def _cell(self, coordinates: Coordinates) -> _Cell:
+        return (
+            math.floor(coordinates.longitude / self.precision),
+            math.floor(coordinates.latitude / self.precision),
+        )
+
+    def learn(self, coordinates: Coordinates, zone: ZoneKey) -> None:
+        """Records that the given coordinates belong to the given zone."""
+        cell = self._cell(coordinates)
+        with self._lock:
+            if self._cells.setdefault(cell, zone) != zone:
+                self._cells[cell] = _AMBIGUOUS
+
+    def resolve(self, coordinates: Coordinates) -> ZoneKey | None:
+        """The zone the given coordinates belong to, if known."""
+        zone = self._cells.get(self._cell(coordinates))
+        return None if zone is _AMBIGUOUS else zone
+
+    def geolocation(self, geolocation: Geolocation) -> Geolocation:
+        """Rewrites a geolocation as the zone it belongs to, if known."""
+        if isinstance(geolocation, Coordinates):
+            return self.resolve(geolocation) or geolocation
+        return geolocation
+
+    def resolve_many(
+        self,
+        coordinates: Iterable[Coordinates],
+        *,
+        max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+    ) -> Query[dict[Coordinates, ZoneKey]]:
+        """Resolves many coordinates at once, only querying the API once per unknown cell of the grid.
+
+        Args:
+            coordinates: The coordinates to resolve.
+            max_concurrency (optional): The maximum number of queries in flight at any time.
+
+        Returns:
+            A query for the zones the coordinates belong to, keyed by coordinates.
+        """
+        known: dict[Coordinates, ZoneKey] = {}
+        # the coordinates queried on behalf of unknown coordinates: a single one per cell, unless ambiguous
+        representatives: dict[Coordinates, Coordinates] = {}
+        by_cell: dict[_Cell, Coordinates] = {}
+
+        coordinates = list(dict.fromkeys(coordinates))
+        for c in coordinates:
+            if (zone := self.resolve(c)) is not None:
+                known[c] = zone
+                continue
+            cell = self._cell(c)
+            if self._cells.get(cell) is _AMBIGUOUS:
+                representatives[c] = c
+            else:
+                representatives[c] = by_cell.setdefault(cell, c)
+
+        def learn_and_resolve(
+            responses: dict[Coordinates, schemas.CarbonIntensity],
+        ) -> dict[Coordinates, ZoneKey]:
+            for c, response in responses.items():
+                self.learn(c, response.zone)
+            return {
+                c: known[c] if c in known else responses[representatives[c]].zone
+                for c in coordinates
+            }
+
+        # the latest carbon intensity is the cheapest (free) endpoint returning the zone of coordinates
+        return Mapped(
+            Batch(
+                {
+                    c: Api.carbon_intensity.get_latest(c)
+                    for c in dict.fromkeys(representatives.values())
+                },
+                max_concurrency=max_concurrency,
+            ),
+            learn_and_resolve,
+        )
+
+    def client(self, client: Any = None) -> "ZoneResolvingClient":
+        """Wraps a client so that it resolves coordinates through (and teaches) this resolver."""
+        return ZoneResolvingClient(self, client)
+
+    def __len__(self) -> int:
+        return len(self._cells)
+
+    def __repr__(self) -> str:
+        return f"ZoneResolver(precision={self.precision!r})"
+
+
+class ZoneResolvingClient(ClientWrapper):
+    """A client wrapper rewriting requests for coordinates into requests for the zone they belong to (when known).
+
+    The zones of coordinates which could not be resolved yet are learned from the responses to their requests. This
+    allows any caching, deduplication or batching of requests downstream to work on zones, rather than on (unique)
+    coordinates.
+
+    Args:
+        resolver: The resolver with which to resolve coordinates.
+        client (optional): The wrapped client.
+    """
+
+    def __init__(self, resolver: ZoneResolver, client: Any = None) -> None:
+        super().__init__(client)
+        self.resolver = resolver
+
+    def _rewrite(
+        self, request: snug.Request
+    ) -> tuple[snug.Request, Coordinates | None]:
+        params = request.params
+        if "lon" not in params or "lat" not in params:
+            return request, None
+
+        coordinates = Coordinates(
+            longitude=float(params["lon"]), latitude=float(params["lat"])
+        )
+        zone = self.resolver.resolve(coordinates)
+        if zone is None:
+            return request, coordinates
+
+        # same parameters (and order) as if the request had been made for the zone in the first place
+        params = {"zone": zone} | {
+            k: v for k, v in params.items() if k not in ("lon", "lat")
+        }
+        return request.replace(params=params), None
+
+    def _learn(self, coordinates: Coordinates | None, response: snug.Response) -> None:
+        if coordinates is None or response.status_code != 200:  # noqa: PLR2004
+            return
+        try:
+            zone = json.loads(response.content)["zone"]
+        except (ValueError, TypeError, KeyError):
+            return
+        self.resolver.learn(coordinates, zone)
+
+    def send(self, request: snug.Request) -> snug.Response:
+        request, unresolved = self._rewrite(request)
+        response = super().send(request)
+        self._learn(unresolved, response)
+        return response
+
+    async def send_async(self, request: snug.Request) -> snug.Response:
+        request, unresolved = self._rewrite(request)
+        response = await super().send_async(request)
+        self._learn(unresolved, response)
+        return response
+
+    def __repr__(self) -> str:
+        return f"ZoneResolvingClient({self.resolver!r}, {self.client!r})"
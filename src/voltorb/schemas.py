@@ -177,3 +177,14 @@ class Updates:
     threshold: str
     limit: int
     limit_reached: bool
+
+
+@frozen
+class ZoneSnapshot:
+    """The latest state of a zone, and its forecasts (which require commercial routes, so might be missing)."""
+
+    zone: ZoneKey
+    carbon_intensity: CarbonIntensity
+    power_breakdown: PowerBreakdown
+    carbon_intensity_forecast: CarbonIntensityForecast | None
+    power_breakdown_forecast: PowerBreakdownForecast | None
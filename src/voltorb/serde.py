@@ -10,6 +10,7 @@ from cattrs import Converter
 from cattrs.gen import (  # type: ignore[attr-defined]
     AttributeOverride,
     make_dict_structure_fn,
+    make_dict_unstructure_fn,
     override,
 )
 
@@ -37,6 +38,9 @@ def register_structure_hook(
     This is equivalent to converter.register_structure_hook(cls, make_dict_structure_fn(cls, converter, **kwargs)),
     but as a decorator, and with the shortcut of registering the hook on our single global converter.
 
+    The matching unstructuring function is registered too, so that schemas unstructure (serialise) back into the same
+    payloads they were structured from.
+
     It also provides a special 'alias_generator' kwarg callable that can be used to conveniently generate aliases for
     all fields in a class on structuring (deserialisation). This is useful to use a consistent naming convention for
     all fields in a class, but don't want to specify the alias for each field individually.
@@ -65,6 +69,14 @@ def register_structure_hook(
                 **merged_kwargs,  # type: ignore[arg-type]
             ),
         )
+        converter.register_unstructure_hook(
+            cls,
+            make_dict_unstructure_fn(
+                cl=cls,
+                converter=converter,
+                **merged_kwargs,
+            ),
+        )
         return cls
 
     return decorator
@@ -77,3 +89,6 @@ converter.register_structure_hook(
     datetime,
     lambda isoformat, _: datetime.fromisoformat(isoformat.replace("Z", "+00:00")),
 )
+converter.register_unstructure_hook(
+    datetime, lambda dt: dt.isoformat().replace("+00:00", "Z")
+)
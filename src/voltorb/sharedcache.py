@@ -0,0 +1,334 @@
+"""A cache of the latest values of zones, shared in memory by all the processes of a host.
+
+A single refresher process queries the latest endpoints and writes their results into a fixed layout table, in a
+shared memory block, with a slot per zone and dataset. Any number of reader processes attach to the block by name,
+and read values without touching the network, nor taking any lock: each slot is guarded by a sequence counter
+(a seqlock), which the writer makes odd while the slot is being written, so that readers retry on torn reads instead.
+"""
+
+import json
+import logging
+import struct
+import sys
+import threading
+import time
+import typing
+from collections.abc import Callable, Sequence
+from multiprocessing import resource_tracker, shared_memory
+from typing import Any
+
+from voltorb._patches import Query, execute
+from voltorb.api import Api, Endpoint
+from voltorb.batch import DEFAULT_MAX_CONCURRENCY, Batch, OrNone
+from voltorb.exceptions import HTTPStatusError
+from voltorb.serde import converter
+from voltorb.typing import ZoneKey
+
+logger = logging.getLogger(__name__)
+
+LATEST: dict[str, Endpoint[..., Any]] = {
+    "carbon-intensity": Api.carbon_intensity.get_latest,
+    "power-breakdown": Api.power_breakdown.get_latest,
+}
+"""The latest endpoints whose values can be cached, by dataset name."""
+
+MAGIC = b"VSHM"
+VERSION = 1
+DEFAULT_SLOT_SIZE = 4096
+DEFAULT_INTERVAL = 60.0  # seconds
+
+_HEADER = struct.Struct("<4sHHII")  # magic, version, datasets, zones, slot size
+_NAME = struct.Struct("<32s")
+_SLOT = struct.Struct("<QdI4x")  # sequence, written at (epoch seconds), payload length
+_ALIGNMENT = 64  # slots start on their own cache lines
+
+# the blocks created by this process, which the resource tracker must keep tracking when attached to
+_created: set[str] = set()
+
+_WRITER_TIMEOUT = 1.0  # seconds, e.g. if the writer died mid-write
+
+
+def _align(offset: int) -> int:
+    return -(-offset // _ALIGNMENT) * _ALIGNMENT
+
+
+def _buffer(block: shared_memory.SharedMemory) -> memoryview:
+    # only None once the block is closed
+    return typing.cast(memoryview, block.buf)
+
+
+class SharedLatestCache:
+    """A table of the latest values of zones, in a named shared memory block.
+
+    Use :meth:`create` in the refresher process, which owns the block, and :meth:`attach` in reader processes.
+
+    Examples:
+        >>> with SharedLatestCache.create("voltorb-latest-doctest", ["IT", "FR"]) as cache:
+        ...     cache.get("carbon-intensity", "IT") is None
+        True
+
+    Args:
+        block: The shared memory block of the table.
+        owner (optional): Whether the block is unlinked when closed.
+    """
+
+    def __init__(
+        self, block: shared_memory.SharedMemory, *, owner: bool = False
+    ) -> None:
+        self._block = block
+        self._owner = owner
+        self._buffer = buffer = _buffer(block)
+        magic, version, n_datasets, n_zones, slot_size = _HEADER.unpack_from(buffer)
+        self.slot_size: int = slot_size
+        if magic != MAGIC or version != VERSION:
+            msg = f"Shared memory block {block.name!r} is not a version {VERSION} cache"
+            raise ValueError(msg)
+
+        names = [
+            _NAME.unpack_from(buffer, _HEADER.size + i * _NAME.size)[0]
+            .rstrip(b"\0")
+            .decode()
+            for i in range(n_datasets + n_zones)
+        ]
+        self.datasets: tuple[str, ...] = tuple(names[:n_datasets])
+        self.zones: tuple[ZoneKey, ...] = tuple(names[n_datasets:])
+        self._datasets = {dataset: i for i, dataset in enumerate(self.datasets)}
+        self._zones = {zone: i for i, zone in enumerate(self.zones)}
+        self._slots = _align(_HEADER.size + len(names) * _NAME.size)
+        # the values decoded by this process, with the sequence they were decoded at
+        self._decoded: dict[int, tuple[int, Any]] = {}
+        self._write_lock = threading.Lock()
+
+    @staticmethod
+    def size(
+        zones: Sequence[ZoneKey],
+        datasets: Sequence[str] = tuple(LATEST),
+        slot_size: int = DEFAULT_SLOT_SIZE,
+    ) -> int:
+        """The size (in bytes) of the shared memory block of a table."""
+        names = _align(_HEADER.size + (len(datasets) + len(zones)) * _NAME.size)
+        return names + len(datasets) * len(zones) * _align(slot_size)
+
+    @classmethod
+    def create(
+        cls: type["SharedLatestCache"],
+        name: str,
+        zones: Sequence[ZoneKey],
+        *,
+        datasets: Sequence[str] = tuple(LATEST),
+        slot_size: int = DEFAULT_SLOT_SIZE,
+    ) -> "SharedLatestCache":
+        """Creates (and owns) the table of the given zones and datasets.
+
+        Args:
+            name: The name of the shared memory block.
+            zones: The zones of the table.
+            datasets (optional): The datasets of the table (see :data:`LATEST`).
+            slot_size (optional): The space reserved for each value, in bytes.
+
+        Raises:
+            ValueError: on unknown datasets, or names which don't fit the table.
+            FileExistsError: if a block with the same name already exists.
+        """
+        unknown = set(datasets) - LATEST.keys()
+        if unknown:
+            msg = (
+                f"Unknown datasets {sorted(unknown)}, expected any of {sorted(LATEST)}"
+            )
+            raise ValueError(msg)
+        names = [n.encode() for n in (*datasets, *zones)]
+        if any(len(n) > _NAME.size for n in names):
+            msg = f"Dataset and zone names must be at most {_NAME.size} bytes long"
+            raise ValueError(msg)
+
+        slot_size = _align(slot_size)
+        block = shared_memory.SharedMemory(
+            name, create=True, size=cls.size(zones, datasets, slot_size)
+        )
+        _created.add(block.name)
+        buffer = _buffer(block)
+        buffer[:] = bytes(block.size)
+        for i, n in enumerate(names):
+            _NAME.pack_into(buffer, _HEADER.size + i * _NAME.size, n)
+        _HEADER.pack_into(
+            buffer, 0, MAGIC, VERSION, len(datasets), len(zones), slot_size
+        )
+        return cls(block, owner=True)
+
+    @classmethod
+    def attach(cls: type["SharedLatestCache"], name: str) -> "SharedLatestCache":
+        """Attaches to the table created (and owned) by another process.
+
+        Raises:
+            FileNotFoundError: if no block with the given name exists.
+        """
+        if sys.version_info >= (3, 13):  # pragma: no cover
+            block = shared_memory.SharedMemory(name, track=False)
+        else:
+            block = shared_memory.SharedMemory(name)
+            if block.name not in _created:
+                # the resource tracker would otherwise unlink the block when this process exits
+                resource_tracker.unregister(block._name, "shared_memory")  # type: ignore[attr-defined]  # noqa: SLF001
+        return cls(block)
+
+    @property
+    def name(self) -> str:
+        """The name of the shared memory block."""
+        return self._block.name
+
+    def _slot(self, dataset: str, zone: ZoneKey) -> int | None:
+        d, z = self._datasets.get(dataset), self._zones.get(zone)
+        if d is None or z is None:
+            return None
+        return self._slots + (z * len(self.datasets) + d) * self.slot_size
+
+    def put(self, dataset: str, record: Any) -> None:
+        """Writes the latest value of a zone (to be called by a single process).
+
+        Raises:
+            KeyError: on datasets or zones not in the table.
+            ValueError: on values not fitting their slot.
+        """
+        offset = self._slot(dataset, record.zone)
+        if offset is None:
+            raise KeyError((dataset, record.zone))
+        payload = json.dumps(converter.unstructure(record)).encode()
+        if len(payload) > self.slot_size - _SLOT.size:
+            msg = f"Value of {len(payload)} bytes does not fit slots of {self.slot_size} bytes"
+            raise ValueError(msg)
+
+        buffer = self._buffer
+        with self._write_lock:
+            (sequence,) = struct.unpack_from("<Q", buffer, offset)
+            # odd while the slot is being written
+            struct.pack_into("<Q", buffer, offset, sequence + 1)
+            start = offset + _SLOT.size
+            buffer[start : start + len(payload)] = payload
+            struct.pack_into("<dI", buffer, offset + 8, time.time(), len(payload))
+            struct.pack_into("<Q", buffer, offset, sequence + 2)
+
+    def _read(self, offset: int) -> tuple[int, float, bytes | None]:
+        buffer = self._buffer
+        deadline = None
+        while True:
+            sequence, written_at, length = _SLOT.unpack_from(buffer, offset)
+            if sequence % 2:
+                deadline = deadline or time.monotonic() + _WRITER_TIMEOUT
+                if time.monotonic() > deadline:
+                    msg = "Timed out waiting for the writer of the slot"
+                    raise TimeoutError(msg)
+                time.sleep(0)
+                continue
+            cached = self._decoded.get(offset)
+            payload = (
+                None
+                if cached is not None and cached[0] == sequence
+                else bytes(buffer[offset + _SLOT.size : offset + _SLOT.size + length])
+            )
+            if struct.unpack_from("<Q", buffer, offset)[0] == sequence:
+                return sequence, written_at, payload
+
+    def get(self, dataset: str, zone: ZoneKey) -> Any:
+        """The latest value of a zone, of the same type as the result of its latest endpoint, if any.
+
+        Values are only decoded when they change, so that reading an unchanged value takes microseconds.
+        """
+        offset = self._slot(dataset, zone)
+        if offset is None:
+            return None
+        sequence, _, payload = self._read(offset)
+        if sequence == 0:
+            return None
+        if payload is not None:
+            record = converter.structure(
+                json.loads(payload), LATEST[dataset].response_schema
+            )
+            self._decoded[offset] = (sequence, record)
+        return self._decoded[offset][1]
+
+    def age(self, dataset: str, zone: ZoneKey) -> float | None:
+        """How long ago the latest value of a zone was written, in seconds, if any."""
+        offset = self._slot(dataset, zone)
+        if offset is None:
+            return None
+        sequence, written_at, _ = self._read(offset)
+        return None if sequence == 0 else time.time() - written_at
+
+    def refresh(
+        self,
+        execute: Callable[[Query[Any]], Any] = execute,
+        *,
+        max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+    ) -> int:
+        """Queries the latest values of all the zones of the table, and writes them.
+
+        Zones failing (e.g. on API errors), or answered for another zone, keep their previous values.
+
+        Args:
+            execute (optional): The executor with which to query the API (e.g. to add authentication).
+            max_concurrency (optional): The maximum number of queries in flight at any time.
+
+        Returns:
+            The number of values written.
+        """
+        query = Batch(
+            {
+                (dataset, zone): OrNone(LATEST[dataset](zone), HTTPStatusError)
+                for dataset in self.datasets
+                for zone in self.zones
+            },
+            max_concurrency=max_concurrency,
+        )
+        written = 0
+        for (dataset, zone), record in execute(query).items():
+            if record is None:
+                continue
+            if record.zone != zone:
+                # rather than aborting the refresh of the other zones
+                logger.warning(
+                    "Skipped the latest %s of zone %r, answered for zone %r",
+                    dataset,
+                    zone,
+                    record.zone,
+                )
+                continue
+            self.put(dataset, record)
+            written += 1
+        return written
+
+    def run(
+        self,
+        execute: Callable[[Query[Any]], Any] = execute,
+        *,
+        interval: float = DEFAULT_INTERVAL,
+        stop: threading.Event | None = None,
+        **kwargs: Any,
+    ) -> None:
+        """Refreshes the table every `interval` seconds, until stopped (e.g. as the main loop of the refresher).
+
+        Failed refreshes (e.g. on network errors) are logged, and retried at the next interval.
+        """
+        stop = stop or threading.Event()
+        while not stop.is_set():
+            try:
+                self.refresh(execute, **kwargs)
+            except Exception:
+                logger.exception("Failed to refresh the latest values of %s", self.name)
+            stop.wait(interval)
+
+    def close(self) -> None:
+        """Detaches from the table, and destroys it if owned."""
+        self._decoded.clear()
+        self._block.close()
+        if self._owner:
+            self._block.unlink()
+            _created.discard(self._block.name)
+
+    def __enter__(self) -> "SharedLatestCache":
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+    def __repr__(self) -> str:
+        return f"SharedLatestCache({self.name!r}, zones={len(self.zones)}, datasets={list(self.datasets)!r})"
@@ -0,0 +1,292 @@
+"""Streaming of long date ranges from the range endpoints, one (API limited) window at a time.
+
+The windows are downloaded ahead of the records being consumed, but only up to a bounded number of them, so that
+memory use does not grow with the length of the range. Updates are streamed the same way, one (API limited) page at a
+time.
+"""
+
+import asyncio
+from collections import deque
+from collections.abc import (
+    AsyncGenerator,
+    Awaitable,
+    Callable,
+    Generator,
+    Iterator,
+    Sequence,
+)
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Any, Protocol, TypeVar
+
+from voltorb import schemas
+from voltorb._helpers import utc
+from voltorb._patches import Query, execute, execute_async
+from voltorb.typing import Geolocation
+
+T = TypeVar("T")
+T_co = TypeVar("T_co", covariant=True)
+
+MAX_WINDOW = timedelta(days=10)
+"""The longest date range the range endpoints accept."""
+
+DEFAULT_PREFETCH = 1
+
+MAX_UPDATES_LIMIT = 1000
+"""The largest number of updates the updates endpoint returns per request."""
+
+# how far past the last update of a page the next one starts (the datetimes of records are whole seconds)
+_PAGE_STEP = timedelta(seconds=1)
+
+
+class _Range(Protocol[T_co]):
+    @property
+    def data(self) -> Sequence[T_co]: ...
+
+
+RangeEndpoint = Callable[..., Query[_Range[T]]]
+UpdatesEndpoint = Callable[..., Query[schemas.Updates]]
+
+
+def windows(
+    start: datetime, end: datetime, size: timedelta = MAX_WINDOW
+) -> Iterator[tuple[datetime, datetime]]:
+    """Splits a date range into consecutive windows of (at most) the given size.
+
+    Examples:
+        >>> [(s.day, e.day) for s, e in windows(datetime(2024, 1, 1), datetime(2024, 1, 25))]
+        [(1, 11), (11, 21), (21, 25)]
+
+    Args:
+        start: The start of the range.
+        end: The end of the range (excluded).
+        size (optional): The size of the windows.
+    """
+    if size <= timedelta(0):
+        msg = f"size must be positive, got {size!r}"
+        raise ValueError(msg)
+
+    while start < end:
+        yield start, min(start + size, end)
+        start += size
+
+
+def _validate_prefetch(prefetch: int) -> None:
+    if prefetch < 0:
+        msg = f"prefetch must be a non-negative integer, got {prefetch!r}"
+        raise ValueError(msg)
+
+
+def iter_past_range(  # noqa: PLR0913
+    endpoint: RangeEndpoint[T],
+    geolocation: Geolocation,
+    start: datetime,
+    end: datetime,
+    *,
+    execute: Callable[[Query[_Range[T]]], _Range[T]] = execute,
+    window: timedelta = MAX_WINDOW,
+    prefetch: int = DEFAULT_PREFETCH,
+    **kwargs: Any,
+) -> Generator[T, None, None]:
+    """Iterates over the records of a range endpoint over an arbitrarily long date range.
+
+    The range is queried one window at a time, downloading the next `prefetch` windows in background threads while
+    the records of the current one are consumed.
+
+    Examples:
+        >>> from voltorb import electricity_maps
+        >>> records = iter_past_range(
+        ...     electricity_maps.power_breakdown.get_past_range, "FR", datetime(2019, 1, 1), datetime(2024, 1, 1)
+        ... )
+
+    Args:
+        endpoint: The range endpoint to query (e.g. ``electricity_maps.carbon_intensity.get_past_range``).
+        geolocation: The geolocation for which to get data.
+        start: The start datetime for which to get data.
+        end: The end datetime for which to get data (excluded).
+        execute (optional): The executor with which to query the API (e.g. to add authentication).
+        window (optional): The date range of each query.
+        prefetch (optional): The number of windows to download ahead of the one being consumed.
+        **kwargs: The other arguments of the endpoint (e.g. `disable_estimations`).
+
+    Yields:
+        The records of the range, in order.
+    """
+    _validate_prefetch(prefetch)
+
+    pool = ThreadPoolExecutor(max_workers=prefetch + 1, thread_name_prefix="voltorb")
+    pending: deque[Future[_Range[T]]] = deque()
+    try:
+        for window_start, window_end in windows(start, end, window):
+            query = endpoint(geolocation, window_start, window_end, **kwargs)
+            pending.append(pool.submit(execute, query))
+            if len(pending) > prefetch:
+                yield from pending.popleft().result().data
+        while pending:
+            yield from pending.popleft().result().data
+    finally:
+        # don't download windows that will never be consumed (e.g. on errors or early exits)
+        pool.shutdown(cancel_futures=True)
+
+
+async def aiter_past_range(  # noqa: PLR0913
+    endpoint: RangeEndpoint[T],
+    geolocation: Geolocation,
+    start: datetime,
+    end: datetime,
+    *,
+    execute: Callable[[Query[_Range[T]]], Awaitable[_Range[T]]] = execute_async,
+    window: timedelta = MAX_WINDOW,
+    prefetch: int = DEFAULT_PREFETCH,
+    **kwargs: Any,
+) -> AsyncGenerator[T, None]:
+    """Asynchronously iterates over the records of a range endpoint over an arbitrarily long date range.
+
+    The async counterpart of :func:`iter_past_range`, downloading the next `prefetch` windows in background tasks.
+
+    Args:
+        endpoint: The range endpoint to query (e.g. ``electricity_maps.carbon_intensity.get_past_range``).
+        geolocation: The geolocation for which to get data.
+        start: The start datetime for which to get data.
+        end: The end datetime for which to get data (excluded).
+        execute (optional): The async executor with which to query the API (e.g. to add authentication).
+        window (optional): The date range of each query.
+        prefetch (optional): The number of windows to download ahead of the one being consumed.
+        **kwargs: The other arguments of the endpoint (e.g. `disable_estimations`).
+
+    Yields:
+        The records of the range, in order.
+    """
+    _validate_prefetch(prefetch)
+
+    pending: deque[asyncio.Future[_Range[T]]] = deque()
+    try:
+        for window_start, window_end in windows(start, end, window):
+            query = endpoint(geolocation, window_start, window_end, **kwargs)
+            pending.append(asyncio.ensure_future(execute(query)))
+            if len(pending) > prefetch:
+                for record in (await pending.popleft()).data:
+                    yield record
+        while pending:
+            for record in (await pending.popleft()).data:
+                yield record
+    finally:
+        # don't leave downloads running in the background (e.g. on errors or early exits)
+        for task in pending:
+            task.cancel()
+
+
+def _validate_limit(limit: int) -> None:
+    if not 0 < limit <= MAX_UPDATES_LIMIT:
+        msg = f"limit must be between 1 and {MAX_UPDATES_LIMIT}, got {limit!r}"
+        raise ValueError(msg)
+
+
+def _next_page_start(
+    page: schemas.Updates, start: datetime | None, end: datetime | None
+) -> datetime | None:
+    """The start of the page after the given one (requested from the given start), if any."""
+    if not page.limit_reached or not page.updates:
+        return None
+    next_start = max(update.datetime for update in page.updates) + _PAGE_STEP
+    if start is not None and next_start <= utc(start):
+        # e.g. the start was ignored, so that the same page would be requested forever
+        msg = f"The page of updates from {start.isoformat()} has no update past its start, can't page further"
+        raise RuntimeError(msg)
+    return None if end is not None and next_start >= utc(end) else next_start
+
+
+def iter_updated_since(  # noqa: PLR0913
+    endpoint: UpdatesEndpoint,
+    geolocation: Geolocation,
+    since: datetime,
+    start: datetime | None = None,
+    end: datetime | None = None,
+    *,
+    execute: Callable[[Query[schemas.Updates]], schemas.Updates] = execute,
+    limit: int = MAX_UPDATES_LIMIT,
+    **kwargs: Any,
+) -> Generator[schemas.Updates.Update, None, None]:
+    """Iterates over all the updates of a geolocation since a datetime, however many pages of them there are.
+
+    The updates endpoint returns at most `limit` updates per request. Whenever a page reaches the limit, the next one
+    is requested from right after the last datetime of the page, until a page doesn't, so that only a page of updates
+    is held in memory at any time. Pages whose updates are not past their start (so that paging would not progress)
+    raise a `RuntimeError`.
+
+    Examples:
+        >>> from voltorb import electricity_maps
+        >>> updates = iter_updated_since(electricity_maps.get_updated_since, "FR", datetime(2024, 1, 1))
+
+    Args:
+        endpoint: The updates endpoint to query (i.e. ``electricity_maps.get_updated_since``).
+        geolocation: The geolocation for which to get updates.
+        since: The datetime since which to get updates.
+        start (optional): The start datetime of the timeframe in which to search.
+        end (optional): The end datetime of the timeframe in which to search.
+        execute (optional): The executor with which to query the API (e.g. to add authentication).
+        limit (optional): The number of updates per page.
+        **kwargs: The other arguments of the endpoint (e.g. `threshold`).
+
+    Yields:
+        The updates of all pages, in order.
+    """
+    _validate_limit(limit)
+
+    page_start: datetime | None = start
+    while True:
+        page = execute(
+            endpoint(
+                geolocation, since, start=page_start, end=end, limit=limit, **kwargs
+            )
+        )
+        yield from page.updates
+        page_start = _next_page_start(page, page_start, end)
+        if page_start is None:
+            return
+
+
+async def aiter_updated_since(  # noqa: PLR0913
+    endpoint: UpdatesEndpoint,
+    geolocation: Geolocation,
+    since: datetime,
+    start: datetime | None = None,
+    end: datetime | None = None,
+    *,
+    execute: Callable[
+        [Query[schemas.Updates]], Awaitable[schemas.Updates]
+    ] = execute_async,
+    limit: int = MAX_UPDATES_LIMIT,
+    **kwargs: Any,
+) -> AsyncGenerator[schemas.Updates.Update, None]:
+    """Asynchronously iterates over all the updates of a geolocation since a datetime.
+
+    The async counterpart of :func:`iter_updated_since`.
+
+    Args:
+        endpoint: The updates endpoint to query (i.e. ``electricity_maps.get_updated_since``).
+        geolocation: The geolocation for which to get updates.
+        since: The datetime since which to get updates.
+        start (optional): The start datetime of the timeframe in which to search.
+        end (optional): The end datetime of the timeframe in which to search.
+        execute (optional): The async executor with which to query the API (e.g. to add authentication).
+        limit (optional): The number of updates per page.
+        **kwargs: The other arguments of the endpoint (e.g. `threshold`).
+
+    Yields:
+        The updates of all pages, in order.
+    """
+    _validate_limit(limit)
+
+    page_start: datetime | None = start
+    while True:
+        page = await execute(
+            endpoint(
+                geolocation, since, start=page_start, end=end, limit=limit, **kwargs
+            )
+        )
+        for update in page.updates:
+            yield update
+        page_start = _next_page_start(page, page_start, end)
+        if page_start is None:
+            return
@@ -0,0 +1,632 @@
+"""Network-free stand-ins of the Electricity Maps API, for testing and benchmarking.
+
+* :class:`StandInServer` is a local HTTP server emulating all the routes of :class:`voltorb.api.Api`, serving recorded
+  or synthetic payloads with configurable latency, jitter, errors, bursts of 429s, and rate limits.
+* :class:`Cassette` records (with a :class:`RecordingClient`) real responses of the API, to be replayed either in
+  process (with a :class:`ReplayingClient`) or over the network (by a :class:`StandInServer`).
+* :class:`StandInRedis` is a local server speaking the Redis protocol, implementing the (few) commands used by
+  :class:`voltorb.cache.RedisBackend`.
+"""
+
+import gzip
+import json
+import math
+import os
+import random
+import threading
+import time
+import types
+import typing
+import urllib.parse
+from collections import Counter
+from collections.abc import Mapping
+from datetime import datetime, timedelta, timezone
+from enum import Enum
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BufferedIOBase
+from pathlib import Path
+from socketserver import StreamRequestHandler, ThreadingTCPServer
+from typing import Any, cast
+
+import attrs
+import snug
+from attrs import field, frozen
+
+from voltorb._helpers import utc
+from voltorb.api import ENDPOINTS, Endpoint
+from voltorb.clients import ClientWrapper, RedirectingClient
+from voltorb.serde import converter
+
+SYNTHETIC_ZONES = ("DE", "DK-DK1", "FR", "IT-CSO")
+"""The zones served by stand-in servers (without recorded payloads)."""
+
+_HOUR = timedelta(hours=1)
+_SERIES_HOURS = 24  # the length of histories and forecasts
+
+# the values of string fields which don't hold the requested zone
+_STRINGS = {"status": "ok", "state": "ok", "threshold": "P1D"}
+
+
+def _request_key(method: str, path: str, params: Mapping[str, Any]) -> str:
+    query = urllib.parse.urlencode(sorted(params.items()))
+    return f"{method} {path}?{query}" if query else f"{method} {path}"
+
+
+def _parse_datetime(value: str) -> datetime:
+    return utc(datetime.fromisoformat(value.replace("Z", "+00:00")))
+
+
+@frozen
+class Interaction:
+    """A recorded response.
+
+    Args:
+        status_code: The HTTP status code of the response.
+        content: The (decoded) content of the response.
+        headers: The headers of the response.
+    """
+
+    status_code: int
+    content: str
+    headers: dict[str, str] = field(factory=dict)
+
+    def response(self) -> snug.Response:
+        return snug.Response(
+            self.status_code, self.content.encode(), headers=self.headers
+        )
+
+
+class Cassette:
+    """Recorded responses of the API, by request (method, path and query parameters).
+
+    Args:
+        interactions (optional): The recorded responses, by request.
+    """
+
+    def __init__(self, interactions: Mapping[str, Interaction] | None = None) -> None:
+        self.interactions = dict(interactions or {})
+        self._lock = threading.Lock()
+
+    def lookup(
+        self, method: str, path: str, params: Mapping[str, Any]
+    ) -> Interaction | None:
+        """The response recorded for a request, if any."""
+        return self.interactions.get(_request_key(method, path, params))
+
+    def record(self, request: snug.Request, response: snug.Response) -> None:
+        """Records the response to a request (replacing any previous one)."""
+        path = urllib.parse.urlsplit(request.url).path
+        headers = {
+            name: value
+            for name, value in response.headers.items()
+            if name.lower() in ("content-type", "retry-after")
+        }
+        interaction = Interaction(
+            response.status_code, (response.content or b"").decode(), headers
+        )
+        with self._lock:
+            self.interactions[_request_key(request.method, path, request.params)] = (
+                interaction
+            )
+
+    def replay(self, request: snug.Request) -> snug.Response:
+        """The response recorded for a request.
+
+        Raises:
+            LookupError: if no response was recorded for the request.
+        """
+        path = urllib.parse.urlsplit(request.url).path
+        interaction = self.lookup(request.method, path, request.params)
+        if interaction is None:
+            msg = f"No recorded response for {_request_key(request.method, path, request.params)!r}"
+            raise LookupError(msg)
+        return interaction.response()
+
+    def save(self, path: str | os.PathLike[str]) -> None:
+        """Persists the cassette to disk (atomically)."""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+        payload = {key: attrs.asdict(i) for key, i in self.interactions.items()}
+
+        tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+        tmp_path.write_text(json.dumps(payload, indent=2))
+        tmp_path.replace(path)
+
+    @classmethod
+    def load(cls: type["Cassette"], path: str | os.PathLike[str]) -> "Cassette":
+        """Loads a cassette persisted to disk."""
+        payload: dict[str, Any] = json.loads(Path(path).read_text())
+        return cls({key: Interaction(**i) for key, i in payload.items()})
+
+    def __len__(self) -> int:
+        return len(self.interactions)
+
+    def __repr__(self) -> str:
+        return f"Cassette({len(self)} interactions)"
+
+
+class RecordingClient(ClientWrapper):
+    """A client wrapper recording all responses into a cassette.
+
+    Args:
+        cassette: The cassette to record responses into.
+        client (optional): The wrapped client.
+    """
+
+    def __init__(self, cassette: Cassette, client: Any = None) -> None:
+        super().__init__(client)
+        self.cassette = cassette
+
+    def send(self, request: snug.Request) -> snug.Response:
+        response = super().send(request)
+        self.cassette.record(request, response)
+        return response
+
+    async def send_async(self, request: snug.Request) -> snug.Response:
+        response = await super().send_async(request)
+        self.cassette.record(request, response)
+        return response
+
+
+class ReplayingClient(ClientWrapper):
+    """A client replaying the responses recorded in a cassette, without sending any request.
+
+    Args:
+        cassette: The cassette to replay responses from.
+    """
+
+    def __init__(self, cassette: Cassette) -> None:
+        super().__init__()
+        self.cassette = cassette
+
+    def send(self, request: snug.Request) -> snug.Response:
+        return self.cassette.replay(request)
+
+    async def send_async(self, request: snug.Request) -> snug.Response:
+        return self.cassette.replay(request)
+
+    def __repr__(self) -> str:
+        return f"ReplayingClient({self.cassette!r})"
+
+
+class _Synthesiser:
+    """Generates plausible payloads for any endpoint, from its response schema."""
+
+    def __init__(self, rng: random.Random) -> None:
+        self.rng = rng
+        self.routes = [
+            e.path.removeprefix("/v3/")
+            for e in ENDPOINTS.values()
+            if e.geolocated and e.path.startswith("/v3/")
+        ]
+
+    @staticmethod
+    def _datetimes(path: str, params: Mapping[str, str]) -> list[datetime]:
+        """The datetimes of the records of a response."""
+        now = datetime.now(timezone.utc).replace(minute=0, second=0, microsecond=0)
+        if "start" in params and "end" in params:
+            start, end = (
+                _parse_datetime(params["start"]),
+                _parse_datetime(params["end"]),
+            )
+            return [start + i * _HOUR for i in range(math.ceil((end - start) / _HOUR))]
+        if path.endswith("/forecast"):
+            return [now + i * _HOUR for i in range(1, _SERIES_HOURS + 1)]
+        if path.endswith(("/history", "/updated-since")):
+            return [now - i * _HOUR for i in reversed(range(_SERIES_HOURS))]
+        if "datetime" in params:
+            return [_parse_datetime(params["datetime"])]
+        return [now]
+
+    @staticmethod
+    def _zone(params: Mapping[str, str]) -> str:
+        if "zone" in params:
+            return params["zone"]
+        # coordinates resolve to zones deterministically
+        cell = int(float(params.get("lon", 0))) + int(float(params.get("lat", 0)))
+        return SYNTHETIC_ZONES[cell % len(SYNTHETIC_ZONES)]
+
+    def _value(self, tp: Any, name: str, zone: str, datetimes: list[datetime]) -> Any:  # noqa: C901, PLR0911
+        origin, args = typing.get_origin(tp), typing.get_args(tp)
+
+        if attrs.has(tp):
+            return tp(
+                **{
+                    f.name: self._value(f.type, f.name, zone, datetimes)
+                    for f in attrs.fields(tp)
+                }
+            )
+        if origin in (typing.Union, types.UnionType):
+            (tp,) = (arg for arg in args if arg is not type(None))
+            return self._value(tp, name, zone, datetimes)
+        if origin is list:
+            if name == "access":
+                return list(self.routes)
+            (item,) = args
+            if attrs.has(item) and "datetime" in attrs.fields_dict(item):
+                # one record per datetime of the series
+                return [self._value(item, name, zone, [dt]) for dt in datetimes]
+            return []
+        if origin is dict:
+            if attrs.has(args[1]):
+                return {
+                    z: self._value(args[1], name, z, datetimes) for z in SYNTHETIC_ZONES
+                }
+            return {}
+        if tp is datetime:
+            return datetimes[0]
+        if isinstance(tp, type) and issubclass(tp, Enum):
+            return next(iter(tp))
+        if tp is bool:
+            return False
+        if tp is int:
+            return self.rng.randint(0, 1000)
+        if tp is float:
+            return self.rng.uniform(0, 1000)
+        return _STRINGS.get(name, zone)
+
+    def payload(self, endpoint: Endpoint[..., Any], params: Mapping[str, str]) -> Any:
+        datetimes = self._datetimes(endpoint.path, params)
+        if not datetimes:
+            datetimes = [datetime.now(timezone.utc)]
+        zone = self._zone(params)
+        value = self._value(endpoint.response_schema, "", zone, datetimes)
+        return converter.unstructure(value)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, as the API
+    disable_nagle_algorithm = True  # headers and content are written separately
+
+    def do_GET(self) -> None:  # noqa: N802
+        stand_in = cast(_HTTPServer, self.server).stand_in
+        status_code, headers, content = stand_in.handle("GET", self.path)
+
+        if stand_in.compress and "gzip" in self.headers.get("accept-encoding", ""):
+            content = gzip.compress(content, compresslevel=1)
+            headers["content-encoding"] = "gzip"
+
+        self.send_response(status_code)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header("content-length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, *args: Any) -> None:
+        pass
+
+
+class _HTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128  # so that bursts of connections are not dropped
+    stand_in: "StandInServer"
+
+
+class StandInServer:
+    """A local HTTP server emulating the Electricity Maps API.
+
+    Requests are answered with the responses recorded in a cassette, if any, or with synthetic payloads otherwise (e.g.
+    hourly records over the requested range), after emulating the configured network and server conditions.
+
+    Examples:
+        >>> import voltorb
+        >>> with StandInServer(latency=0.05, jitter=0.01, error_rate=0.01) as server:
+        ...     zones = voltorb.execute(voltorb.electricity_maps.get_zones(), client=server.client())
+
+    Args:
+        latency (optional): The mean latency of responses, in seconds.
+        jitter (optional): The (uniform) variation of the latency of responses, in seconds.
+        error_rate (optional): The probability of a request failing with a 503 error.
+        burst_rate (optional): The probability of a request starting a burst of 429 errors.
+        burst_length (optional): The number of consecutive requests failing with 429 errors in a burst.
+        rate_limit (optional): The maximum number of requests per second, above which requests fail with 429 errors.
+        cassette (optional): The recorded responses to serve.
+        compress (optional): Whether to gzip compress responses, when accepted by clients.
+        seed (optional): The seed of the random generator (e.g. for reproducible errors and payloads).
+        host (optional): The host to listen on.
+        port (optional): The port to listen on. Defaults to any free port.
+    """
+
+    def __init__(  # noqa: PLR0913
+        self,
+        *,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        error_rate: float = 0.0,
+        burst_rate: float = 0.0,
+        burst_length: int = 5,
+        rate_limit: float | None = None,
+        cassette: Cassette | None = None,
+        compress: bool = True,
+        seed: int | None = None,
+        host: str = "127.0.0.1",
+        port: int = 0,
+    ) -> None:
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.burst_rate = burst_rate
+        self.burst_length = burst_length
+        self.rate_limit = rate_limit
+        self.cassette = cassette
+        self.compress = compress
+        self.stats: Counter[int] = Counter()
+        """The number of responses served, by status code."""
+
+        self._rng = random.Random(seed)  # noqa: S311
+        self._synthesiser = _Synthesiser(self._rng)
+        self._lock = threading.Lock()
+        self._burst = 0
+        self._tokens = rate_limit or 0.0
+        self._refilled_at = time.monotonic()
+
+        self._server = _HTTPServer((host, port), _Handler)
+        self._server.stand_in = self
+        self._thread: threading.Thread | None = None
+
+    @property
+    def url(self) -> str:
+        """The base URL of the server."""
+        host, port = self._server.server_address[:2]
+        return f"http://{host!s}:{port}"
+
+    def client(self, client: Any = None) -> RedirectingClient:
+        """A client sending API requests to this server instead."""
+        return RedirectingClient(self.url, client)
+
+    def _throttled(self) -> float | None:
+        """How long to wait before retrying, if the request is throttled."""
+        # to be called with the lock held
+        if self._burst > 0:
+            self._burst -= 1
+            return 1.0
+        if self.burst_rate and self._rng.random() < self.burst_rate:
+            self._burst = self.burst_length - 1
+            return 1.0
+
+        if self.rate_limit is None:
+            return None
+        # token bucket, allowing bursts of up to a second's worth of requests
+        now = time.monotonic()
+        self._tokens = min(
+            self._tokens + (now - self._refilled_at) * self.rate_limit, self.rate_limit
+        )
+        self._refilled_at = now
+        if self._tokens < 1:
+            return (1 - self._tokens) / self.rate_limit
+        self._tokens -= 1
+        return None
+
+    def _respond(self, method: str, path: str) -> tuple[int, dict[str, str], Any]:
+        url = urllib.parse.urlsplit(path)
+        params = dict(urllib.parse.parse_qsl(url.query))
+
+        with self._lock:
+            retry_after = self._throttled()
+            failed = self.error_rate and self._rng.random() < self.error_rate
+            delay = self.latency + self._rng.uniform(-self.jitter, self.jitter)
+
+        if retry_after is not None:
+            headers = {"retry-after": str(math.ceil(retry_after))}
+            return 429, headers, {"message": "Too many requests"}
+
+        time.sleep(max(delay, 0))
+
+        if failed:
+            return 503, {}, {"message": "Service unavailable"}
+
+        if self.cassette is not None:
+            interaction = self.cassette.lookup(method, url.path, params)
+            if interaction is not None:
+                return (
+                    interaction.status_code,
+                    dict(interaction.headers),
+                    interaction.content,
+                )
+
+        endpoint = ENDPOINTS.get(url.path)
+        if endpoint is None:
+            return 404, {}, {"message": f"Route {url.path!r} not found"}
+        if endpoint.geolocated and not (
+            "zone" in params or {"lon", "lat"} <= params.keys()
+        ):
+            return 400, {}, {"message": "Either zone or lon and lat are required"}
+
+        return 200, {}, self._synthesiser.payload(endpoint, params)
+
+    def handle(self, method: str, path: str) -> tuple[int, dict[str, str], bytes]:
+        """Answers a request.
+
+        Returns:
+            The status code, headers and content of the response.
+        """
+        status_code, headers, payload = self._respond(method, path)
+        content = payload if isinstance(payload, str) else json.dumps(payload)
+        headers.setdefault("content-type", "application/json")
+
+        with self._lock:
+            self.stats[status_code] += 1
+
+        return status_code, headers, content.encode()
+
+    def start(self) -> "StandInServer":
+        """Starts serving requests in a background thread."""
+        if self._thread is None:
+            self._thread = threading.Thread(
+                target=self._server.serve_forever, name="voltorb-stand-in", daemon=True
+            )
+            self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """Stops serving requests."""
+        if self._thread is not None:
+            self._server.shutdown()
+            self._thread.join()
+            self._thread = None
+        self._server.server_close()
+
+    def __enter__(self) -> "StandInServer":
+        return self.start()
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.stop()
+
+    def __repr__(self) -> str:
+        return f"StandInServer({self.url!r})"
+
+
+def _resp(value: Any) -> bytes:
+    """Encodes a reply in the Redis serialisation protocol (RESP)."""
+    if value is None:
+        return b"$-1\r\n"
+    if isinstance(value, bytes):
+        return b"$%d\r\n%s\r\n" % (len(value), value)
+    if isinstance(value, int):
+        return b":%d\r\n" % value
+    if isinstance(value, list):
+        return b"*%d\r\n" % len(value) + b"".join(_resp(v) for v in value)
+    if isinstance(value, Exception):
+        return f"-ERR {value}\r\n".encode()
+    return f"+{value}\r\n".encode()
+
+
+def _read_command(file: BufferedIOBase) -> list[bytes] | None:
+    """Decodes a command in the Redis serialisation protocol (RESP), if any (i.e. unless the connection is closed)."""
+    line = file.readline()
+    if not line.startswith(b"*"):
+        return None
+    args = []
+    for _ in range(int(line[1:])):
+        length = int(file.readline()[1:])
+        args.append(file.read(length + 2)[:-2])
+    return args
+
+
+class _RedisHandler(StreamRequestHandler):
+    disable_nagle_algorithm = True
+
+    def handle(self) -> None:
+        stand_in = cast(_RedisServer, self.server).stand_in
+        while (command := _read_command(self.rfile)) is not None:
+            self.wfile.write(_resp(stand_in.execute(command)))
+
+
+class _RedisServer(ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+    request_queue_size = 128
+    stand_in: "StandInRedis"
+
+
+class StandInRedis:
+    """A local server speaking the Redis protocol, storing entries in memory (with expiry).
+
+    Only the commands used by :class:`voltorb.cache.RedisBackend` are implemented: PING, AUTH, SELECT, GET, MGET,
+    SET (with EX or PX), DEL, PTTL, DBSIZE and FLUSHDB.
+
+    Examples:
+        >>> from voltorb.cache import RedisBackend
+        >>> with StandInRedis() as redis, RedisBackend(redis.url) as backend:
+        ...     backend.set("key", b"value", ttl=60)
+        ...     backend.get_many(["key", "other"])
+        [b'value', None]
+
+    Args:
+        host (optional): The host to listen on.
+        port (optional): The port to listen on. Defaults to any free port.
+    """
+
+    def __init__(self, *, host: str = "127.0.0.1", port: int = 0) -> None:
+        self.stats: Counter[str] = Counter()
+        """The number of commands executed, by name."""
+        self._entries: dict[bytes, tuple[float | None, bytes]] = {}
+        self._lock = threading.Lock()
+        self._server = _RedisServer((host, port), _RedisHandler)
+        self._server.stand_in = self
+        self._thread: threading.Thread | None = None
+
+    @property
+    def url(self) -> str:
+        """The URL of the server."""
+        host, port = self._server.server_address[:2]
+        return f"redis://{host!s}:{port}/0"
+
+    def _get(self, key: bytes, now: float) -> bytes | None:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at is not None and expires_at <= now:
+            del self._entries[key]
+            return None
+        return value
+
+    def _set(self, args: list[bytes]) -> Any:
+        key, value, *options = args
+        expires_at = None
+        if options:
+            unit, amount = options[0].upper(), float(options[1])
+            expires_at = time.monotonic() + (amount / 1000 if unit == b"PX" else amount)
+        self._entries[key] = (expires_at, value)
+        return "OK"
+
+    def execute(self, command: list[bytes]) -> Any:  # noqa: C901, PLR0911
+        """Executes a command, returning its reply."""
+        name, args = command[0].upper().decode(), command[1:]
+        now = time.monotonic()
+        with self._lock:
+            self.stats[name] += 1
+            if name == "PING":
+                return "PONG"
+            if name in ("AUTH", "SELECT"):
+                return "OK"
+            if name == "GET":
+                return self._get(args[0], now)
+            if name == "MGET":
+                return [self._get(key, now) for key in args]
+            if name == "SET":
+                return self._set(args)
+            if name == "DEL":
+                return sum(self._entries.pop(key, None) is not None for key in args)
+            if name == "PTTL":
+                if self._get(args[0], now) is None:  # expired, or missing
+                    return -2
+                entry = self._entries[args[0]]
+                return -1 if entry[0] is None else int((entry[0] - now) * 1000)
+            if name == "DBSIZE":
+                return len(self._entries)
+            if name == "FLUSHDB":
+                self._entries.clear()
+                return "OK"
+        return ValueError(f"unknown command '{name}'")
+
+    def start(self) -> "StandInRedis":
+        """Starts serving connections in a background thread."""
+        if self._thread is None:
+            self._thread = threading.Thread(
+                target=self._server.serve_forever,
+                name="voltorb-stand-in-redis",
+                daemon=True,
+            )
+            self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """Stops serving connections."""
+        if self._thread is not None:
+            self._server.shutdown()
+            self._thread.join()
+            self._thread = None
+        self._server.server_close()
+
+    def __enter__(self) -> "StandInRedis":
+        return self.start()
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.stop()
+
+    def __repr__(self) -> str:
+        return f"StandInRedis({self.url!r})"
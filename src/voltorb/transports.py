@@ -0,0 +1,168 @@
+"""Alternative HTTP transports, plugging into snug's client dispatch.
+
+Requires the ``http2`` extra (i.e. ``pip install voltorb[http2]``).
+"""
+
+import asyncio
+from collections import Counter
+from collections.abc import AsyncGenerator
+
+import httpx
+import snug
+from attrs import define, field
+
+from voltorb.clients import ClientWrapper
+
+DEFAULT_MAX_CONNECTIONS = 4
+DEFAULT_TIMEOUT = 10.0  # seconds
+
+
+@define
+class TransportStats:
+    """Live statistics of the requests sent through a transport.
+
+    Args:
+        requests: The number of requests sent.
+        errors: The number of requests which failed without a response (e.g. connection errors, timeouts).
+        in_flight: The number of requests currently awaiting a response.
+        peak_in_flight: The highest number of requests awaiting a response at the same time.
+        http_versions: The number of responses received, by HTTP version (e.g. 'HTTP/2').
+    """
+
+    requests: int = 0
+    errors: int = 0
+    in_flight: int = 0
+    peak_in_flight: int = 0
+    http_versions: Counter[str] = field(factory=Counter)
+
+
+class Http2Client(ClientWrapper):
+    """An async client multiplexing concurrent requests over a few HTTP/2 connections, with :mod:`httpx`.
+
+    Concurrent queries (e.g. of a :class:`voltorb.Batch`) share the same connections, rather than each opening their
+    own, as the default async client does.
+
+    Examples:
+        >>> import voltorb
+        >>> async def sweep(zones):
+        ...     async with Http2Client() as client:
+        ...         query = voltorb.electricity_maps.carbon_intensity.get_latest.many(zones)
+        ...         return await voltorb.execute_async(query, client=client)
+
+    Args:
+        max_connections (optional): The maximum number of connections open at any time.
+        max_keepalive_connections (optional): The maximum number of idle connections kept alive.
+        keepalive_expiry (optional): How long idle connections are kept alive for, in seconds.
+        timeout (optional): The timeout of requests, in seconds.
+        transport (optional): The underlying :mod:`httpx` transport (e.g. for testing). Defaults to an HTTP/2 one.
+    """
+
+    def __init__(  # noqa: PLR0913
+        self,
+        *,
+        max_connections: int = DEFAULT_MAX_CONNECTIONS,
+        max_keepalive_connections: int | None = None,
+        keepalive_expiry: float | None = 5.0,
+        timeout: float = DEFAULT_TIMEOUT,
+        transport: httpx.AsyncBaseTransport | None = None,
+    ) -> None:
+        super().__init__()
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self.timeout = timeout
+        self.transport = transport
+        self.stats = TransportStats()
+        self._loop: asyncio.AbstractEventLoop | None = None
+
+    def _client(self) -> httpx.AsyncClient:
+        # connections are bound to the event loop which opened them
+        loop = asyncio.get_running_loop()
+        if self.client is None or self._loop is not loop:
+            self.client = httpx.AsyncClient(
+                http2=True,
+                limits=self.limits,
+                timeout=self.timeout,
+                transport=self.transport,
+            )
+            self._loop = loop
+        client: httpx.AsyncClient = self.client
+        return client
+
+    def send(self, request: snug.Request) -> snug.Response:  # noqa: ARG002
+        msg = f"{type(self).__name__} can only be used with async executors"
+        raise TypeError(msg)
+
+    async def send_async(self, request: snug.Request) -> snug.Response:
+        client = self._client()
+
+        stats = self.stats
+        stats.requests += 1
+        stats.in_flight += 1
+        stats.peak_in_flight = max(stats.peak_in_flight, stats.in_flight)
+        try:
+            response = await client.request(
+                request.method,
+                request.url,
+                params=request.params,
+                content=request.content,
+                headers=request.headers,
+            )
+        except httpx.HTTPError:
+            stats.errors += 1
+            raise
+        finally:
+            stats.in_flight -= 1
+
+        stats.http_versions[response.http_version] += 1
+        return snug.Response(
+            response.status_code, response.content, headers=response.headers
+        )
+
+    async def aclose(self) -> None:
+        """Closes the open connections."""
+        if self.client is not None:
+            await self.client.aclose()
+            self.client = None
+
+    async def __aenter__(self) -> "Http2Client":
+        return self
+
+    async def __aexit__(self, *exc_info: object) -> None:
+        await self.aclose()
+
+    def __repr__(self) -> str:
+        return f"Http2Client(max_connections={self.limits.max_connections})"
+
+
+# the clients shared by the executions of each event loop, with the async generators holding them open
+_shared: dict[
+    asyncio.AbstractEventLoop, tuple[Http2Client, AsyncGenerator[None, None]]
+] = {}
+
+
+async def _held_open(client: Http2Client) -> AsyncGenerator[None, None]:
+    try:
+        yield
+    finally:
+        await client.aclose()
+
+
+async def _shared_client() -> Http2Client:
+    """The HTTP/2 client shared by the executions of the running event loop, created on first use.
+
+    The client is closed along with its event loop (e.g. by :func:`asyncio.run`, which finalises its async
+    generators before closing), and the clients of closed loops are dropped when a new one is created.
+    """
+    loop = asyncio.get_running_loop()
+    shared = _shared.get(loop)
+    if shared is None:
+        for closed in [other for other in _shared if other.is_closed()]:
+            del _shared[closed]
+        client = Http2Client()
+        shared = _shared[loop] = (client, _held_open(client))
+        # started within the loop, so that the loop finalises it
+        await anext(shared[1])
+    return shared[0]
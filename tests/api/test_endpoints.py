@@ -0,0 +1,109 @@
+import asyncio
+import inspect
+
+import pytest
+import snug
+
+from voltorb import ZoneKey, electricity_maps, execute, execute_async, schemas
+from voltorb.api import ENDPOINTS
+
+
+def test_endpoints_are_registered():
+    """That all API routes are registered in the endpoints table."""
+    assert ENDPOINTS["/v3/carbon-intensity/latest"] is (
+        electricity_maps.carbon_intensity.get_latest
+    )
+    assert ENDPOINTS["/v3/updated-since"] is electricity_maps.get_updated_since
+
+
+@pytest.mark.parametrize(
+    "endpoint", [e for e in ENDPOINTS.values() if e.geolocated], ids=lambda e: e.path
+)
+def test_geolocated_endpoints_have_batch_variants(endpoint):
+    """That every endpoint taking a geolocation gets a generated batch variant."""
+    namespaces = [electricity_maps] + [
+        v for v in vars(electricity_maps).values() if isinstance(v, type)
+    ]
+    batch_variants = [
+        getattr(namespace, f"{name}_many")
+        for namespace in namespaces
+        for name, value in vars(namespace).items()
+        if value is endpoint
+    ]
+    assert batch_variants == [endpoint.many]
+
+
+def test_endpoints_expose_their_signature_and_documentation():
+    """That endpoints can be introspected like the functions they replace."""
+    endpoint = electricity_maps.carbon_intensity.get_past
+
+    assert list(inspect.signature(endpoint).parameters) == [
+        "geolocation",
+        "date_time",
+        "emission_factor_type",
+        "disable_estimations",
+    ]
+    assert "past carbon intensity" in (inspect.getdoc(endpoint) or "")
+
+
+@pytest.mark.parametrize(
+    ("args", "kwargs"),
+    [
+        ((), {}),
+        ((ZoneKey("DE"), None, None), {}),
+        ((ZoneKey("DE"),), {"geolocation": ZoneKey("DE")}),
+        ((ZoneKey("DE"),), {"unexpected": True}),
+    ],
+    ids=["missing", "too-many", "duplicate", "unexpected"],
+)
+def test_endpoints_reject_invalid_arguments(args, kwargs):
+    """That endpoints raise on invalid arguments, like regular functions."""
+    with pytest.raises(TypeError):
+        electricity_maps.power_breakdown.get_latest(*args, **kwargs)
+
+
+def test_batch_variant_returns_results_keyed_by_geolocation(fixture_mock_client):
+    """That batch variants fan out over geolocations and key the results by geolocation."""
+    query = electricity_maps.carbon_intensity.get_latest.many(
+        [ZoneKey("DE"), ZoneKey("FR")], disable_estimations=True, max_concurrency=1
+    )
+
+    client = fixture_mock_client(
+        snug.Response(200, MOCK_CARBON_INTENSITY_LATEST % b"DE"),
+        snug.Response(200, MOCK_CARBON_INTENSITY_LATEST % b"FR"),
+    )
+
+    response = execute(query, client=client)
+
+    assert list(response) == ["DE", "FR"]
+    assert all(isinstance(r, schemas.CarbonIntensity) for r in response.values())
+    assert [request.params for request in client.requests] == [
+        {"zone": "DE", "disableEstimations": True},
+        {"zone": "FR", "disableEstimations": True},
+    ]
+
+
+def test_batch_variant_executes_asynchronously(fixture_mock_client):
+    """That batch variants plug into async executors."""
+    query = electricity_maps.carbon_intensity.get_latest.many([ZoneKey("DE")])
+
+    client = fixture_mock_client(
+        snug.Response(200, MOCK_CARBON_INTENSITY_LATEST % b"DE")
+    )
+
+    response = asyncio.run(execute_async(query, client=client))
+    assert response["DE"].zone == "DE"
+
+
+MOCK_CARBON_INTENSITY_LATEST = b"""\
+{
+  "zone": "%s",
+  "carbonIntensity": 302,
+  "datetime": "2018-04-25T18:07:00.350Z",
+  "updatedAt": "2018-04-25T18:07:01.000Z",
+  "createdAt": "2018-04-25T18:07:01.000Z",
+  "emissionFactorType": "lifecycle",
+  "isEstimated": true,
+  "estimationMethod": "TIME_SLICER_AVERAGE"
+}
+"""
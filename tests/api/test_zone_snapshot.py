@@ -0,0 +1,161 @@
+import asyncio
+
+import pytest
+import snug
+
+from voltorb import ZoneKey, electricity_maps, execute, execute_async, schemas
+from voltorb.exceptions import ForbiddenError
+
+
+def test_get_zone_snapshot(fixture_mock_routing_client):
+    """That a zone snapshot gathers the latest data and forecasts of a zone."""
+    query = electricity_maps.get_zone_snapshot(ZoneKey("FR"))
+
+    client = fixture_mock_routing_client(MOCK_ROUTES)
+
+    snapshot = execute(query, client=client)
+
+    assert isinstance(snapshot, schemas.ZoneSnapshot)
+    assert snapshot.zone == "FR"
+    assert isinstance(snapshot.carbon_intensity, schemas.CarbonIntensity)
+    assert isinstance(snapshot.power_breakdown, schemas.PowerBreakdown)
+    assert isinstance(
+        snapshot.carbon_intensity_forecast, schemas.CarbonIntensityForecast
+    )
+    assert isinstance(snapshot.power_breakdown_forecast, schemas.PowerBreakdownForecast)
+    assert len(client.requests) == len(MOCK_ROUTES)
+
+
+def test_get_zone_snapshot_async(fixture_mock_routing_client):
+    """That a zone snapshot can be executed asynchronously."""
+    query = electricity_maps.get_zone_snapshot(ZoneKey("FR"))
+
+    client = fixture_mock_routing_client(MOCK_ROUTES)
+
+    snapshot = asyncio.run(execute_async(query, client=client))
+    assert snapshot.zone == "FR"
+
+
+@pytest.mark.parametrize("status_code", [401, 403])
+def test_get_zone_snapshot_is_partial_without_commercial_routes(
+    fixture_mock_routing_client, status_code
+):
+    """That a zone snapshot leaves out forecasts if the token does not have access to them."""
+    query = electricity_maps.get_zone_snapshot(ZoneKey("FR"))
+
+    denied = snug.Response(status_code, content=b'{"message": "denied"}')
+    client = fixture_mock_routing_client(
+        MOCK_ROUTES
+        | {
+            "/v3/carbon-intensity/forecast": denied,
+            "/v3/power-breakdown/forecast": denied,
+        }
+    )
+
+    snapshot = execute(query, client=client)
+
+    assert isinstance(snapshot.carbon_intensity, schemas.CarbonIntensity)
+    assert snapshot.carbon_intensity_forecast is None
+    assert snapshot.power_breakdown_forecast is None
+
+
+def test_get_zone_snapshot_raises_without_commercial_routes_if_not_partial(
+    fixture_mock_routing_client,
+):
+    """That a zone snapshot can be required to be complete."""
+    query = electricity_maps.get_zone_snapshot(ZoneKey("FR"), partial=False)
+
+    denied = snug.Response(403, content=b'{"message": "denied"}')
+    client = fixture_mock_routing_client(
+        MOCK_ROUTES | {"/v3/power-breakdown/forecast": denied}
+    )
+
+    with pytest.raises(ForbiddenError):
+        execute(query, client=client)
+
+
+MOCK_CARBON_INTENSITY = b"""\
+{
+  "zone": "FR",
+  "carbonIntensity": 302,
+  "datetime": "2018-04-25T18:07:00.350Z",
+  "updatedAt": "2018-04-25T18:07:01.000Z",
+  "createdAt": "2018-04-25T18:07:01.000Z",
+  "emissionFactorType": "lifecycle",
+  "isEstimated": true,
+  "estimationMethod": "TIME_SLICER_AVERAGE"
+}
+"""
+
+MOCK_CARBON_INTENSITY_FORECAST = b"""\
+{
+  "zone": "FR",
+  "forecast": [
+    {
+      "carbonIntensity": 326,
+      "datetime": "2018-11-26T17:00:00.000Z"
+    }
+  ],
+  "updatedAt": "2018-11-26T17:25:24.685Z"
+}
+"""
+
+MOCK_POWER_BREAKDOWN = b"""\
+{
+  "zone": "FR",
+  "datetime": "2022-04-20T09:00:00.000Z",
+  "updatedAt": "2022-04-20T06:40:32.246Z",
+  "createdAt": "2022-04-14T17:30:23.620Z",
+  "powerConsumptionBreakdown": {
+    "nuclear": 31479,
+    "geothermal": 0,
+    "biomass": 753,
+    "coal": 227,
+    "wind": 8122,
+    "solar": 4481,
+    "hydro": 7106,
+    "gas": 6146,
+    "oil": 341,
+    "unknown": 2,
+    "hydro discharge": 1013,
+    "battery discharge": 0
+  },
+  "powerProductionBreakdown": {
+    "nuclear": 31438,
+    "geothermal": null,
+    "biomass": 740,
+    "coal": 219,
+    "wind": 8034,
+    "solar": 4456,
+    "hydro": 7099,
+    "gas": 6057,
+    "oil": 341,
+    "unknown": null,
+    "hydro discharge": 1012,
+    "battery discharge": null
+  },
+  "powerImportBreakdown": {
+    "GB": 548
+  },
+  "powerExportBreakdown": {
+    "GB": 0
+  },
+  "fossilFreePercentage": 89,
+  "renewablePercentage": 36,
+  "powerConsumptionTotal": 59670,
+  "powerProductionTotal": 59396,
+  "powerImportTotal": 548,
+  "powerExportTotal": 0,
+  "isEstimated": true,
+  "estimationMethod": "TIME_SLICER_AVERAGE"
+}
+"""
+
+MOCK_POWER_BREAKDOWN_FORECAST = b'{"zone": "FR", "data": [%s]}' % MOCK_POWER_BREAKDOWN
+
+MOCK_ROUTES = {
+    "/v3/carbon-intensity/latest": snug.Response(200, MOCK_CARBON_INTENSITY),
+    "/v3/power-breakdown/latest": snug.Response(200, MOCK_POWER_BREAKDOWN),
+    "/v3/carbon-intensity/forecast": snug.Response(200, MOCK_CARBON_INTENSITY_FORECAST),
+    "/v3/power-breakdown/forecast": snug.Response(200, MOCK_POWER_BREAKDOWN_FORECAST),
+}
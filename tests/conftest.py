@@ -1,6 +1,10 @@
+from collections.abc import Iterator
+
 import pytest
 import snug
 
+from voltorb.testing import StandInServer
+
 
 class MockClient:
     """A mock client that returns canned responses and keep tracks."""
@@ -20,11 +24,46 @@ class MockClient:
 
         return self.response
 
+    async def send_async(self, req: snug.Request) -> snug.Response:
+        return self.send(req)
+
+
+# dispatch through the methods, so that subclasses can override them
+snug.send.register(MockClient, lambda client, req: client.send(req))
+snug.send_async.register(MockClient, lambda client, req: client.send_async(req))
+
 
-snug.send.register(MockClient, MockClient.send)
+class MockRoutingClient(MockClient):
+    """A mock client that returns canned responses by URL path, regardless of the order of the requests."""
+
+    def __init__(self, routes: dict[str, snug.Response]) -> None:
+        super().__init__()
+        self.routes = routes
+
+    def send(self, req: snug.Request) -> snug.Response:
+        self.requests.append(req)
+        self.request = req
+
+        path = req.url.split("://", 1)[-1].partition("/")[-1]
+        self.response = self.routes[f"/{path}"]
+
+        return self.response
 
 
 @pytest.fixture()
 def fixture_mock_client() -> type[MockClient]:
     """A mock client class to be instantiated by tests in the suite."""
     return MockClient
+
+
+@pytest.fixture()
+def fixture_mock_routing_client() -> type[MockRoutingClient]:
+    """A mock routing client class to be instantiated by tests in the suite."""
+    return MockRoutingClient
+
+
+@pytest.fixture()
+def server() -> Iterator[StandInServer]:
+    """A local stand-in of the API, with deterministic synthetic payloads."""
+    with StandInServer(seed=0) as server:
+        yield server
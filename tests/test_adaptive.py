@@ -0,0 +1,214 @@
+import asyncio
+import threading
+import time
+from collections import Counter
+
+import pytest
+import snug
+
+from voltorb import (
+    AdaptiveConcurrencyClient,
+    Batch,
+    ClientWrapper,
+    HTTPStatusError,
+    electricity_maps,
+    execute,
+    execute_async,
+    schemas,
+)
+from voltorb.adaptive import AdaptiveLimiter
+from voltorb.batch import OrNone
+
+HEALTHY = b'{"monitors": {"state": "ok"}, "status": "ok"}'
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class ThrottlingClient(ClientWrapper):
+    """A client throttling (with 429s) the requests over the given concurrency, and tracking the peak concurrency."""
+
+    def __init__(self, capacity: int, latency: float = 0.01) -> None:
+        super().__init__()
+        self.capacity = capacity
+        self.latency = latency
+        self.in_flight = 0
+        self.peak = 0
+        self.stats: Counter[int] = Counter()
+        self.lock = threading.Lock()
+
+    def _enter(self) -> bool:
+        with self.lock:
+            self.in_flight += 1
+            self.peak = max(self.peak, self.in_flight)
+            return self.in_flight <= self.capacity
+
+    def _exit(self, *, accepted: bool) -> snug.Response:
+        with self.lock:
+            self.in_flight -= 1
+            self.stats[200 if accepted else 429] += 1
+        if not accepted:
+            return snug.Response(429, b'{"message": "Too many requests"}')
+        return snug.Response(200, HEALTHY)
+
+    def send(self, request: snug.Request) -> snug.Response:  # noqa: ARG002
+        accepted = self._enter()
+        time.sleep(self.latency)
+        return self._exit(accepted=accepted)
+
+    async def send_async(self, request: snug.Request) -> snug.Response:  # noqa: ARG002
+        accepted = self._enter()
+        await asyncio.sleep(self.latency)
+        return self._exit(accepted=accepted)
+
+
+def _health_batch(size: int) -> Batch[int, schemas.Health | None]:
+    # throttled requests are not retried, and don't fail the batch
+    return Batch(
+        {
+            i: OrNone(electricity_maps.get_health(), HTTPStatusError)
+            for i in range(size)
+        },
+        max_concurrency=size,
+    )
+
+
+def test_limit_increases_additively_while_healthy():
+    """That healthy responses raise the limit by about one per round trip, only while the limit is used."""
+    clock = FakeClock()
+    limiter = AdaptiveLimiter(initial=2, maximum=3, clock=clock)
+
+    # a single request at a time never uses the limit
+    for _ in range(10):
+        limiter.release(limiter.acquire(), congested=False)
+    assert limiter.limit == 2  # noqa: PLR2004
+
+    for _ in range(3):
+        started = [limiter.acquire() for _ in range(limiter.limit)]
+        for s in started:
+            limiter.release(s, congested=False)
+    assert limiter.limit == 3  # noqa: PLR2004
+
+
+def test_limit_decreases_multiplicatively_once_per_round_trip():
+    """That congestion halves the limit, once for all the requests sent at the same limit."""
+    clock = FakeClock()
+    limiter = AdaptiveLimiter(initial=16, clock=clock)
+
+    started = [limiter.acquire() for _ in range(16)]
+    clock.now = 1
+    for s in started:
+        limiter.release(s, congested=True)
+    assert limiter.limit == 8  # noqa: PLR2004
+
+    for _ in range(2):
+        limiter.release(limiter.acquire(), congested=True)
+    assert limiter.limit == 2  # noqa: PLR2004
+    assert limiter.stats["cuts"] == 3  # noqa: PLR2004
+
+    for _ in range(5):
+        limiter.release(limiter.acquire(), congested=True)
+    assert limiter.limit == 1
+
+
+def test_latency_spikes_count_as_congestion():
+    """That responses much slower than usual cut the limit, and uncompleted requests don't adapt it."""
+    clock = FakeClock()
+    limiter = AdaptiveLimiter(initial=4, clock=clock)
+
+    for _ in range(5):
+        started = limiter.acquire()
+        clock.now += 0.1
+        limiter.release(started, congested=False)
+    assert limiter.latency == pytest.approx(0.1)
+
+    started = limiter.acquire()
+    clock.now += 1
+    limiter.release(started, congested=None)
+    assert limiter.limit == 4  # noqa: PLR2004
+
+    started = limiter.acquire()
+    clock.now += 1
+    limiter.release(started, congested=False)
+    assert limiter.limit == 2  # noqa: PLR2004
+    assert limiter.stats["latency_spikes"] == 1
+
+
+def test_latency_baseline_follows_lasting_shifts():
+    """That latencies shifting upward for good cut the limit until they are the usual ones, rather than forever."""
+    clock = FakeClock()
+    limiter = AdaptiveLimiter(initial=4, clock=clock)
+
+    started = limiter.acquire()
+    clock.now += 0.05
+    limiter.release(started, congested=False)
+    for _ in range(200):
+        round_trip = [limiter.acquire() for _ in range(limiter.limit)]
+        clock.now += 0.3
+        for s in round_trip:
+            limiter.release(s, congested=False)
+
+    assert limiter.latency == pytest.approx(0.3)
+    assert limiter.stats["latency_spikes"] < 10  # noqa: PLR2004
+    assert limiter.limit > 4  # noqa: PLR2004
+
+
+def test_rejects_invalid_configurations():
+    """That limits must be ordered, and the backoff a fraction."""
+    with pytest.raises(ValueError, match="minimum"):
+        AdaptiveLimiter(initial=4, maximum=2)
+    with pytest.raises(ValueError, match="backoff"):
+        AdaptiveLimiter(backoff=1)
+
+
+def test_sync_batches_converge_under_the_throttling_ceiling():
+    """That the requests of sync batches are held under the limit, which backs off from throttling to the ceiling."""
+    server = ThrottlingClient(capacity=4)
+    client = AdaptiveConcurrencyClient(server, initial=16, maximum=16)
+
+    execute(_health_batch(32), client=client)
+    assert client.limit < 16  # noqa: PLR2004
+    throttled = server.stats[429]
+
+    for _ in range(5):
+        execute(_health_batch(32), client=client)
+
+    assert server.peak <= 16  # noqa: PLR2004
+    assert client.limit <= 8  # noqa: PLR2004
+    # hardly any requests throttled once converged
+    assert server.stats[429] - throttled < 32  # noqa: PLR2004
+    assert client.stats["waits"] > 0
+
+
+def test_async_requests_wait_for_the_limit():
+    """That concurrent tasks never have more requests in flight than the limit."""
+    server = ThrottlingClient(capacity=100)
+    client = AdaptiveConcurrencyClient(server, initial=3, maximum=3)
+
+    responses = asyncio.run(execute_async(_health_batch(20), client=client))
+
+    assert len(responses) == 20  # noqa: PLR2004
+    assert server.peak == 3  # noqa: PLR2004
+    assert client.stats["requests"] == 20  # noqa: PLR2004
+    assert client.limiter.in_flight == 0
+
+
+def test_errors_count_as_congestion():
+    """That requests failing to get a response cut the limit, and free their slot."""
+
+    class FailingClient(ClientWrapper):
+        def send(self, request: snug.Request) -> snug.Response:  # noqa: ARG002
+            raise ConnectionError
+
+    client = AdaptiveConcurrencyClient(FailingClient(), initial=4)
+
+    with pytest.raises(ConnectionError):
+        execute(electricity_maps.get_health(), client=client)
+
+    assert client.limit == 2  # noqa: PLR2004
+    assert client.limiter.in_flight == 0
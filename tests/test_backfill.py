@@ -0,0 +1,190 @@
+import json
+import queue
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime, timezone
+from pathlib import Path
+
+import pytest
+
+from voltorb.backfill import (
+    BackfillProgress,
+    BackfillTask,
+    Checkpoint,
+    TaskResult,
+    _collect_completed,
+    backfill,
+    plan,
+)
+from voltorb.cli import main
+from voltorb.testing import StandInServer
+
+START = datetime(2024, 1, 1, tzinfo=timezone.utc)
+END = datetime(2024, 1, 25, tzinfo=timezone.utc)  # 3 windows
+
+
+def test_plan():
+    """That backfills are planned as API sized tasks, zone by zone and in order."""
+    tasks = plan("carbon-intensity", ["IT", "FR"], START, END)
+
+    assert [(t.zone, t.start.day, t.end.day) for t in tasks] == [
+        ("IT", 1, 11),
+        ("IT", 11, 21),
+        ("IT", 21, 25),
+        ("FR", 1, 11),
+        ("FR", 11, 21),
+        ("FR", 21, 25),
+    ]
+
+
+def test_plan_raises_on_unknown_datasets():
+    """That unknown datasets are rejected upfront."""
+    with pytest.raises(ValueError, match="Unknown dataset"):
+        plan("weather", ["IT"], START, END)
+
+
+def test_checkpoint_is_durable(tmp_path: Path):
+    """That completed tasks are recorded across runs, ignoring torn lines."""
+    task, other = plan("carbon-intensity", ["IT"], START, END)[:2]
+    path = tmp_path / "checkpoint.jsonl"
+
+    with Checkpoint(path) as checkpoint:
+        checkpoint.record(task, 240)
+    with path.open("a") as file:
+        file.write('{"task": "carbon-int')  # e.g. on power loss
+    with Checkpoint(path) as checkpoint:
+        assert task in checkpoint
+        assert other not in checkpoint
+        checkpoint.record(other, 240)
+
+    assert len(Checkpoint(path)) == 2  # noqa: PLR2004
+
+
+def test_backfill(server, tmp_path: Path):
+    """That all tasks are run across processes, each writing its own file, and recorded in the checkpoint."""
+    tasks = plan("power-breakdown", ["IT", "FR"], START, END)
+
+    with Checkpoint(tmp_path / "checkpoint.jsonl") as checkpoint:
+        progress = backfill(
+            tasks,
+            tmp_path,
+            checkpoint=checkpoint,
+            processes=2,
+            batch_size=2,
+            url=server.url,
+        )
+
+    assert progress.done
+    assert progress.records == 2 * 24 * 24
+    assert len(checkpoint) == len(tasks)
+    assert server.stats == {200: len(tasks)}
+    lines = tasks[0].path(tmp_path, "ndjson").read_text().splitlines()
+    assert len(lines) == 24 * 10
+    assert json.loads(lines[0])["zone"] == "IT"
+
+
+def test_backfill_records_each_task_as_it_completes(server, tmp_path: Path):
+    """That tasks are recorded one at a time, rather than once their whole batch completes."""
+    tasks = plan("carbon-intensity", ["IT", "FR"], START, END)
+    recorded: list[tuple[int, int]] = []
+
+    def progress(state: BackfillProgress) -> None:
+        recorded.append((state.completed, len(checkpoint)))
+
+    with Checkpoint(tmp_path / "checkpoint.jsonl") as checkpoint:
+        backfill(
+            tasks,
+            tmp_path,
+            checkpoint=checkpoint,
+            processes=1,
+            batch_size=len(tasks),
+            url=server.url,
+            progress=progress,
+        )
+
+    assert recorded == [(i, i) for i in range(len(tasks) + 1)]
+
+
+def test_completed_tasks_are_recorded_before_batch_errors():
+    """That the results of completed tasks are collected before raising the error of a failed batch."""
+    task = plan("carbon-intensity", ["IT"], START, END)[0]
+    failed: Future[None] = Future()
+    failed.set_exception(BrokenProcessPool("crashed"))
+    results: queue.Queue[TaskResult] = queue.Queue()
+    results.put(TaskResult(task, 240))
+    collected: list[TaskResult] = []
+
+    with pytest.raises(BrokenProcessPool):
+        _collect_completed({failed}, results, collected.append)
+    assert collected == [TaskResult(task, 240)]
+
+
+def test_backfill_resumes(server, tmp_path: Path):
+    """That only the tasks not completed by previous runs are run."""
+    tasks = plan("carbon-intensity", ["IT", "FR"], START, END)
+    with Checkpoint(tmp_path / "checkpoint.jsonl") as checkpoint:
+        for task in tasks[:4]:
+            checkpoint.record(task, 0)
+
+    with Checkpoint(tmp_path / "checkpoint.jsonl") as checkpoint:
+        progress = backfill(
+            tasks, tmp_path, checkpoint=checkpoint, processes=0, url=server.url
+        )
+
+    assert (progress.skipped, progress.completed) == (4, 2)
+    assert server.stats == {200: 2}
+    assert not tasks[0].path(tmp_path, "ndjson").exists()
+    assert tasks[-1].path(tmp_path, "ndjson").exists()
+
+
+def test_backfill_reports_failed_tasks(tmp_path: Path):
+    """That failed tasks are reported without aborting the backfill, nor being recorded as completed."""
+    tasks = plan("carbon-intensity", ["IT"], START, END)
+
+    with (
+        StandInServer(error_rate=1) as server,
+        Checkpoint(tmp_path / "checkpoint.jsonl") as checkpoint,
+    ):
+        progress = backfill(
+            tasks, tmp_path, checkpoint=checkpoint, processes=0, url=server.url
+        )
+
+    assert not progress.done
+    assert set(progress.failed) == {task.key for task in tasks}
+    assert "503" in progress.failed[tasks[0].key]
+    assert len(checkpoint) == 0
+
+
+def test_task_path(tmp_path: Path):
+    """That tasks are written to files by dataset, zone and window."""
+    task = BackfillTask("carbon-intensity", "IT", START, END)
+
+    assert task.path(tmp_path, "csv") == (
+        tmp_path / "carbon-intensity" / "IT" / "20240101T000000_20240125T000000.csv"
+    )
+
+
+def test_cli_backfill(server, tmp_path: Path, capsys):
+    """That the command line backfills a dataset, resuming where previous runs stopped."""
+    argv = [
+        "backfill",
+        "carbon-intensity",
+        str(tmp_path),
+        "--zones",
+        "IT",
+        "--start",
+        "2024-01-01",
+        "--end",
+        "2024-01-25",
+        "--processes",
+        "0",
+        "--url",
+        server.url,
+    ]
+
+    main(argv)
+    main(argv)
+
+    assert server.stats == {200: 3}
+    assert "3/3 tasks (3 resumed)" in capsys.readouterr().err
+    assert len((tmp_path / "checkpoint.jsonl").read_text().splitlines()) == 3  # noqa: PLR2004
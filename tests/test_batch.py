@@ -0,0 +1,149 @@
+import asyncio
+import threading
+
+import pytest
+import snug
+from attrs import frozen
+
+from voltorb import Batch, execute, execute_async
+from voltorb.batch import Mapped, OrNone
+from voltorb.exceptions import HTTPStatusError
+from voltorb.middlewares import rest_query
+
+
+@frozen
+class ExpectedResponseSchema:
+    a: int
+
+
+@rest_query(response_schema=ExpectedResponseSchema)
+def mock_endpoint_get(key):
+    return (yield snug.Request("GET", f"https://mock/{key}"))
+
+
+def test_batch_returns_results_under_query_keys(fixture_mock_client):
+    """That a batch returns the result of each query under the query's key."""
+    query = Batch(
+        {key: mock_endpoint_get(key) for key in ("x", "y", "z")}, max_concurrency=1
+    )
+
+    client = fixture_mock_client(
+        snug.Response(200, content=b'{"a": 1}'),
+        snug.Response(200, content=b'{"a": 2}'),
+        snug.Response(200, content=b'{"a": 3}'),
+    )
+
+    results = execute(query, client=client)
+
+    assert results == {
+        "x": ExpectedResponseSchema(1),
+        "y": ExpectedResponseSchema(2),
+        "z": ExpectedResponseSchema(3),
+    }
+    assert [request.url for request in client.requests] == [
+        "https://mock/x",
+        "https://mock/y",
+        "https://mock/z",
+    ]
+
+
+def test_batch_executes_queries_concurrently(fixture_mock_client):
+    """That a batch executed synchronously sends its requests concurrently."""
+    max_concurrency = 4
+    barrier = threading.Barrier(max_concurrency, timeout=5)
+
+    class BlockingClient:
+        def __init__(self, client) -> None:
+            self.client = client
+
+        def send(self, req: snug.Request) -> snug.Response:
+            # only returns once `max_concurrency` requests are in flight at once
+            barrier.wait()
+            return self.client.send(req)
+
+    snug.send.register(BlockingClient, BlockingClient.send)
+
+    query = Batch(
+        {key: mock_endpoint_get(key) for key in range(max_concurrency)},
+        max_concurrency=max_concurrency,
+    )
+    client = BlockingClient(
+        fixture_mock_client(
+            *[snug.Response(200, content=b'{"a": 1}')] * max_concurrency
+        )
+    )
+
+    results = execute(query, client=client)
+    assert len(results) == max_concurrency
+
+
+def test_batch_executes_asynchronously(fixture_mock_client):
+    """That a batch can be executed by async executors."""
+    query = Batch({key: mock_endpoint_get(key) for key in ("x", "y")})
+
+    client = fixture_mock_client(*[snug.Response(200, content=b'{"a": 1}')] * 2)
+
+    results = asyncio.run(execute_async(query, client=client))
+    assert results == {"x": ExpectedResponseSchema(1), "y": ExpectedResponseSchema(1)}
+
+
+@pytest.mark.parametrize("asynchronous", [False, True], ids=["sync", "async"])
+def test_batch_raises_on_failed_query(fixture_mock_client, asynchronous):
+    """That a batch raises the error of any failed query."""
+    query = Batch({key: mock_endpoint_get(key) for key in ("x", "y")})
+
+    client = fixture_mock_client(
+        snug.Response(200, content=b'{"a": 1}'),
+        snug.Response(500, content=b'{"message": "error"}'),
+    )
+
+    def execute_query() -> object:
+        if asynchronous:
+            return asyncio.run(execute_async(query, client=client))
+        return execute(query, client=client)
+
+    with pytest.raises(HTTPStatusError):
+        execute_query()
+
+
+def test_batch_can_be_resolved_sequentially(fixture_mock_client):
+    """That a batch can still be resolved by plain generator-driving executors."""
+    query = Batch({key: mock_endpoint_get(key) for key in ("x", "y")})
+
+    client = fixture_mock_client(*[snug.Response(200, content=b'{"a": 1}')] * 2)
+
+    results = snug.Query.__execute__(query, client, lambda request: request)
+    assert results == {"x": ExpectedResponseSchema(1), "y": ExpectedResponseSchema(1)}
+
+
+def test_batch_rejects_invalid_max_concurrency():
+    """That a batch requires a positive maximum concurrency."""
+    with pytest.raises(ValueError, match="max_concurrency"):
+        Batch({}, max_concurrency=0)
+
+
+@pytest.mark.parametrize("asynchronous", [False, True], ids=["sync", "async"])
+def test_mapped_and_or_none_preserve_batch_execution(fixture_mock_client, asynchronous):
+    """That query combinators can be composed, while preserving their execution logic."""
+    query = Mapped(
+        Batch(
+            {
+                "ok": mock_endpoint_get("ok"),
+                "failed": OrNone(mock_endpoint_get("failed"), errors=HTTPStatusError),
+            },
+            max_concurrency=1,
+        ),
+        sorted,
+    )
+
+    client = fixture_mock_client(
+        snug.Response(200, content=b'{"a": 1}'),
+        snug.Response(500, content=b'{"message": "error"}'),
+    )
+
+    if asynchronous:
+        results = asyncio.run(execute_async(query, client=client))
+    else:
+        results = execute(query, client=client)
+
+    assert results == ["failed", "ok"]
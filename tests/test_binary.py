@@ -0,0 +1,90 @@
+from collections.abc import Iterator
+from datetime import datetime, timezone
+from typing import Any
+
+import pytest
+
+from voltorb import electricity_maps, executor, schemas
+from voltorb.serde import converter
+from voltorb.testing import StandInServer
+
+pytest.importorskip("msgpack")
+
+from voltorb.binary import dumps, fingerprint, loads  # noqa: E402
+
+START = datetime(2024, 1, 1, tzinfo=timezone.utc)
+END = datetime(2024, 1, 2, tzinfo=timezone.utc)
+
+
+@pytest.fixture(scope="module")
+def execute() -> Iterator[Any]:
+    with StandInServer(seed=0) as server:
+        yield executor(client=server.client())
+
+
+@pytest.mark.parametrize(
+    ("query", "cl"),
+    [
+        (electricity_maps.get_zones(), schemas.Zones),
+        (electricity_maps.get_health(), schemas.Health),
+        (electricity_maps.carbon_intensity.get_latest("FR"), schemas.CarbonIntensity),
+        (
+            electricity_maps.carbon_intensity.get_past_range("FR", START, END),
+            schemas.CarbonIntensityRange,
+        ),
+        (
+            electricity_maps.carbon_intensity.get_forecast("FR"),
+            schemas.CarbonIntensityForecast,
+        ),
+        (
+            electricity_maps.power_breakdown.get_history("FR"),
+            schemas.PowerBreakdownHistory,
+        ),
+        (
+            electricity_maps.power_production_breakdown.get_forecast("FR"),
+            schemas.PowerProductionBreakdownForecast,
+        ),
+        (electricity_maps.get_updated_since("FR", START), schemas.Updates),
+    ],
+)
+def test_roundtrip(execute, query, cl):
+    """That results are unpacked as they were, and smaller than their JSON."""
+    result = execute(query)
+
+    payload = dumps(result, cl)
+
+    assert loads(payload, cl) == result
+    assert len(payload) < len(str(converter.unstructure(result)))
+
+
+def test_roundtrip_containers(execute):
+    """That containers of schemas roundtrip, given their type."""
+    cl = dict[str, schemas.CarbonIntensity]
+    results = execute(electricity_maps.carbon_intensity.get_latest.many(["FR", "DE"]))
+
+    assert loads(dumps(results, cl), cl) == results
+
+
+def test_datetimes_are_utc():
+    """That datetimes are unpacked as UTC, naive ones being taken as UTC already."""
+    cl = list[datetime]
+    naive = datetime(2024, 1, 1, 12)  # noqa: DTZ001
+
+    assert loads(dumps([naive], cl), cl) == [naive.replace(tzinfo=timezone.utc)]
+
+
+def test_rejects_other_schemas():
+    """That payloads are rejected when unpacked as other (or other versions of) schemas."""
+    payload = dumps(schemas.Health(schemas.Health.MonitorHealth("ok"), "ok"))
+
+    assert fingerprint(schemas.Health) != fingerprint(schemas.Health.MonitorHealth)
+    with pytest.raises(ValueError, match="mismatched schema"):
+        loads(payload, schemas.Health.MonitorHealth)
+    with pytest.raises(ValueError, match="Not a packed value"):
+        loads(b"garbage", schemas.Health)
+
+
+def test_rejects_unsupported_types():
+    """That types which are not schemas, nor containers of them, are rejected."""
+    with pytest.raises(TypeError, match="not supported"):
+        dumps({1, 2})
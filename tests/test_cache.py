@@ -0,0 +1,287 @@
+import asyncio
+import socket
+import time
+from collections.abc import Callable, Iterator
+from datetime import datetime, timezone
+
+import httpx
+import pytest
+import snug
+
+from voltorb import (
+    CachingClient,
+    OfflineError,
+    electricity_maps,
+    execute,
+    execute_async,
+)
+from voltorb.api import LIVE_CACHE_POLICY, CachePolicy
+from voltorb.cache import (
+    FINAL_TTL,
+    ZONES_TTL,
+    MemoryBackend,
+    RedisBackend,
+    cadence_ttl,
+    endpoint_policy,
+)
+from voltorb.exceptions import CacheError
+from voltorb.testing import StandInRedis, StandInServer
+
+NOW = datetime(2024, 6, 1, 12, 45, tzinfo=timezone.utc)
+API = "https://api.electricitymap.org"
+
+
+@pytest.fixture()
+def redis() -> Iterator[StandInRedis]:
+    with StandInRedis() as redis:
+        yield redis
+
+
+@pytest.mark.parametrize(
+    ("path", "params", "ttl"),
+    [
+        ("/v3/carbon-intensity/latest", {"zone": "FR"}, 15 * 60),
+        ("/v3/power-breakdown/history", {"zone": "FR"}, 15 * 60),
+        ("/v3/zones", {}, ZONES_TTL),
+        ("/health", {}, None),
+        (
+            "/v3/power-breakdown/past-range",
+            {
+                "zone": "FR",
+                "start": "2024-01-01T00:00:00Z",
+                "end": "2024-01-11T00:00:00Z",
+            },
+            FINAL_TTL,
+        ),
+        (
+            "/v3/power-breakdown/past-range",
+            {
+                "zone": "FR",
+                "start": "2024-05-25T00:00:00Z",
+                "end": "2024-06-01T00:00:00Z",
+            },
+            15 * 60,
+        ),
+        ("/v3/carbon-intensity/past", {"datetime": "2024-01-01T00:00:00Z"}, FINAL_TTL),
+    ],
+)
+def test_cadence_ttl(path, params, ttl):
+    """That responses stay fresh until the next hourly record, unless final."""
+    assert cadence_ttl(snug.GET(f"{API}{path}", params=params), now=NOW) == ttl
+
+
+def test_memory_backend_expires_and_evicts():
+    """That entries expire after their TTL, and the least recently used ones are evicted when full."""
+    backend = MemoryBackend(max_entries=2)
+    backend.set("a", b"1", ttl=60)
+    backend.set("b", b"2", ttl=60)
+    backend.get_many(["a"])
+    backend.set("c", b"3", ttl=0)
+
+    assert backend.get_many(["a", "b", "c"]) == [b"1", None, None]
+
+
+def test_redis_backend(redis):
+    """That entries are stored with their TTL, and read back in a single pipelined round trip."""
+    with RedisBackend(redis.url, chunk_size=2) as backend:
+        backend.set_many({f"key-{i}": str(i).encode() for i in range(3)}, ttl=60)
+        values = backend.get_many(["key-0", "key-1", "missing", "key-2"])
+
+        assert values == [b"0", b"1", None, b"2"]
+        assert 0 < backend.pipeline([("PTTL", "key-0")])[0] <= 60_000  # noqa: PLR2004
+    assert redis.stats["MGET"] == 2  # noqa: PLR2004
+
+
+def test_stand_in_redis_reports_the_ttl_of_empty_values(redis):
+    """That keys holding empty values still exist, with their TTL."""
+    with RedisBackend(redis.url) as backend:
+        backend.set("empty", b"", ttl=60)
+
+        assert 0 < backend.pipeline([("PTTL", "empty")])[0] <= 60_000  # noqa: PLR2004
+        assert backend.pipeline([("PTTL", "missing")]) == [-2]
+
+
+def test_redis_backend_pools_connections(redis):
+    """That connections are reused across commands."""
+    with RedisBackend(redis.url, pool_size=2) as backend:
+        for _ in range(5):
+            backend.get_many(["key"])
+        assert len(backend._idle) == 1  # noqa: SLF001
+
+
+def test_redis_backend_raises_on_unreachable_servers():
+    """That unreachable servers raise cache errors."""
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+
+    with pytest.raises(CacheError, match="Failed to reach"):
+        RedisBackend(f"redis://127.0.0.1:{port}").get_many(["key"])
+
+
+def test_caching_client_shares_responses_across_nodes(server, redis):
+    """That nodes sharing a backend only query the API once per endpoint, zone and parameters."""
+    backends = [RedisBackend(redis.url) for _ in range(3)]
+    nodes = [CachingClient(backend, server.client()) for backend in backends]
+    query = electricity_maps.carbon_intensity.get_latest("FR")
+
+    results = [execute(query, client=node) for node in nodes]
+    for backend in backends:
+        backend.close()
+
+    assert server.stats == {200: 1}
+    assert results[0] == results[1] == results[2]
+    assert [node.stats for node in nodes] == [
+        {"misses": 1},
+        {"hits": 1},
+        {"hits": 1},
+    ]
+
+
+def test_caching_client_does_not_cache_errors():
+    """That error responses are not cached."""
+    with StandInServer(error_rate=1) as server:
+        backend = MemoryBackend()
+        client = CachingClient(backend, server.client())
+        for _ in range(2):
+            with pytest.raises(Exception, match="503"):
+                execute(
+                    electricity_maps.carbon_intensity.get_latest("FR"), client=client
+                )
+
+    assert server.stats == {503: 2}
+    assert len(backend) == 0
+
+
+def test_caching_client_prefetches_batches(server, redis):
+    """That the requests of batches are looked up in a single round trip, whether hits or misses."""
+    query = electricity_maps.carbon_intensity.get_latest.many(["FR", "DE", "IT-CSO"])
+
+    with RedisBackend(redis.url) as backend:
+        client = CachingClient(backend, server.client())
+        # misses included
+        first = execute(query, client=client)
+        assert redis.stats["MGET"] == 1
+        second = execute(query, client=client)
+
+    assert first == second
+    assert server.stats == {200: 3}
+    assert redis.stats["MGET"] == 2  # noqa: PLR2004
+
+
+def test_caching_client_falls_back_on_backend_errors(server):
+    """That backend failures don't fail queries."""
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    client = CachingClient(RedisBackend(f"redis://127.0.0.1:{port}"), server.client())
+
+    execute(electricity_maps.carbon_intensity.get_latest("FR"), client=client)
+
+    assert server.stats == {200: 1}
+    assert client.stats == {"errors": 2, "misses": 1}
+
+
+def test_caching_client_async(server, redis):
+    """That async queries are cached too."""
+
+    async def main() -> None:
+        async with httpx.AsyncClient() as http:
+            backend = RedisBackend(redis.url)
+            client = CachingClient(backend, server.client(http))
+            query = electricity_maps.power_breakdown.get_latest.many(["FR", "DE"])
+            await execute_async(query, client=client)
+            await execute_async(query, client=client)
+            backend.close()
+
+    asyncio.run(main())
+
+    assert server.stats == {200: 2}
+
+
+def _wait_for(condition: Callable[[], bool], timeout: float = 5) -> None:
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "Timed out"
+        time.sleep(0.01)
+
+
+def test_endpoint_policies():
+    """That requests get the cache policy of their endpoint."""
+    latest = snug.GET(f"{API}/v3/carbon-intensity/latest", params={"zone": "FR"})
+    past = snug.GET(f"{API}/v3/carbon-intensity/past-range", params={"zone": "FR"})
+
+    assert endpoint_policy(latest) == LIVE_CACHE_POLICY
+    assert endpoint_policy(past) == endpoint_policy(snug.GET(f"{API}/unknown"))
+
+
+def test_stale_while_revalidate(server):
+    """That stale responses are served immediately, while revalidated (once) in the background."""
+    client = CachingClient(MemoryBackend(), server.client(), ttl=lambda _: 0.0)
+    query = electricity_maps.carbon_intensity.get_latest("FR")
+
+    first = execute(query, client=client)
+    results = [execute(query, client=client) for _ in range(3)]
+    _wait_for(lambda: not client._revalidating)  # noqa: SLF001
+
+    assert server.stats[200] == 1 + client.stats["revalidations"]
+
+    assert results == [first] * 3
+    assert client.stats["stale_hits"] == 3  # noqa: PLR2004
+    assert client.stats["revalidations"] >= 1
+
+
+def test_stale_while_revalidate_async(server):
+    """That stale responses are revalidated in the background of async queries too."""
+    client = CachingClient(MemoryBackend(), ttl=lambda _: 0.0)
+    query = electricity_maps.power_breakdown.get_latest("FR")
+
+    async def main() -> None:
+        async with httpx.AsyncClient() as http:
+            client.client = server.client(http)
+            await execute_async(query, client=client)
+            await execute_async(query, client=client)
+            await asyncio.gather(*client._tasks)  # noqa: SLF001
+
+    asyncio.run(main())
+
+    assert server.stats == {200: 2}
+    assert client.stats == {"misses": 1, "stale_hits": 1, "revalidations": 1}
+
+
+def test_stale_responses_past_the_policy_are_misses(server):
+    """That responses staler than the policy allows are fetched again."""
+    client = CachingClient(
+        MemoryBackend(),
+        server.client(),
+        ttl=lambda _: 0.0,
+        policy=lambda _: CachePolicy(max_staleness=3600),
+    )
+    query = electricity_maps.carbon_intensity.get_latest("FR")
+
+    for _ in range(2):
+        execute(query, client=client)
+
+    assert server.stats == {200: 2}
+    assert client.stats == {"misses": 2}
+
+
+def test_offline(server):
+    """That offline clients only serve cached responses, within the maximum staleness of their policy."""
+    backend = MemoryBackend()
+    online = CachingClient(backend, server.client(), ttl=lambda _: 0.0)
+    offline = CachingClient(backend, server.client(), ttl=lambda _: 0.0, offline=True)
+    latest = electricity_maps.carbon_intensity.get_latest("FR")
+
+    with pytest.raises(OfflineError, match="no response"):
+        execute(latest, client=offline)
+    cached = execute(latest, client=online)
+
+    assert execute(latest, client=offline) == cached
+    with pytest.raises(OfflineError, match="no response"):
+        execute(electricity_maps.get_zones(), client=offline)
+    with pytest.raises(OfflineError, match="never cached"):
+        execute(
+            electricity_maps.get_health(), client=CachingClient(backend, offline=True)
+        )
+    assert server.stats == {200: 1}
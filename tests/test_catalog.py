@@ -0,0 +1,113 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+import snug
+
+from voltorb import ZoneCatalog, executor, schemas
+
+MOCK_ZONES = {
+    "DK-DK1": schemas.ZoneMetadata(
+        "West Denmark",
+        country_name="Denmark",
+        access=["carbon-intensity/latest", "carbon-intensity/past"],
+    ),
+    "DK-DK2": schemas.ZoneMetadata(
+        "East Denmark", country_name="Denmark", access=["carbon-intensity/latest"]
+    ),
+    "US-CAR-DUK": schemas.ZoneMetadata(
+        "Duke Energy Carolinas", country_name="United States of America"
+    ),
+    "AD": schemas.ZoneMetadata("Andorra"),
+}
+
+
+def test_catalog_is_a_mapping_of_zones():
+    """That the catalog can be used like the zones it was built from."""
+    catalog = ZoneCatalog(MOCK_ZONES)
+
+    assert dict(catalog) == MOCK_ZONES
+    assert catalog["AD"].zone_name == "Andorra"
+    assert "FR" not in catalog
+
+
+def test_catalog_indexes_zones_by_country():
+    """That zones can be looked up by country."""
+    catalog = ZoneCatalog(MOCK_ZONES)
+
+    assert catalog.by_country("Denmark") == ("DK-DK1", "DK-DK2")
+    assert catalog.by_country("France") == ()
+
+
+@pytest.mark.parametrize(
+    ("parent", "children"),
+    [
+        ("DK", ("DK-DK1", "DK-DK2")),
+        ("US", ("US-CAR-DUK",)),
+        ("US-CAR", ("US-CAR-DUK",)),
+        ("AD", ()),
+    ],
+)
+def test_catalog_indexes_zones_by_parent_zone(parent, children):
+    """That sub-zones can be looked up by parent zone, at any depth."""
+    catalog = ZoneCatalog(MOCK_ZONES)
+
+    assert catalog.children(parent) == children
+
+
+def test_catalog_indexes_zones_by_route():
+    """That zones can be looked up by the routes they can be queried on."""
+    catalog = ZoneCatalog(MOCK_ZONES)
+
+    assert catalog.with_route("carbon-intensity/latest") == ("DK-DK1", "DK-DK2")
+    assert catalog.with_route("carbon-intensity/past") == ("DK-DK1",)
+    assert catalog.with_route("power-breakdown/past") == ()
+
+
+def test_catalog_round_trips_to_disk(tmp_path):
+    """That a catalog can be persisted, and loaded back from disk."""
+    catalog = ZoneCatalog(MOCK_ZONES)
+
+    path = tmp_path / "zones.json"
+    catalog.save(path)
+
+    assert ZoneCatalog.load(path) == catalog
+
+
+def test_cached_catalog_only_fetches_when_missing_or_expired(
+    tmp_path, fixture_mock_client
+):
+    """That the cached catalog is only fetched from the API when missing or expired."""
+    path = tmp_path / "zones.json"
+    client = fixture_mock_client(
+        snug.Response(200, MOCK_GET_ZONES_RESPONSE),
+        snug.Response(200, MOCK_GET_ZONES_RESPONSE),
+    )
+    execute = executor(client=client)
+
+    # fetched when missing
+    catalog = ZoneCatalog.cached(path, execute=execute)
+    assert catalog.children("DK") == ("DK-DK1",)
+    assert len(client.requests) == 1
+
+    # loaded from disk when fresh
+    assert ZoneCatalog.cached(path, execute=execute) == catalog
+    assert len(client.requests) == 1
+
+    # fetched again when expired
+    expired = ZoneCatalog(
+        catalog.zones, fetched_at=datetime.now(timezone.utc) - timedelta(days=2)
+    )
+    expired.save(path)
+    ZoneCatalog.cached(path, execute=execute, ttl=timedelta(days=1))
+    assert len(client.requests) == 2  # noqa: PLR2004
+
+
+MOCK_GET_ZONES_RESPONSE = b"""\
+{
+  "DK-DK1": {
+    "zoneName": "West Denmark",
+    "countryName": "Denmark",
+    "access": ["carbon-intensity/latest"]
+  }
+}
+"""
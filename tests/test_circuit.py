@@ -0,0 +1,242 @@
+import asyncio
+
+import pytest
+import snug
+
+from voltorb import (
+    CircuitBreakingClient,
+    CircuitOpenError,
+    ClientWrapper,
+    HTTPStatusError,
+    electricity_maps,
+    execute,
+    execute_async,
+)
+from voltorb.circuit import (
+    CircuitBreaker,
+    CircuitBreakers,
+    CircuitEvent,
+    CircuitState,
+)
+
+HOST = "api.electricitymap.org"
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class ScriptedClient(ClientWrapper):
+    """A client answering API requests and health probes with the configured status codes."""
+
+    def __init__(self, status_code: int = 200, health_status_code: int = 200) -> None:
+        super().__init__()
+        self.status_code = status_code
+        self.health_status_code = health_status_code
+        self.paths: list[str] = []
+
+    def send(self, request: snug.Request) -> snug.Response:
+        path = request.url.split(HOST, 1)[-1]
+        self.paths.append(path)
+        if path == "/health":
+            return snug.Response(self.health_status_code, b"{}")
+        return snug.Response(self.status_code, b"{}")
+
+    async def send_async(self, request: snug.Request) -> snug.Response:
+        return self.send(request)
+
+
+@pytest.fixture()
+def clock() -> FakeClock:
+    return FakeClock()
+
+
+@pytest.fixture()
+def events() -> list[CircuitEvent]:
+    return []
+
+
+@pytest.fixture()
+def breakers(clock, events) -> CircuitBreakers:
+    breakers = CircuitBreakers(window=4, min_calls=4, reset_timeout=30, clock=clock)
+    breakers.subscribe(events.append)
+    return breakers
+
+
+def test_circuit_opens_on_high_failure_rate():
+    """That the circuit opens once enough recent requests failed."""
+    breaker = CircuitBreaker(HOST, failure_rate=0.5, window=4, min_calls=4)
+
+    for failed in (True, False, False):
+        breaker.record(failed=failed)
+    state = breaker.state
+    assert state is CircuitState.CLOSED
+
+    breaker.record(failed=True)
+    assert breaker.state is CircuitState.OPEN
+
+
+def test_circuit_counts_slow_requests_as_failures():
+    """That requests slower than the threshold count as failed."""
+    breaker = CircuitBreaker(HOST, window=2, min_calls=2, slow_call_duration=1)
+
+    breaker.record(failed=False, duration=5)
+    breaker.record(failed=False, duration=5)
+
+    assert breaker.state is CircuitState.OPEN
+
+
+def test_circuit_raises_on_invalid_failure_rate():
+    """That the failure rate must be a rate."""
+    with pytest.raises(ValueError, match="failure_rate"):
+        CircuitBreaker(HOST, failure_rate=0)
+
+
+def test_open_circuit_fails_fast(breakers, clock):
+    """That requests are not sent while the circuit is open."""
+    client = ScriptedClient(status_code=503)
+    query = electricity_maps.get_zones()
+
+    for _ in range(4):
+        with pytest.raises(HTTPStatusError):
+            execute(query, client=CircuitBreakingClient(client, breakers))
+
+    clock.now = 10
+    with pytest.raises(CircuitOpenError) as excinfo:
+        execute(query, client=CircuitBreakingClient(client, breakers))
+
+    assert excinfo.value.host == HOST
+    assert excinfo.value.retry_after == 20  # noqa: PLR2004
+    assert len(client.paths) == 4  # noqa: PLR2004
+
+
+def test_circuit_closes_on_healthy_probe(breakers, clock, events):
+    """That the host's health endpoint is probed once the circuit cooled down, closing it if healthy."""
+    client = ScriptedClient(status_code=503)
+
+    for _ in range(4):
+        with pytest.raises(HTTPStatusError):
+            execute(
+                electricity_maps.get_zones(),
+                client=CircuitBreakingClient(client, breakers),
+            )
+
+    client.status_code = 200
+    clock.now = 30
+    execute(
+        electricity_maps.get_zones(), client=CircuitBreakingClient(client, breakers)
+    )
+
+    assert client.paths[-2:] == ["/health", "/v3/zones"]
+    assert breakers[HOST].state is CircuitState.CLOSED
+    assert [(e.previous, e.state) for e in events] == [
+        (CircuitState.CLOSED, CircuitState.OPEN),
+        (CircuitState.OPEN, CircuitState.HALF_OPEN),
+        (CircuitState.HALF_OPEN, CircuitState.CLOSED),
+    ]
+
+
+def test_circuit_reopens_on_unhealthy_probe(breakers, clock):
+    """That the circuit stays open (for another cool down) if the probe fails."""
+    client = ScriptedClient(status_code=503, health_status_code=503)
+
+    for _ in range(4):
+        with pytest.raises(HTTPStatusError):
+            execute(
+                electricity_maps.get_zones(),
+                client=CircuitBreakingClient(client, breakers),
+            )
+
+    clock.now = 30
+    with pytest.raises(CircuitOpenError) as excinfo:
+        execute(
+            electricity_maps.get_zones(), client=CircuitBreakingClient(client, breakers)
+        )
+
+    assert client.paths[-1] == "/health"
+    assert excinfo.value.retry_after == 30  # noqa: PLR2004
+    assert breakers[HOST].state is CircuitState.OPEN
+
+
+def test_circuit_counts_transport_errors_as_failures(breakers):
+    """That requests failing without a response count as failed."""
+
+    class FailingClient(ClientWrapper):
+        def send(self, request: snug.Request) -> snug.Response:
+            raise ConnectionError(request.url)
+
+    for _ in range(4):
+        with pytest.raises(ConnectionError):
+            execute(
+                electricity_maps.get_zones(),
+                client=CircuitBreakingClient(FailingClient(), breakers),
+            )
+
+    assert breakers[HOST].state is CircuitState.OPEN
+
+
+def test_circuits_are_shared_per_host(breakers):
+    """That circuits are shared by all clients, by host."""
+    client = ScriptedClient(status_code=503)
+
+    for _ in range(4):
+        with pytest.raises(HTTPStatusError):
+            execute(
+                electricity_maps.get_zones(),
+                client=CircuitBreakingClient(client, breakers),
+            )
+
+    assert list(breakers) == [HOST]
+    with pytest.raises(CircuitOpenError):
+        execute(
+            electricity_maps.get_zones(),
+            client=CircuitBreakingClient(ScriptedClient(), breakers),
+        )
+
+
+def test_circuit_breaking_async(breakers, clock):
+    """That circuits also break asynchronous requests."""
+    client = ScriptedClient(status_code=503)
+    query = electricity_maps.get_zones()
+
+    async def run() -> None:
+        for _ in range(4):
+            with pytest.raises(HTTPStatusError):
+                await execute_async(
+                    query, client=CircuitBreakingClient(client, breakers)
+                )
+        with pytest.raises(CircuitOpenError):
+            await execute_async(query, client=CircuitBreakingClient(client, breakers))
+
+        client.status_code = 200
+        clock.now = 30
+        await execute_async(query, client=CircuitBreakingClient(client, breakers))
+
+    asyncio.run(run())
+
+    assert breakers[HOST].state is CircuitState.CLOSED
+
+
+def test_circuit_reopens_on_unhealthy_async_probe(breakers, clock):
+    """That asynchronous requests are not sent (but fail fast) if the probe fails."""
+    client = ScriptedClient(status_code=503, health_status_code=503)
+    query = electricity_maps.get_zones()
+
+    async def run() -> None:
+        for _ in range(4):
+            with pytest.raises(HTTPStatusError):
+                await execute_async(
+                    query, client=CircuitBreakingClient(client, breakers)
+                )
+        clock.now = 30
+        with pytest.raises(CircuitOpenError):
+            await execute_async(query, client=CircuitBreakingClient(client, breakers))
+
+    asyncio.run(run())
+
+    assert client.paths[-1] == "/health"
+    assert breakers[HOST].state is CircuitState.OPEN
@@ -0,0 +1,201 @@
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any
+
+import attrs
+import pytest
+
+from voltorb import executor
+from voltorb.export import DATASETS
+from voltorb.testing import StandInServer
+
+np = pytest.importorskip("numpy")
+
+from voltorb.columnar import (  # noqa: E402
+    ColumnarStore,
+    Partition,
+    schema_columns,
+)
+
+JAN = datetime(2024, 1, 1, tzinfo=timezone.utc)
+FEB = datetime(2024, 2, 1, tzinfo=timezone.utc)
+HOUR = timedelta(hours=1)
+
+
+def fetch(server: StandInServer, dataset: str, start: datetime, end: datetime) -> Any:
+    query = DATASETS[dataset]("FR", start, end)
+    return executor(client=server.client())(query).data
+
+
+def test_schema_columns():
+    """That numeric fields are stored in the narrowest suitable type."""
+    columns = {c.name: c.dtype for c in schema_columns("power-breakdown")}
+
+    assert columns["fossil_free_percentage"] == "<i2"
+    assert columns["power_consumption_total"] == "<i4"
+    assert columns["power_consumption_breakdown.coal"] == "<i4"
+    assert columns["is_estimated"] == "<i1"
+    assert "zone" not in columns
+    assert "datetime" not in columns
+
+
+def test_roundtrip(server, tmp_path: Path):
+    """That records are read back as the same values, across partitions."""
+    records = fetch(
+        server, "power-breakdown", JAN + 20 * 24 * HOUR, FEB + 5 * 24 * HOUR
+    )
+    store = ColumnarStore(tmp_path)
+
+    assert store.write("power-breakdown", "FR", records) == len(records)
+    columns = store.read("power-breakdown", "FR")
+
+    assert len(list(store.partitions("power-breakdown", "FR"))) == 2  # noqa: PLR2004
+    assert columns["hour"].tolist() == [
+        int(r.datetime.timestamp()) // 3600 for r in records
+    ]
+    assert columns["power_consumption_total"].tolist() == [
+        r.power_consumption_total for r in records
+    ]
+    assert columns["is_estimated"].tolist() == [int(r.is_estimated) for r in records]
+
+
+def test_nulls(server, tmp_path: Path):
+    """That null values are masked."""
+    records = fetch(server, "power-breakdown", JAN, JAN + 3 * HOUR)
+    records[1] = attrs.evolve(records[1], power_export_total=None)
+    store = ColumnarStore(tmp_path)
+    store.write("power-breakdown", "FR", records)
+
+    (partition,) = store.partitions("power-breakdown", "FR")
+
+    assert partition.valid("power_export_total").tolist() == [True, False, True]
+    assert partition.column("power_export_total").tolist() == [
+        records[0].power_export_total,
+        None,
+        records[2].power_export_total,
+    ]
+
+
+def test_partitions_are_zero_copy_views(server, tmp_path: Path):
+    """That partitions expose their columns as views of the memory mapped files."""
+    store = ColumnarStore(tmp_path)
+    store.write(
+        "carbon-intensity",
+        "FR",
+        fetch(server, "carbon-intensity", JAN, JAN + 24 * HOUR),
+    )
+
+    (partition,) = store.partitions("carbon-intensity", "FR")
+    with partition:
+        values = partition.values("carbon_intensity")
+
+        assert not values.flags.owndata
+        assert not values.flags.writeable
+        assert len(partition) == 24  # noqa: PLR2004
+        assert partition.capacity == 31 * 24
+
+        # views can't outlive the mapping
+        with pytest.raises(BufferError):
+            partition.close()
+        del values
+
+    assert partition._buffer.closed  # noqa: SLF001
+
+
+def test_appends_new_hours_in_place(server, tmp_path: Path):
+    """That new hours are appended to the existing partition, and out of order ones merged."""
+    store = ColumnarStore(tmp_path)
+    day = 24 * HOUR
+    store.write(
+        "carbon-intensity",
+        "FR",
+        fetch(server, "carbon-intensity", JAN + day, JAN + 2 * day),
+    )
+    path = store.path("carbon-intensity", "FR", 2024, 1)
+    inode = path.stat().st_ino
+
+    store.write(
+        "carbon-intensity",
+        "FR",
+        fetch(server, "carbon-intensity", JAN + 2 * day, JAN + 3 * day),
+    )
+    assert path.stat().st_ino == inode
+
+    store.write(
+        "carbon-intensity", "FR", fetch(server, "carbon-intensity", JAN, JAN + 2 * day)
+    )
+    with Partition(path) as partition:
+        hours = partition.hours.copy()
+    assert len(hours) == 3 * 24
+    assert (np.diff(hours) == 1).all()
+
+
+def test_readers_are_isolated_from_appends(server, tmp_path: Path):
+    """That open partitions keep seeing the rows they were opened with."""
+    store = ColumnarStore(tmp_path)
+    store.write(
+        "carbon-intensity", "FR", fetch(server, "carbon-intensity", JAN, JAN + HOUR)
+    )
+    (partition,) = store.partitions("carbon-intensity", "FR")
+
+    store.write(
+        "carbon-intensity",
+        "FR",
+        fetch(server, "carbon-intensity", JAN + HOUR, JAN + 3 * HOUR),
+    )
+
+    assert len(partition.hours) == 1
+    assert len(Partition(partition.path).hours) == 3  # noqa: PLR2004
+
+
+def test_read_prunes_partitions(server, tmp_path: Path):
+    """That only the partitions overlapping the range are opened, and rows sliced to it."""
+    store = ColumnarStore(tmp_path)
+    store.write(
+        "carbon-intensity",
+        "FR",
+        fetch(server, "carbon-intensity", JAN + 30 * 24 * HOUR, FEB + 24 * HOUR),
+    )
+
+    assert [p.path.stem for p in store.partitions("carbon-intensity", "FR", FEB)] == [
+        "2024-02"
+    ]
+    assert [
+        p.path.stem for p in store.partitions("carbon-intensity", "FR", end=FEB)
+    ] == ["2024-01"]
+
+    columns = store.read("carbon-intensity", "FR", FEB - 2 * HOUR, FEB + 2 * HOUR)
+    assert len(columns["hour"]) == 4  # noqa: PLR2004
+    assert len(columns["carbon_intensity"]) == 4  # noqa: PLR2004
+
+
+def test_read_missing_zone(tmp_path: Path):
+    """That zones without partitions are read as empty columns."""
+    columns = ColumnarStore(tmp_path).read("carbon-intensity", "FR")
+
+    assert len(columns["hour"]) == 0
+    assert columns["carbon_intensity"].dtype == np.int32
+
+
+def test_rejects_mismatched_columns(server, tmp_path: Path):
+    """That partitions written with other columns are not silently corrupted."""
+    store = ColumnarStore(tmp_path)
+    store.write(
+        "carbon-intensity", "FR", fetch(server, "carbon-intensity", JAN, JAN + HOUR)
+    )
+    path = store.path("power-breakdown", "FR", 2024, 1)
+    path.parent.mkdir(parents=True)
+    store.path("carbon-intensity", "FR", 2024, 1).rename(path)
+
+    records = fetch(server, "power-breakdown", JAN + HOUR, JAN + 2 * HOUR)
+    with pytest.raises(ValueError, match="columns"):
+        store.write("power-breakdown", "FR", records)
+
+
+def test_rejects_other_files(tmp_path: Path):
+    """That files which are not partitions are rejected."""
+    path = tmp_path / "2024-01.vcol"
+    path.write_bytes(b"\0" * 64)
+
+    with pytest.raises(ValueError, match="columnar"):
+        Partition(path)
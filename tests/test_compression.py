@@ -0,0 +1,141 @@
+import asyncio
+import gzip
+import threading
+import zlib
+from collections.abc import Generator, Iterator
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import snug
+
+from voltorb import electricity_maps, execute, execute_async, executor
+from voltorb.compression import ACCEPT_ENCODING, decoded, decompress
+from voltorb.middlewares import request_template
+
+CONTENT = b'{"status": "ok", "padding": "' + b"x" * 1000 + b'"}'
+
+
+class GzipHandler(BaseHTTPRequestHandler):
+    """Answers with gzip compressed content, if accepted."""
+
+    def do_GET(self) -> None:  # noqa: N802
+        content = CONTENT
+        compress = "gzip" in self.headers.get("accept-encoding", "")
+        if compress:
+            content = gzip.compress(content)
+
+        self.send_response(200)
+        self.send_header("content-type", "application/json")
+        if compress:
+            self.send_header("content-encoding", "gzip")
+        self.send_header("content-length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, *args: object) -> None:
+        pass
+
+
+@pytest.fixture()
+def server_url() -> Iterator[str]:
+    server = ThreadingHTTPServer(("127.0.0.1", 0), GzipHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+def query(url: str) -> Generator[snug.Request, snug.Response, snug.Response]:
+    # with the same headers as API queries
+    return (yield request_template("GET", f"{url}/health"))
+
+
+@pytest.mark.parametrize(
+    ("content", "encoding"),
+    [
+        (gzip.compress(CONTENT), "gzip"),
+        (gzip.compress(CONTENT), "x-gzip"),
+        (zlib.compress(CONTENT), "deflate"),
+        (zlib.compress(CONTENT, wbits=-zlib.MAX_WBITS), "deflate"),
+        (zlib.compress(gzip.compress(CONTENT)), "gzip, deflate"),
+        (CONTENT, "identity"),
+    ],
+)
+def test_decompress(content, encoding):
+    """That all supported content encodings are decoded, in the order they were applied."""
+    assert decompress(content, encoding) == CONTENT
+
+
+def test_decompress_raises_on_unsupported_encodings():
+    """That unsupported content encodings raise rather than returning garbage."""
+    with pytest.raises(ValueError, match="unknown"):
+        decompress(CONTENT, "unknown")
+
+
+def test_decoded_strips_encoding_headers():
+    """That decoded responses don't advertise their (original) encoding and length."""
+    content = gzip.compress(CONTENT)
+    response = snug.Response(
+        200,
+        content,
+        headers={
+            "Content-Encoding": "gzip",
+            "Content-Length": str(len(content)),
+            "Content-Type": "application/json",
+        },
+    )
+
+    assert decoded(response) == snug.Response(
+        200, CONTENT, headers={"Content-Type": "application/json"}
+    )
+
+
+def test_decoded_leaves_uncompressed_responses_alone():
+    """That uncompressed responses are returned as they are."""
+    response = snug.Response(200, CONTENT)
+
+    assert decoded(response) is response
+
+
+def test_queries_negotiate_compression(fixture_mock_client):
+    """That API requests advertise all supported content encodings."""
+    client = fixture_mock_client(snug.Response(200, b"{}"))
+
+    execute(electricity_maps.get_zones(), client=client)
+
+    assert client.request.headers["accept-encoding"] == ACCEPT_ENCODING
+    assert "gzip" in ACCEPT_ENCODING
+    assert "deflate" in ACCEPT_ENCODING
+
+
+def test_default_client_decodes_responses(server_url):
+    """That the default sync client transparently decodes compressed responses."""
+    response = execute(query(server_url))
+
+    assert response.content == CONTENT
+
+
+def test_executors_decode_responses(server_url):
+    """That executors, with the default sync client, transparently decode compressed responses too."""
+    response = executor()(query(server_url))
+
+    assert response.content == CONTENT
+
+
+def test_default_async_client_decodes_responses(monkeypatch):
+    """That the default async client transparently decodes compressed responses."""
+
+    async def send_async(client: None, request: snug.Request) -> snug.Response:
+        assert client is None
+        assert "gzip" in request.headers["accept-encoding"]
+        return snug.Response(
+            200, gzip.compress(CONTENT), headers={"content-encoding": "gzip"}
+        )
+
+    # the default async client doesn't support custom ports, so can't reach a local server
+    monkeypatch.setattr(snug, "send_async", send_async)
+
+    response = asyncio.run(execute_async(query("https://localhost")))
+
+    assert response.content == CONTENT
@@ -0,0 +1,175 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+from typing import Any
+
+import httpx
+import pytest
+import snug
+
+from voltorb import (
+    ClientWrapper,
+    RangeCache,
+    async_executor,
+    executor,
+)
+from voltorb.coverage import Coverage
+
+JAN = datetime(2024, 1, 1, tzinfo=timezone.utc)
+DAY = timedelta(days=1)
+HOUR = timedelta(hours=1)
+
+
+class CountingClient(ClientWrapper):
+    """A client wrapper recording the paths and params of the requests it sends."""
+
+    def __init__(self, client: Any = None) -> None:
+        super().__init__(client)
+        self.requests: list[tuple[str, dict[str, Any]]] = []
+
+    def _record(self, request: snug.Request) -> None:
+        self.requests.append((request.url.rsplit("/", 1)[-1], dict(request.params)))
+
+    def send(self, request: snug.Request) -> snug.Response:
+        self._record(request)
+        return super().send(request)
+
+    async def send_async(self, request: snug.Request) -> snug.Response:
+        self._record(request)
+        return await super().send_async(request)
+
+
+def test_coverage_merges_spans():
+    """That overlapping and touching spans are merged."""
+    coverage = Coverage()
+    coverage.add(JAN + 10 * DAY, JAN + 15 * DAY)
+    coverage.add(JAN, JAN + 5 * DAY)
+    coverage.add(JAN + 5 * DAY, JAN + 6 * DAY)
+    coverage.add(JAN + 8 * DAY, JAN + 11 * DAY)
+
+    assert list(coverage) == [(JAN, JAN + 6 * DAY), (JAN + 8 * DAY, JAN + 15 * DAY)]
+
+    coverage.add(JAN + 2 * DAY, JAN + 20 * DAY)
+    assert list(coverage) == [(JAN, JAN + 20 * DAY)]
+
+
+def test_coverage_gaps():
+    """That only the uncovered spans of a range are returned."""
+    coverage = Coverage()
+    coverage.add(JAN + DAY, JAN + 2 * DAY)
+    coverage.add(JAN + 3 * DAY, JAN + 4 * DAY)
+
+    assert coverage.gaps(JAN, JAN + 5 * DAY) == [
+        (JAN, JAN + DAY),
+        (JAN + 2 * DAY, JAN + 3 * DAY),
+        (JAN + 4 * DAY, JAN + 5 * DAY),
+    ]
+    assert coverage.gaps(JAN + DAY, JAN + 2 * DAY) == []
+    assert coverage.covers(JAN + 3 * DAY, JAN + 4 * DAY)
+    assert not coverage.covers(JAN, JAN + 2 * DAY)
+
+
+def test_get_range_only_fetches_gaps(server):
+    """That overlapping queries only fetch the hours not fetched by previous ones."""
+    client = CountingClient(server.client())
+    execute = executor(client=client)
+    cache = RangeCache()
+
+    first = execute(cache.get_range("power-breakdown", "FR", JAN, JAN + 5 * DAY))
+    second = execute(
+        cache.get_range("power-breakdown", "FR", JAN - DAY, JAN + 15 * DAY)
+    )
+    again = execute(cache.get_range("power-breakdown", "FR", JAN + DAY, JAN + 2 * DAY))
+
+    assert [params for _, params in client.requests] == [
+        {"zone": "FR", "start": "2024-01-01T00:00:00Z", "end": "2024-01-06T00:00:00Z"},
+        {"zone": "FR", "start": "2023-12-31T00:00:00Z", "end": "2024-01-01T00:00:00Z"},
+        {"zone": "FR", "start": "2024-01-06T00:00:00Z", "end": "2024-01-16T00:00:00Z"},
+    ]
+    assert len(first) == 5 * 24
+    assert [r.datetime for r in second] == [
+        JAN - DAY + i * HOUR for i in range(16 * 24)
+    ]
+    assert second[24 : 24 + 5 * 24] == first
+    assert again == first[24:48]
+
+
+def test_get_range_tracks_coverage_by_params(server):
+    """That the coverage is tracked separately for each zone and set of parameters."""
+    client = CountingClient(server.client())
+    execute = executor(client=client)
+    cache = RangeCache()
+
+    for kwargs in (
+        {},
+        {"disable_estimations": True},
+        {"disable_estimations": True},
+        {"disable_estimations": False},
+    ):
+        execute(cache.get_range("carbon-intensity", "FR", JAN, JAN + DAY, **kwargs))
+    execute(cache.get_range("carbon-intensity", "DE", JAN, JAN + DAY))
+
+    assert len(client.requests) == 4  # noqa: PLR2004
+    assert len(cache) == 4  # noqa: PLR2004
+    assert list(cache.coverage("carbon-intensity", "FR", disable_estimations=True)) == [
+        (JAN, JAN + DAY)
+    ]
+
+
+def test_coverage_is_a_snapshot(server):
+    """That the coverage returned by the cache is not changed by later queries merging into it."""
+    execute = executor(client=server.client())
+    cache = RangeCache()
+    execute(cache.get_range("carbon-intensity", "FR", JAN, JAN + DAY))
+
+    coverage = cache.coverage("carbon-intensity", "FR")
+    execute(cache.get_range("carbon-intensity", "FR", JAN + DAY, JAN + 2 * DAY))
+
+    assert list(coverage) == [(JAN, JAN + DAY)]
+    assert cache.gaps("carbon-intensity", "FR", JAN, JAN + 3 * DAY) == [
+        (JAN + 2 * DAY, JAN + 3 * DAY)
+    ]
+
+
+def test_get_range_fetches_recent_gaps_from_history(server):
+    """That gaps within the last 24 hours are fetched from the history endpoint, without covering the current hour."""
+    client = CountingClient(server.client())
+    execute = executor(client=client)
+    cache = RangeCache()
+    now = datetime.now(timezone.utc).replace(minute=0, second=0, microsecond=0)
+
+    records = execute(
+        cache.get_range("carbon-intensity", "FR", now - 6 * HOUR, now + HOUR)
+    )
+
+    assert [path for path, _ in client.requests] == ["history"]
+    assert [r.datetime for r in records] == [now - i * HOUR for i in range(6, -1, -1)]
+    assert cache.gaps("carbon-intensity", "FR", now - 6 * HOUR, now + HOUR) == [
+        (now, now + HOUR)
+    ]
+
+
+def test_get_range_async(server):
+    """That cached ranges can be queried asynchronously."""
+    cache = RangeCache()
+
+    async def main() -> tuple[CountingClient, list[Any]]:
+        async with httpx.AsyncClient() as http:
+            client = CountingClient(server.client(http))
+            execute = async_executor(client=client)
+            await execute(
+                cache.get_range("carbon-intensity", "FR", JAN, JAN + 30 * DAY)
+            )
+            records = await execute(
+                cache.get_range("carbon-intensity", "FR", JAN + DAY, JAN + 2 * DAY)
+            )
+        return client, records
+
+    client, records = asyncio.run(main())
+    assert len(records) == 24  # noqa: PLR2004
+    assert len(client.requests) == 3  # noqa: PLR2004
+
+
+def test_get_range_raises_on_unknown_datasets():
+    """That unknown datasets are rejected."""
+    with pytest.raises(ValueError, match="Unknown dataset"):
+        RangeCache().get_range("weather", "FR", JAN, JAN + DAY)
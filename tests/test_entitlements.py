@@ -0,0 +1,150 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+import httpx
+import pytest
+import snug
+
+from voltorb import (
+    ClientWrapper,
+    Coordinates,
+    ForbiddenError,
+    electricity_maps,
+    execute,
+    execute_async,
+    executor,
+    token_auth,
+)
+from voltorb.entitlements import EntitlementClient
+from voltorb.testing import StandInServer
+
+START = datetime(2024, 1, 1, tzinfo=timezone.utc)
+END = datetime(2024, 1, 2, tzinfo=timezone.utc)
+
+
+@pytest.fixture()
+def server(server: StandInServer) -> StandInServer:
+    # a free tier token, only entitled to the latest routes
+    server._synthesiser.routes = [  # noqa: SLF001
+        "carbon-intensity/latest",
+        "power-breakdown/latest",
+    ]
+    return server
+
+
+def test_rejects_routes_not_entitled(server):
+    """That requests to routes the zone is not entitled to fail locally, as forbidden."""
+    client = EntitlementClient(server.client())
+
+    execute(electricity_maps.carbon_intensity.get_latest("FR"), client=client)
+    with pytest.raises(ForbiddenError, match="checked locally"):
+        execute(
+            electricity_maps.carbon_intensity.get_past_range("FR", START, END),
+            client=client,
+        )
+
+    # the zones, and the latest carbon intensity
+    assert server.stats == {200: 2}
+    assert client.stats == {"loads": 1, "rejected": 1}
+
+
+def test_updated_since_is_entitled_by_past_routes(server):
+    """That updates are rejected unless the zone is entitled to a past route."""
+    client = EntitlementClient(server.client())
+    query = electricity_maps.get_updated_since("FR", START)
+
+    with pytest.raises(ForbiddenError, match="checked locally"):
+        execute(query, client=client)
+
+    server._synthesiser.routes.append("power-breakdown/past-range")  # noqa: SLF001
+    execute(query, client=EntitlementClient(server.client()))
+
+    assert client.stats == {"loads": 1, "rejected": 1}
+    # the zones (twice), and the updates
+    assert server.stats == {200: 3}
+
+
+def test_partial_zone_snapshots(server):
+    """That the forecasts of partial snapshots are skipped without requests."""
+    client = EntitlementClient(server.client())
+
+    snapshot = execute(electricity_maps.get_zone_snapshot("FR"), client=client)
+
+    assert snapshot.carbon_intensity_forecast is None
+    assert snapshot.power_breakdown_forecast is None
+    assert server.stats == {200: 3}
+
+
+def test_loads_entitlements_once_per_token(server):
+    """That the entitlements of each token are loaded once, and requests by coordinates are not checked."""
+    client = EntitlementClient(server.client())
+    query = electricity_maps.carbon_intensity.get_latest("FR")
+
+    for token in ("a", "b", "a"):
+        executor(auth=token_auth(token), client=client)(query)
+    execute(
+        electricity_maps.carbon_intensity.get_forecast(Coordinates(5.0, 45.0)),
+        client=client,
+    )
+
+    assert client.stats == {"loads": 3}
+    assert server.stats == {200: 7}
+
+
+def test_threads_only_wait_for_the_load_of_their_token(server):
+    """That a slow load of the entitlements of a token doesn't hold up the requests with other tokens."""
+    loading, release = threading.Event(), threading.Event()
+
+    class SlowZonesClient(ClientWrapper):
+        def send(self, request: snug.Request) -> snug.Response:
+            if request.url.endswith("/zones") and request.headers["auth-token"] == "a":
+                loading.set()
+                release.wait(timeout=5)
+            return super().send(request)
+
+    client = EntitlementClient(SlowZonesClient(server.client()))
+    query = electricity_maps.carbon_intensity.get_latest("FR")
+    with ThreadPoolExecutor(1) as pool:
+        slow = pool.submit(executor(auth=token_auth("a"), client=client), query)
+        loading.wait(timeout=5)
+        executor(auth=token_auth("b"), client=client)(query)
+        assert not slow.done()
+        release.set()
+        slow.result()
+
+    assert client.stats == {"loads": 2}
+
+
+def test_sends_unchecked_requests_if_entitlements_fail_to_load():
+    """That requests are sent (rather than rejected) when the entitlements can't be loaded."""
+    with StandInServer(error_rate=1) as server:
+        client = EntitlementClient(server.client())
+        for _ in range(2):
+            with pytest.raises(Exception, match="503"):
+                execute(
+                    electricity_maps.carbon_intensity.get_latest("FR"), client=client
+                )
+
+    assert client.stats == {"load_errors": 1}
+    assert server.stats == {503: 3}
+
+
+def test_async_batches_share_a_single_load(server):
+    """That the concurrent requests of async batches wait for the same load of the entitlements."""
+
+    async def main() -> dict[str, object]:
+        async with httpx.AsyncClient() as http:
+            client = EntitlementClient(server.client(http))
+            query = electricity_maps.carbon_intensity.get_forecast.many(
+                ["FR", "DE", "IT-CSO"]
+            )
+            with pytest.raises(ForbiddenError):
+                await execute_async(query, client=client)
+            return dict(client.stats)
+
+    stats = asyncio.run(main())
+
+    assert stats == {"loads": 1, "rejected": 3}
+    assert server.stats == {200: 1}
@@ -0,0 +1,157 @@
+import csv
+import json
+from datetime import datetime, timezone
+from pathlib import Path
+
+import pytest
+
+from voltorb import executor
+from voltorb.cli import main
+from voltorb.export import DATASETS, ExportProgress, export, flatten
+from voltorb.testing import StandInServer
+
+START = datetime(2024, 1, 1, tzinfo=timezone.utc)
+END = datetime(2024, 1, 25, tzinfo=timezone.utc)  # 3 windows
+HOURS = 24 * 24
+
+
+def test_datasets():
+    """That all range endpoints can be exported."""
+    assert sorted(DATASETS) == [
+        "carbon-intensity",
+        "marginal-carbon-intensity",
+        "power-breakdown",
+    ]
+
+
+def test_export_csv(server, tmp_path: Path):
+    """That records are exported in order, one (flattened) row per record, chunked to the API limits."""
+    path = tmp_path / "export.csv"
+    updates: list[tuple[int, int]] = []
+
+    progress = export(
+        "power-breakdown",
+        ["IT", "FR"],
+        START,
+        END,
+        path,
+        execute=executor(client=server.client()),
+        concurrency=2,
+        progress=lambda p: updates.append((p.done, p.records)),
+    )
+
+    with path.open() as file:
+        rows = list(csv.DictReader(file))
+    assert len(rows) == 2 * HOURS
+    assert [row["zone"] for row in rows] == ["IT"] * HOURS + ["FR"] * HOURS
+    assert rows[0]["datetime"] == START.isoformat()
+    assert "power_consumption_breakdown.coal" in rows[0]
+    assert json.loads(rows[0]["power_import_breakdown"]) == {}
+    assert server.stats == {200: 6}
+    assert updates[-1] == (6, 2 * HOURS)
+    assert (progress.done, progress.total, progress.records) == (6, 6, 2 * HOURS)
+
+
+def test_export_ndjson(server, tmp_path: Path):
+    """That records are exported as API shaped JSON lines."""
+    path = tmp_path / "export.ndjson"
+
+    export(
+        "carbon-intensity",
+        ["DE"],
+        START,
+        END,
+        path,
+        fmt="ndjson",
+        execute=executor(client=server.client()),
+    )
+
+    lines = path.read_text().splitlines()
+    assert len(lines) == HOURS
+    assert json.loads(lines[0])["datetime"] == "2024-01-01T00:00:00Z"
+    assert "carbonIntensity" in json.loads(lines[0])
+
+
+def test_export_parquet(server, tmp_path: Path):
+    """That records are exported to Parquet, with typed columns."""
+    pq = pytest.importorskip("pyarrow.parquet")
+    path = tmp_path / "export.parquet"
+
+    export(
+        "power-breakdown",
+        ["DE"],
+        START,
+        END,
+        path,
+        fmt="parquet",
+        execute=executor(client=server.client()),
+    )
+
+    table = pq.read_table(path)
+    assert table.num_rows == HOURS
+    assert str(table.schema.field("datetime").type) == "timestamp[us, tz=UTC]"
+    assert str(table.schema.field("power_consumption_breakdown.coal").type) == "int64"
+
+
+def test_export_raises_on_errors(tmp_path: Path):
+    """That exports abort on the first failed query."""
+    with StandInServer(error_rate=1) as server, pytest.raises(Exception, match="503"):
+        export(
+            "carbon-intensity",
+            ["DE"],
+            START,
+            END,
+            tmp_path / "export.csv",
+            execute=executor(client=server.client()),
+        )
+
+
+def test_export_raises_on_unknown_datasets(tmp_path: Path):
+    """That unknown datasets are rejected upfront."""
+    with pytest.raises(ValueError, match="Unknown dataset"):
+        export("weather", ["DE"], START, END, tmp_path / "export.csv")
+
+
+def test_flatten(server):
+    """That nested records, enums and mappings are flattened into scalar columns."""
+    query = DATASETS["power-breakdown"]("DE", START, END)
+    record = executor(client=server.client())(query).data[0]
+
+    row = flatten(record)
+
+    assert row["zone"] == "DE"
+    assert row["datetime"] == START
+    assert row["estimation_method"] is None
+    assert all(not isinstance(value, dict) for value in row.values())
+
+
+def test_export_progress_throughput():
+    """That the throughput is measured over the elapsed time."""
+    progress = ExportProgress(total=1, records=100, started_at=0)
+
+    assert 0 < progress.throughput < 100  # noqa: PLR2004
+
+
+def test_cli_export(server, tmp_path: Path, capsys):
+    """That the command line exports a dataset, showing progress."""
+    path = tmp_path / "ci.csv"
+
+    main(
+        [
+            "export",
+            "carbon-intensity",
+            "--zones",
+            "IT, FR",
+            "--start",
+            "2024-01-01",
+            "--end",
+            "2024-01-02",
+            "--url",
+            server.url,
+            "-o",
+            str(path),
+        ]
+    )
+
+    assert len(path.read_text().splitlines()) == 1 + 2 * 24
+    assert "2/2 queries, 48 records" in capsys.readouterr().err
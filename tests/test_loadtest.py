@@ -0,0 +1,78 @@
+import json
+
+import pytest
+
+from voltorb.loadtest import TRANSPORTS, LoadTestResult, main, measure, run
+from voltorb.testing import StandInServer
+
+AVAILABLE = [name for name, t in TRANSPORTS.items() if t.available]
+
+
+@pytest.mark.parametrize("transport", AVAILABLE)
+def test_measure(server, transport):
+    """That all available transports are load-tested, sync or async, against any base URL."""
+    result = measure(transport, url=server.url, requests=20, concurrency=4)
+
+    assert result.errors == 0
+    assert len(result.latencies) == 20  # noqa: PLR2004
+    assert result.throughput > 0
+    assert result.percentile(50) <= result.percentile(99)
+    assert server.stats == {200: 20}
+
+
+def test_measure_counts_errors():
+    """That failed requests are counted, rather than aborting the scenario."""
+    with StandInServer(error_rate=1) as server:
+        result = measure("urllib", url=server.url, requests=5, concurrency=2)
+
+    assert result.errors == 5  # noqa: PLR2004
+    assert result.latencies == ()
+
+
+def test_measure_raises_on_unknown_transports(server):
+    """That unknown transports are rejected upfront."""
+    with pytest.raises(ValueError, match="Unknown transport"):
+        measure("carrier-pigeon", url=server.url)
+
+
+def test_run_matrix(server):
+    """That all combinations of transports and concurrencies are run."""
+    results = run(
+        ["urllib"], [1, 2], isolate=False, url=server.url, requests=4, zones=["FR"]
+    )
+
+    assert [(r.transport, r.concurrency) for r in results] == [
+        ("urllib", 1),
+        ("urllib", 2),
+    ]
+
+
+def test_percentiles():
+    """That percentiles are interpolated over the sorted latencies."""
+    result = LoadTestResult(
+        transport="urllib",
+        concurrency=1,
+        requests=101,
+        errors=0,
+        duration=1.0,
+        latencies=tuple(i / 1000 for i in range(101)),
+        cpu_time=0.101,
+        peak_rss=None,
+    )
+
+    assert result.percentile(50) == pytest.approx(0.050)
+    assert result.percentile(99) == pytest.approx(0.099)
+    assert result.cpu_per_request == pytest.approx(0.001)
+
+
+def test_main_reports_json(capsys):
+    """That the command line reports one JSON line per scenario, against a local stand-in by default."""
+    main(["--transports", "urllib", "--requests", "4", "--no-isolate", "--json"])
+
+    (line,) = capsys.readouterr().out.splitlines()
+    summary = json.loads(line)
+    assert summary["transport"] == "urllib"
+    assert summary["errors"] == 0
+    assert {"throughput", "p50", "p95", "p99", "cpu_per_request", "peak_rss"} <= set(
+        summary
+    )
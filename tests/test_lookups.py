@@ -0,0 +1,66 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import httpx
+import pytest
+
+from voltorb import electricity_maps, execute, execute_async
+from voltorb.lookups import coalesce, lookup_past
+
+HOUR = timedelta(hours=1)
+START = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+
+def test_coalesce_covers_hours_in_the_fewest_windows():
+    """That hours are grouped into the fewest windows of at most the given size."""
+    hours = [START + h * HOUR for h in range(0, 90 * 24, 2)]
+
+    spans = coalesce(hours)
+
+    assert len(spans) == 9  # noqa: PLR2004
+    assert all(end - start <= timedelta(days=10) for start, end in spans)
+    assert all(any(s <= h < e for s, e in spans) for h in hours)
+    assert coalesce([START, START + 30 * HOUR], window=HOUR) == [
+        (START, START + HOUR),
+        (START + 30 * HOUR, START + 31 * HOUR),
+    ]
+    with pytest.raises(ValueError, match="at least an hour"):
+        coalesce([START], window=timedelta(minutes=30))
+
+
+def test_lookup_past_coalesces_points_into_range_requests(server):
+    """That scattered points are looked up with a request per window, and returned keyed by the given pairs."""
+    points = [
+        (zone, START + h * HOUR + timedelta(minutes=m))
+        for zone in ("FR", "DE")
+        for h, m in [(0, 0), (5, 30), (100, 0), (300, 15), (301, 0)]
+    ]
+    points.append(("FR", datetime(2024, 1, 1, 5)))  # noqa: DTZ001 (naive, i.e. UTC)
+
+    records = execute(
+        lookup_past(electricity_maps.carbon_intensity.get_past_range, points),
+        client=server.client(),
+    )
+
+    assert list(records) == points
+    assert all(
+        record.zone == zone and record.datetime == dt.replace(minute=0)
+        for (zone, dt), record in records.items()
+        if dt.tzinfo is not None
+    )
+    assert records[points[-1]] == records[points[1]]
+    # a window of 10 days, and another from the 13th, per zone
+    assert server.stats == {200: 4}
+
+
+def test_lookup_past_async(server):
+    """That the windows are queried concurrently by async executors."""
+    points = [("FR", START + d * timedelta(days=10)) for d in range(6)]
+
+    async def main() -> int:
+        async with httpx.AsyncClient() as http:
+            query = lookup_past(electricity_maps.power_breakdown.get_past_range, points)
+            return len(await execute_async(query, client=server.client(http)))
+
+    assert asyncio.run(main()) == len(points)
+    assert server.stats == {200: 6}
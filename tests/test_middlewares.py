@@ -1,14 +1,27 @@
+from functools import partial
+from typing import Any
+
 import pytest
 import snug
 from attrs import frozen
+from gentools import compose, map_return, relay, reusable
 
-from voltorb import execute
+from voltorb import electricity_maps, execute
+from voltorb._patches import Query
 from voltorb.exceptions import (
+    ForbiddenError,
     HTTPStatusError,
     UnauthorisedError,
     ValidationError,
 )
-from voltorb.middlewares import rest_query
+from voltorb.middlewares import (
+    Deduplicator,
+    deserialiser,
+    error_handling_middleware,
+    request_preparation_middleware,
+    request_template,
+    rest_query,
+)
 
 
 @frozen
@@ -73,6 +86,19 @@ def test_middleware_decorated_query_raises_on_unauthorised_status_code(
         execute(query, client=client)
 
 
+def test_middleware_decorated_query_raises_on_forbidden_status_code(
+    fixture_mock_client,
+):
+    """That the middleware raises a ForbiddenError if receiving a 403 HTTP error response."""
+    query = mock_endpoint_get()
+
+    mock_response = snug.Response(403, content=b'{"message": "forbidden"}')
+    client = fixture_mock_client(mock_response)
+
+    with pytest.raises(ForbiddenError):
+        execute(query, client=client)
+
+
 @pytest.mark.parametrize(
     "response_content",
     [
@@ -109,3 +135,132 @@ def test_middleware_decorated_query_raises_validation_error_on_validation_errors
 
     with pytest.raises(ValidationError):
         execute(query, client=client)
+
+
+def _composed_rest_query(*, response_schema: type) -> Any:
+    """The reference (un-flattened) middleware composition the fast path is equivalent to."""
+    return compose(
+        reusable,
+        relay(request_preparation_middleware, error_handling_middleware),
+        map_return(partial(deserialiser, response_schema=response_schema)),
+    )
+
+
+@pytest.mark.parametrize(
+    "mock_response",
+    [
+        snug.Response(200, content=b'{"a": 1, "b": 2}'),
+        snug.Response(401, content=b'{"message": "invalid token"}'),
+        snug.Response(500, content=b'{"message": "error"}'),
+        snug.Response(200, content=b'{"a": 1}'),
+    ],
+    ids=["ok", "unauthorised", "server-error", "invalid"],
+)
+def test_middleware_decorated_query_matches_composed_middlewares(
+    fixture_mock_client, mock_response
+):
+    """That the flattened middleware has the same semantics as the composed middlewares."""
+
+    def endpoint() -> Query[snug.Response]:
+        return (yield snug.Request("GET", "https://mock/url", params={"p": 1}))
+
+    fast_query = rest_query(response_schema=ExpectedResponseSchema)(endpoint)()
+    composed_query = _composed_rest_query(response_schema=ExpectedResponseSchema)(
+        endpoint
+    )()
+
+    outcomes = []
+    for query in (fast_query, composed_query):
+        client = fixture_mock_client(mock_response)
+        try:
+            outcome = execute(query, client=client)
+        except Exception as e:  # noqa: BLE001
+            outcome = type(e)
+        outcomes.append((outcome, client.request))
+
+    assert outcomes[0] == outcomes[1]
+
+
+def test_request_template_is_built_once_and_already_prepared(fixture_mock_client):
+    """That request templates are cached, and not re-prepared by the middleware."""
+    template = request_template("GET", "https://mock/url")
+    assert request_template("GET", "https://mock/url") is template
+
+    @rest_query(response_schema=ExpectedResponseSchema)
+    def endpoint() -> Query[snug.Response]:
+        return (yield template)
+
+    mock_response = snug.Response(200, content=b'{"a": 1, "b": 2}')
+    client = fixture_mock_client(mock_response)
+
+    execute(endpoint(), client=client)
+
+    assert client.request is template
+
+
+def test_unchanged_responses_are_deserialised_once(fixture_mock_client):
+    """That identical response bodies of the same request return the value deserialised the first time."""
+    deduplicator = Deduplicator()
+
+    @rest_query(response_schema=ExpectedResponseSchema, deduplicator=deduplicator)
+    def endpoint() -> Query[snug.Response]:
+        return (yield snug.Request("GET", "https://mock/url"))
+
+    query = endpoint()
+    client = fixture_mock_client(
+        snug.Response(200, content=b'{"a": 1, "b": 2}'),
+        snug.Response(200, content=b'{"a": 1, "b": 2}'),
+        snug.Response(200, content=b'{"a": 1, "b": 3}'),
+    )
+
+    first, second, third = (execute(query, client=client) for _ in range(3))
+
+    assert second is first
+    assert third == ExpectedResponseSchema(a=1, b=3)
+    assert deduplicator.stats == {"hits": 1, "misses": 2}
+
+
+def test_deduplication_is_per_request(fixture_mock_client):
+    """That identical bodies of different requests (or schemas) are deserialised separately."""
+    deduplicator = Deduplicator()
+
+    @rest_query(response_schema=ExpectedResponseSchema, deduplicator=deduplicator)
+    def endpoint(p: int) -> Query[snug.Response]:
+        return (yield snug.Request("GET", "https://mock/url", params={"p": p}))
+
+    response = snug.Response(200, content=b'{"a": 1, "b": 2}')
+    client = fixture_mock_client(response, response)
+
+    assert execute(endpoint(1), client=client) is not execute(
+        endpoint(2), client=client
+    )
+    assert deduplicator.stats == {"misses": 2}
+
+
+def test_deduplication_evicts_and_can_be_disabled():
+    """That only the last values of the most recent requests are kept, if any."""
+    response = snug.Response(200, content=b'{"a": 1, "b": 2}')
+    request = snug.Request("GET", "https://mock/url")
+    deduplicator = Deduplicator(max_entries=1)
+
+    first = deduplicator.deserialise(response, request, ExpectedResponseSchema)
+    deduplicator.deserialise(response, request.with_params({"p": 1}), dict)
+    assert (
+        deduplicator.deserialise(response, request, ExpectedResponseSchema) is not first
+    )
+
+    disabled = Deduplicator(max_entries=0)
+    first = disabled.deserialise(response, request, ExpectedResponseSchema)
+    assert disabled.deserialise(response, request, ExpectedResponseSchema) is not first
+    assert disabled.stats == {}
+
+
+def test_deduplication_is_opt_in(fixture_mock_client):
+    """That only the queries of deduplicating endpoints share their values."""
+    response = snug.Response(200, content=b'{"a": 1, "b": 2}')
+    client = fixture_mock_client(response, response)
+    query = mock_endpoint_get()
+
+    assert execute(query, client=client) is not execute(query, client=client)
+    assert electricity_maps.carbon_intensity.get_latest.deduplicator is not None
+    assert electricity_maps.carbon_intensity.get_past.deduplicator is None
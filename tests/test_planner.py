@@ -0,0 +1,128 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from voltorb import QueryPlanner, RangeCache, ZoneCatalog, executor, schemas
+from voltorb.planner import CACHE
+
+HOUR = timedelta(hours=1)
+NOW = datetime.now(timezone.utc).replace(minute=0, second=0, microsecond=0)
+
+
+def _catalog(*routes: str) -> ZoneCatalog:
+    return ZoneCatalog({"FR": schemas.ZoneMetadata("France", access=list(routes))})
+
+
+@pytest.mark.parametrize(
+    ("start", "end", "routes"),
+    [
+        (
+            datetime(2024, 1, 1, tzinfo=timezone.utc),
+            datetime(2024, 1, 25, tzinfo=timezone.utc),
+            ["carbon-intensity/past-range"] * 3,
+        ),
+        (
+            datetime(2024, 1, 1, tzinfo=timezone.utc),
+            datetime(2024, 1, 1, 1, tzinfo=timezone.utc),
+            ["carbon-intensity/past"],
+        ),
+        (NOW - 6 * HOUR, NOW, ["carbon-intensity/past-range"]),
+        (
+            NOW - 40 * HOUR,
+            NOW - 8 * HOUR,
+            ["carbon-intensity/past-range"],
+        ),
+    ],
+    ids=["windows", "single-hour", "recent", "across-the-history"],
+)
+def test_plans_the_fewest_requests(server, start, end, routes):
+    """That ranges are fetched in the fewest requests, and their records returned in order."""
+    plan = QueryPlanner().plan("carbon-intensity", "FR", start, end)
+
+    assert [step.route for step in plan.steps] == routes
+    records = executor(client=server.client())(plan.query)
+    assert [r.datetime for r in records] == [
+        start + i * HOUR for i in range((end - start) // HOUR)
+    ]
+    assert server.stats == {200: len(routes)}
+
+
+def test_fetches_recent_gaps_with_a_single_history_request(server):
+    """That several gaps within the last 24 hours are fetched with a single history request."""
+    cache = RangeCache()
+    planner = QueryPlanner(cache)
+    execute = executor(client=server.client())
+    for start, end in [(12, 10), (6, 4)]:
+        execute(
+            planner.get_range(
+                "power-breakdown", "FR", NOW - start * HOUR, NOW - end * HOUR
+            )
+        )
+    server.stats.clear()
+
+    plan = planner.plan("power-breakdown", "FR", NOW - 20 * HOUR, NOW - 2 * HOUR)
+    records = execute(plan.query)
+
+    assert [step.route for step in plan.steps] == [
+        "power-breakdown/history",
+        CACHE,
+        CACHE,
+    ]
+    assert plan.requests == 1
+    assert len(records) == 18  # noqa: PLR2004
+    assert server.stats == {200: 1}
+
+
+def test_only_fetches_the_gaps_of_the_cache(server):
+    """That the spans already cached are served without requests."""
+    cache = RangeCache()
+    planner = QueryPlanner(cache)
+    execute = executor(client=server.client())
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+    execute(planner.get_range("carbon-intensity", "FR", start, start + 5 * 24 * HOUR))
+    plan = planner.plan("carbon-intensity", "FR", start, start + 10 * 24 * HOUR)
+    records = execute(plan.query)
+
+    assert [(step.route, step.records) for step in plan.steps] == [
+        (CACHE, 0),
+        ("carbon-intensity/past-range", 120),
+    ]
+    assert len(records) == 240  # noqa: PLR2004
+    assert server.stats == {200: 2}
+
+
+def test_only_uses_the_routes_the_zone_is_entitled_to():
+    """That only the routes the zone is entitled to are planned, if any."""
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+    planner = QueryPlanner(catalog=_catalog("carbon-intensity/past"))
+    plan = planner.plan("carbon-intensity", "FR", start, start + 3 * HOUR)
+    assert [step.route for step in plan.steps] == ["carbon-intensity/past"] * 3
+
+    planner = QueryPlanner(catalog=_catalog("carbon-intensity/history"))
+    with pytest.raises(ValueError, match="No route available"):
+        planner.plan("carbon-intensity", "FR", start, start + 3 * HOUR)
+    plan = planner.plan("carbon-intensity", "FR", NOW - 3 * HOUR, NOW)
+    assert [step.route for step in plan.steps] == ["carbon-intensity/history"]
+
+
+def test_explain():
+    """That plans describe their requests, and estimated cost."""
+    planner = QueryPlanner(round_trip=1, record_cost=0, max_concurrency=2)
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+    explanation = planner.explain(
+        "power-breakdown", "FR", start, start + 30 * 24 * HOUR
+    )
+
+    assert explanation.splitlines()[0] == (
+        "power-breakdown of FR from 2024-01-01 00:00 to 2024-01-31 00:00 UTC: 3 request(s), ~2.00s"
+    )
+    assert explanation.count("power-breakdown/past-range") == 3  # noqa: PLR2004
+
+
+def test_rejects_unknown_datasets():
+    """That unknown datasets are rejected."""
+    with pytest.raises(ValueError, match="Unknown dataset"):
+        QueryPlanner().plan("unknown", "FR", NOW - HOUR, NOW)
@@ -20,12 +20,30 @@ def test_exports_version():
         "HTTPStatusError",
         "ValidationError",
         "UnauthorisedError",
+        "ForbiddenError",
+        "CircuitOpenError",
+        "OfflineError",
         "execute",
         "execute_async",
         "executor",
         "async_executor",
+        "Batch",
         "Coordinates",
         "ZoneKey",
+        "ZoneCatalog",
+        "ZoneResolver",
+        "RangeCache",
+        "QueryPlanner",
+        "ClientWrapper",
+        "CircuitBreakingClient",
+        "AdaptiveConcurrencyClient",
+        "CachingClient",
+        "EntitlementClient",
+        "iter_past_range",
+        "aiter_past_range",
+        "lookup_past",
+        "iter_updated_since",
+        "aiter_updated_since",
         "EmissionFactorType",
         "EstimationMethod",
     ],
@@ -0,0 +1,171 @@
+import asyncio
+import json
+
+import pytest
+import snug
+
+from voltorb import (
+    ClientWrapper,
+    Coordinates,
+    HTTPStatusError,
+    ZoneKey,
+    ZoneResolver,
+    electricity_maps,
+    execute,
+    execute_async,
+)
+
+ROME = Coordinates(longitude=12.49, latitude=41.89)
+NEAR_ROME = Coordinates(longitude=12.46, latitude=41.81)
+PARIS = Coordinates(longitude=2.35, latitude=48.85)
+
+
+def _carbon_intensity(zone: str) -> bytes:
+    return json.dumps(
+        {
+            "zone": zone,
+            "carbonIntensity": 302,
+            "datetime": "2018-04-25T18:07:00.350Z",
+            "updatedAt": "2018-04-25T18:07:01.000Z",
+            "createdAt": "2018-04-25T18:07:01.000Z",
+            "emissionFactorType": "lifecycle",
+            "isEstimated": True,
+            "estimationMethod": "TIME_SLICER_AVERAGE",
+        }
+    ).encode()
+
+
+class ZonesClient(ClientWrapper):
+    """A client answering with the zone of the requested coordinates (west of 5°E is France, the rest Italy)."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.requests: list[snug.Request] = []
+
+    def send(self, request: snug.Request) -> snug.Response:
+        self.requests.append(request)
+        if "zone" in request.params:
+            zone = request.params["zone"]
+        else:
+            zone = "FR" if request.params["lon"] < 5 else "IT-CSO"  # noqa: PLR2004
+        return snug.Response(200, _carbon_intensity(zone))
+
+    async def send_async(self, request: snug.Request) -> snug.Response:
+        return self.send(request)
+
+
+def test_resolver_resolves_coordinates_in_learned_cells():
+    """That coordinates are resolved to the zone learned for any coordinates in the same cell."""
+    resolver = ZoneResolver(precision=0.1)
+    assert resolver.resolve(ROME) is None
+
+    resolver.learn(ROME, ZoneKey("IT-CSO"))
+
+    assert resolver.resolve(ROME) == "IT-CSO"
+    assert resolver.resolve(NEAR_ROME) == "IT-CSO"
+    assert resolver.resolve(PARIS) is None
+    assert len(resolver) == 1
+
+
+def test_resolver_does_not_resolve_ambiguous_cells():
+    """That cells found to span several zones are not resolved."""
+    resolver = ZoneResolver(precision=1)
+    resolver.learn(ROME, ZoneKey("IT-CSO"))
+    resolver.learn(NEAR_ROME, ZoneKey("IT-SUD"))
+
+    assert resolver.resolve(ROME) is None
+    assert resolver.resolve(NEAR_ROME) is None
+
+    # once ambiguous, always ambiguous
+    resolver.learn(ROME, ZoneKey("IT-CSO"))
+    assert resolver.resolve(ROME) is None
+
+
+def test_resolver_rewrites_coordinates_geolocations():
+    """That only coordinates with a known zone are rewritten into zones."""
+    resolver = ZoneResolver()
+    resolver.learn(ROME, ZoneKey("IT-CSO"))
+
+    assert resolver.geolocation(NEAR_ROME) == "IT-CSO"
+    assert resolver.geolocation(PARIS) == PARIS
+    assert resolver.geolocation(ZoneKey("FR")) == "FR"
+
+
+@pytest.mark.parametrize("precision", [0, -0.1])
+def test_resolver_raises_on_invalid_precision(precision):
+    """That the grid needs cells of a positive size."""
+    with pytest.raises(ValueError, match="precision"):
+        ZoneResolver(precision=precision)
+
+
+def test_resolving_client_learns_zones_and_rewrites_requests():
+    """That the resolving client learns zones from responses, and then requests zones rather than coordinates."""
+    resolver = ZoneResolver()
+    client = ZonesClient()
+
+    execute(
+        electricity_maps.carbon_intensity.get_latest(ROME),
+        client=resolver.client(client),
+    )
+    assert client.requests[-1].params == {"lon": ROME.longitude, "lat": ROME.latitude}
+    assert resolver.resolve(ROME) == "IT-CSO"
+
+    execute(
+        electricity_maps.carbon_intensity.get_latest(NEAR_ROME),
+        client=resolver.client(client),
+    )
+    assert client.requests[-1].params == {"zone": "IT-CSO"}
+
+
+def test_resolving_client_does_not_learn_from_errors(fixture_mock_client):
+    """That failed requests do not teach the resolver anything."""
+    resolver = ZoneResolver()
+    client = fixture_mock_client(snug.Response(500, b'{"zone": "IT-CSO"}'))
+
+    with pytest.raises(HTTPStatusError):
+        execute(
+            electricity_maps.carbon_intensity.get_latest(ROME),
+            client=resolver.client(client),
+        )
+
+    assert len(resolver) == 0
+
+
+def test_resolve_many_queries_once_per_unknown_cell():
+    """That coordinates are resolved in bulk, with a single request per cell of the grid."""
+    resolver = ZoneResolver()
+    resolver.learn(PARIS, ZoneKey("FR"))
+    client = ZonesClient()
+
+    zones = execute(
+        resolver.resolve_many([ROME, NEAR_ROME, PARIS, ROME]), client=client
+    )
+
+    assert zones == {ROME: "IT-CSO", NEAR_ROME: "IT-CSO", PARIS: "FR"}
+    assert len(client.requests) == 1
+    assert resolver.resolve(NEAR_ROME) == "IT-CSO"
+
+
+def test_resolve_many_queries_each_coordinates_in_ambiguous_cells():
+    """That coordinates in ambiguous cells are each resolved by the API."""
+    resolver = ZoneResolver(precision=1)
+    resolver.learn(ROME, ZoneKey("IT-CSO"))
+    resolver.learn(NEAR_ROME, ZoneKey("IT-SUD"))
+    client = ZonesClient()
+
+    zones = execute(resolver.resolve_many([ROME, NEAR_ROME]), client=client)
+
+    assert zones == {ROME: "IT-CSO", NEAR_ROME: "IT-CSO"}
+    assert len(client.requests) == 2  # noqa: PLR2004
+
+
+def test_resolve_many_async():
+    """That coordinates can be resolved in bulk asynchronously."""
+    resolver = ZoneResolver()
+    client = ZonesClient()
+
+    zones = asyncio.run(
+        execute_async(resolver.resolve_many([ROME, PARIS]), client=client)
+    )
+
+    assert zones == {ROME: "IT-CSO", PARIS: "FR"}
@@ -0,0 +1,133 @@
+import multiprocessing
+import struct
+import threading
+import time
+import uuid
+from collections.abc import Iterator
+from multiprocessing import shared_memory
+
+import pytest
+import snug
+
+from voltorb import ClientWrapper, executor, schemas
+from voltorb.sharedcache import SharedLatestCache
+
+
+@pytest.fixture()
+def cache() -> Iterator[SharedLatestCache]:
+    with SharedLatestCache.create(
+        f"voltorb-{uuid.uuid4().hex[:12]}", ["IT", "FR"]
+    ) as cache:
+        yield cache
+
+
+def _read_in_other_process(name: str, queue: "multiprocessing.Queue[object]") -> None:
+    with SharedLatestCache.attach(name) as cache:
+        queue.put(cache.get("power-breakdown", "FR"))
+
+
+def test_refresh(server, cache):
+    """That the latest values of all zones are written, and read back as the results of the latest endpoints."""
+    assert cache.get("carbon-intensity", "IT") is None
+
+    assert cache.refresh(executor(client=server.client())) == 4  # noqa: PLR2004
+
+    intensity = cache.get("carbon-intensity", "IT")
+    assert isinstance(intensity, schemas.CarbonIntensity)
+    assert intensity.zone == "IT"
+    assert isinstance(cache.get("power-breakdown", "FR"), schemas.PowerBreakdown)
+    assert cache.age("carbon-intensity", "IT") < 1
+    assert cache.get("carbon-intensity", "DE") is None
+
+
+def test_refresh_skips_values_of_other_zones(server, cache, caplog):
+    """That values answered for another zone than requested are skipped, without aborting the refresh."""
+
+    class MislabellingClient(ClientWrapper):
+        def send(self, request: snug.Request) -> snug.Response:
+            if request.params.get("zone") == "IT":
+                request = request.with_params({"zone": "DE"})
+            return super().send(request)
+
+    written = cache.refresh(executor(client=MislabellingClient(server.client())))
+
+    assert written == 2  # noqa: PLR2004
+    assert cache.get("carbon-intensity", "IT") is None
+    assert cache.get("carbon-intensity", "FR") is not None
+    assert "answered for zone 'DE'" in caplog.text
+
+
+def test_readers_in_other_processes(server, cache):
+    """That other processes read the values written by the refresher."""
+    cache.refresh(executor(client=server.client()))
+    context = multiprocessing.get_context("spawn")
+    queue = context.Queue()
+
+    process = context.Process(target=_read_in_other_process, args=(cache.name, queue))
+    process.start()
+    value = queue.get(timeout=30)
+    process.join()
+
+    assert value == cache.get("power-breakdown", "FR")
+    # readers don't destroy the table when detaching
+    with SharedLatestCache.attach(cache.name) as reader:
+        assert reader.zones == ("IT", "FR")
+
+
+def test_values_are_only_decoded_when_changed(server, cache):
+    """That unchanged values are served from the values decoded by the process."""
+    cache.refresh(executor(client=server.client()))
+    reader = SharedLatestCache.attach(cache.name)
+
+    first = reader.get("carbon-intensity", "IT")
+    assert reader.get("carbon-intensity", "IT") is first
+
+    cache.refresh(executor(client=server.client()))
+    assert reader.get("carbon-intensity", "IT") is not first
+    reader.close()
+
+
+def test_readers_wait_for_the_writer(server, cache):
+    """That readers retry while a slot is being written, rather than reading torn values."""
+    cache.refresh(executor(client=server.client()))
+    offset = cache._slot("carbon-intensity", "IT")  # noqa: SLF001
+    buffer = cache._buffer  # noqa: SLF001
+    (sequence,) = struct.unpack_from("<Q", buffer, offset)
+
+    payload = bytes(buffer[offset + 24 : offset + 32])
+
+    struct.pack_into("<Q", buffer, offset, sequence + 1)
+    buffer[offset + 24 : offset + 32] = b"\xff" * 8  # torn
+
+    def finish() -> None:
+        time.sleep(0.05)
+        buffer[offset + 24 : offset + 32] = payload
+        struct.pack_into("<Q", buffer, offset, sequence + 2)
+
+    reader = SharedLatestCache.attach(cache.name)
+    thread = threading.Thread(target=finish)
+    thread.start()
+    assert reader.get("carbon-intensity", "IT").zone == "IT"
+    thread.join()
+    reader.close()
+
+
+def test_rejects_values_not_fitting_slots(server):
+    """That values larger than the slots are rejected."""
+    name = f"voltorb-{uuid.uuid4().hex[:12]}"
+    with (
+        SharedLatestCache.create(name, ["IT"], slot_size=64) as cache,
+        pytest.raises(ValueError, match="does not fit"),
+    ):
+        cache.refresh(executor(client=server.client()))
+
+
+def test_rejects_other_blocks():
+    """That blocks which are not caches are rejected."""
+    block = shared_memory.SharedMemory(create=True, size=64)
+    try:
+        with pytest.raises(ValueError, match="cache"):
+            SharedLatestCache(block)
+    finally:
+        block.close()
+        block.unlink()
@@ -0,0 +1,335 @@
+import asyncio
+import itertools
+import json
+import math
+import threading
+from datetime import datetime, timedelta, timezone
+
+import pytest
+import snug
+
+from voltorb import (
+    ClientWrapper,
+    HTTPStatusError,
+    ZoneKey,
+    async_executor,
+    electricity_maps,
+    executor,
+    schemas,
+)
+from voltorb.streaming import (
+    aiter_past_range,
+    aiter_updated_since,
+    iter_past_range,
+    iter_updated_since,
+    windows,
+)
+
+START = datetime(2024, 1, 1, tzinfo=timezone.utc)
+END = datetime(2024, 2, 1, tzinfo=timezone.utc)
+HOURS = int((END - START) / timedelta(hours=1))
+
+
+def _parse(value: str) -> datetime:
+    return datetime.fromisoformat(value.replace("Z", "+00:00"))
+
+
+class RangeClient(ClientWrapper):
+    """A client answering range requests with hourly carbon intensity records."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.requests: list[snug.Request] = []
+        self.lock = threading.Lock()
+
+    def send(self, request: snug.Request) -> snug.Response:
+        with self.lock:
+            self.requests.append(request)
+
+        start, end = _parse(request.params["start"]), _parse(request.params["end"])
+        hours = int((end - start) / timedelta(hours=1))
+        data = [
+            {
+                "zone": request.params["zone"],
+                "carbonIntensity": 302,
+                "datetime": (start + timedelta(hours=i)).isoformat(),
+                "updatedAt": "2018-04-25T18:07:01.000Z",
+                "createdAt": "2018-04-25T18:07:01.000Z",
+                "emissionFactorType": "lifecycle",
+                "isEstimated": True,
+                "estimationMethod": "TIME_SLICER_AVERAGE",
+            }
+            for i in range(hours)
+        ]
+        content = json.dumps({"zone": request.params["zone"], "data": data})
+        return snug.Response(200, content.encode())
+
+    async def send_async(self, request: snug.Request) -> snug.Response:
+        return self.send(request)
+
+
+class UpdatesClient(ClientWrapper):
+    """A client answering update requests with the updates of each hour of the searched timeframe, up to the limit."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.requests: list[snug.Request] = []
+
+    def send(self, request: snug.Request) -> snug.Response:
+        self.requests.append(request)
+
+        start = _parse(request.params.get("start", START.isoformat()))
+        end = _parse(request.params.get("end", END.isoformat()))
+        limit = int(request.params["limit"])
+        hours = math.ceil((end - START) / timedelta(hours=1))
+        datetimes = [START + timedelta(hours=i) for i in range(hours)]
+        datetimes = [dt for dt in datetimes if dt >= start]
+        updates = [
+            {"datetime": dt.isoformat(), "updatedAt": "2024-03-01T00:00:00Z"}
+            for dt in datetimes[:limit]
+        ]
+        content = json.dumps(
+            {
+                "zone": request.params["zone"],
+                "updates": updates,
+                "threshold": "P1D",
+                "limit": limit,
+                "limitReached": len(datetimes) > limit,
+            }
+        )
+        return snug.Response(200, content.encode())
+
+    async def send_async(self, request: snug.Request) -> snug.Response:
+        return self.send(request)
+
+
+def test_windows_split_ranges_into_consecutive_windows():
+    """That date ranges are split into windows covering the whole range, without overlaps."""
+    split = list(windows(START, END, timedelta(days=10)))
+
+    assert split[0][0] == START
+    assert split[-1][1] == END
+    assert all(a[1] == b[0] for a, b in itertools.pairwise(split))
+    assert [e - s for s, e in split] == [timedelta(days=10)] * 3 + [timedelta(days=1)]
+
+
+def test_windows_of_empty_ranges():
+    """That empty ranges have no windows."""
+    assert list(windows(END, START)) == []
+
+
+def test_windows_raise_on_invalid_size():
+    """That windows must have a positive size."""
+    with pytest.raises(ValueError, match="size"):
+        list(windows(START, END, timedelta(0)))
+
+
+@pytest.mark.parametrize("prefetch", [0, 1, 3])
+def test_iter_past_range_yields_all_records_in_order(prefetch):
+    """That the records of all windows are yielded in order, whatever the prefetching."""
+    client = RangeClient()
+
+    records = iter_past_range(
+        electricity_maps.carbon_intensity.get_past_range,
+        ZoneKey("FR"),
+        START,
+        END,
+        execute=executor(client=client),
+        prefetch=prefetch,
+    )
+    datetimes = [record.datetime for record in records]
+
+    assert len(datetimes) == HOURS
+    assert datetimes == sorted(datetimes)
+    assert len(client.requests) == 4  # noqa: PLR2004
+
+
+def test_iter_past_range_bounds_prefetching():
+    """That no more than the given number of windows are downloaded ahead of the records being consumed."""
+    client = RangeClient()
+
+    records = iter_past_range(
+        electricity_maps.carbon_intensity.get_past_range,
+        ZoneKey("FR"),
+        START,
+        END,
+        execute=executor(client=client),
+        window=timedelta(days=1),
+        prefetch=2,
+    )
+    first = next(records)
+    assert isinstance(first, schemas.CarbonIntensity)
+
+    records.close()
+    # the window being consumed, and (at most) the two after it
+    assert len(client.requests) <= 3  # noqa: PLR2004
+
+
+def test_iter_past_range_propagates_errors(fixture_mock_client):
+    """That failing windows raise when reached."""
+    client = fixture_mock_client(snug.Response(500, b"{}"))
+
+    records = iter_past_range(
+        electricity_maps.carbon_intensity.get_past_range,
+        ZoneKey("FR"),
+        START,
+        START + timedelta(days=1),
+        execute=executor(client=client),
+    )
+
+    with pytest.raises(HTTPStatusError):
+        next(records)
+
+
+def test_iter_past_range_raises_on_invalid_prefetch():
+    """That the number of windows to prefetch can't be negative."""
+    with pytest.raises(ValueError, match="prefetch"):
+        next(
+            iter_past_range(
+                electricity_maps.carbon_intensity.get_past_range,
+                ZoneKey("FR"),
+                START,
+                END,
+                prefetch=-1,
+            )
+        )
+
+
+def test_aiter_past_range_yields_all_records_in_order():
+    """That the records of all windows are yielded in order asynchronously."""
+    client = RangeClient()
+
+    async def collect() -> list[datetime]:
+        return [
+            record.datetime
+            async for record in aiter_past_range(
+                electricity_maps.carbon_intensity.get_past_range,
+                ZoneKey("FR"),
+                START,
+                END,
+                execute=async_executor(client=client),
+            )
+        ]
+
+    datetimes = asyncio.run(collect())
+
+    assert len(datetimes) == HOURS
+    assert datetimes == sorted(datetimes)
+
+
+def test_namespaces_expose_streaming_variants_of_range_endpoints():
+    """That range endpoints can be streamed straight from their namespace."""
+    client = RangeClient()
+
+    records = electricity_maps.marginal_carbon_intensity.iter_past_range(
+        ZoneKey("FR"), START, END, execute=executor(client=client)
+    )
+
+    assert sum(1 for _ in records) == HOURS
+    assert hasattr(electricity_maps.carbon_intensity, "aiter_past_range")
+    assert hasattr(electricity_maps.power_breakdown, "iter_past_range")
+
+
+@pytest.mark.parametrize(("limit", "pages"), [(1000, 1), (100, 8), (744, 1), (743, 2)])
+def test_iter_updated_since_follows_pages(limit, pages):
+    """That pages are requested until one doesn't reach the limit, each starting after the last update of the previous one."""
+    client = UpdatesClient()
+
+    updates = iter_updated_since(
+        electricity_maps.get_updated_since,
+        ZoneKey("FR"),
+        START,
+        execute=executor(client=client),
+        limit=limit,
+    )
+    datetimes = [update.datetime for update in updates]
+
+    assert datetimes == [START + timedelta(hours=i) for i in range(HOURS)]
+    assert len(client.requests) == pages
+    assert "start" not in client.requests[0].params
+
+
+def test_iter_updated_since_streams_a_page_at_a_time():
+    """That pages are only requested once the updates of the previous one are consumed."""
+    client = UpdatesClient()
+
+    updates = electricity_maps.iter_updated_since(
+        ZoneKey("FR"), START, execute=executor(client=client), limit=10
+    )
+    for _ in range(10):
+        next(updates)
+    assert len(client.requests) == 1
+
+    next(updates)
+    assert client.requests[-1].params["start"] == "2024-01-01T09:00:01Z"
+
+
+def test_iter_updated_since_stops_at_the_end_of_the_timeframe():
+    """That no page is requested past the end of the searched timeframe."""
+    client = UpdatesClient()
+
+    updates = list(
+        iter_updated_since(
+            electricity_maps.get_updated_since,
+            ZoneKey("FR"),
+            START,
+            end=START + timedelta(hours=4),
+            execute=executor(client=client),
+            limit=4,
+        )
+    )
+
+    assert len(updates) == 4  # noqa: PLR2004
+    assert len(client.requests) == 1
+
+
+def test_iter_updated_since_raises_on_pages_not_progressing():
+    """That pages are not requested forever if their start is ignored."""
+
+    class IgnoringStartClient(UpdatesClient):
+        def send(self, request: snug.Request) -> snug.Response:
+            params = {k: v for k, v in request.params.items() if k != "start"}
+            return super().send(request.replace(params=params))
+
+    client = IgnoringStartClient()
+    updates = iter_updated_since(
+        electricity_maps.get_updated_since,
+        ZoneKey("FR"),
+        START,
+        execute=executor(client=client),
+        limit=10,
+    )
+
+    with pytest.raises(RuntimeError, match="page further"):
+        list(updates)
+    assert len(client.requests) == 2  # noqa: PLR2004
+
+
+def test_iter_updated_since_raises_on_invalid_limit():
+    """That the limit must be within the one of the API."""
+    with pytest.raises(ValueError, match="limit"):
+        next(
+            iter_updated_since(
+                electricity_maps.get_updated_since, "FR", START, limit=1001
+            )
+        )
+
+
+def test_aiter_updated_since_follows_pages():
+    """That pages are followed asynchronously."""
+    client = UpdatesClient()
+
+    async def collect() -> list[datetime]:
+        return [
+            update.datetime
+            async for update in aiter_updated_since(
+                electricity_maps.get_updated_since,
+                ZoneKey("FR"),
+                START,
+                execute=async_executor(client=client),
+                limit=500,
+            )
+        ]
+
+    assert len(asyncio.run(collect())) == HOURS
+    assert len(client.requests) == 2  # noqa: PLR2004
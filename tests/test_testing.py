@@ -0,0 +1,193 @@
+import asyncio
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+import pytest
+import snug
+
+from voltorb import (
+    Coordinates,
+    HTTPStatusError,
+    electricity_maps,
+    execute,
+    execute_async,
+)
+from voltorb.api import ENDPOINTS
+from voltorb.clients import RedirectingClient
+from voltorb.schemas import PowerBreakdownHistory
+from voltorb.serde import converter
+from voltorb.testing import (
+    SYNTHETIC_ZONES,
+    Cassette,
+    RecordingClient,
+    ReplayingClient,
+    StandInServer,
+)
+
+START = datetime(2024, 1, 1, tzinfo=timezone.utc)
+END = datetime(2024, 1, 3, tzinfo=timezone.utc)
+
+
+def test_redirecting_client_keeps_path_and_params(fixture_mock_client):
+    """That requests are redirected to the base URL, as they are otherwise."""
+    client = fixture_mock_client(snug.Response(200, b"{}"))
+
+    execute(
+        electricity_maps.get_zones(),
+        client=RedirectingClient("http://127.0.0.1:8080", client),
+    )
+
+    assert client.request.url == "http://127.0.0.1:8080/v3/zones"
+
+
+def test_stand_in_serves_all_routes(server):
+    """That all API routes are emulated, with payloads matching their schemas."""
+    client = server.client()
+    api = electricity_maps
+
+    zones = execute(api.get_zones(), client=client)
+    assert set(zones) == set(SYNTHETIC_ZONES)
+    assert execute(api.get_health(), client=client).status == "ok"
+
+    for query in (
+        api.carbon_intensity.get_latest("DE"),
+        api.carbon_intensity.get_history("DE"),
+        api.carbon_intensity.get_past("DE", START),
+        api.carbon_intensity.get_past_range("DE", START, END),
+        api.carbon_intensity.get_forecast("DE"),
+        api.marginal_carbon_intensity.get_past("DE", START),
+        api.marginal_carbon_intensity.get_past_range("DE", START, END),
+        api.power_breakdown.get_latest("DE"),
+        api.power_breakdown.get_history("DE"),
+        api.power_breakdown.get_past("DE", START),
+        api.power_breakdown.get_past_range("DE", START, END),
+        api.power_breakdown.get_forecast("DE"),
+        api.power_production_breakdown.get_forecast("DE"),
+        api.power_consumption_breakdown.get_forecast("DE"),
+        api.get_updated_since("DE", START),
+    ):
+        assert execute(query, client=client) is not None
+
+    assert server.stats == {200: len(ENDPOINTS)}
+
+
+def test_stand_in_serves_records_over_the_requested_range(server):
+    """That past ranges have hourly records over the requested range, for the requested zone."""
+    history = execute(
+        electricity_maps.power_breakdown.get_past_range("FR", START, END),
+        client=server.client(),
+    )
+
+    assert history.zone == "FR"
+    assert len(history.data) == 48  # noqa: PLR2004
+    assert history.data[0].datetime == START
+
+
+def test_stand_in_resolves_coordinates(server):
+    """That coordinates are resolved to (deterministic) zones."""
+    query = electricity_maps.carbon_intensity.get_latest(Coordinates(12.49, 41.89))
+
+    zones = {execute(query, client=server.client()).zone for _ in range(2)}
+
+    assert len(zones) == 1
+    assert zones <= set(SYNTHETIC_ZONES)
+
+
+def test_stand_in_serves_async_clients(server):
+    """That the stand-in is reachable by async clients (with ports)."""
+    pytest.importorskip("httpx")
+    import httpx
+
+    async def run() -> None:
+        async with httpx.AsyncClient() as client:
+            query = electricity_maps.carbon_intensity.get_latest("DE")
+            intensity = await execute_async(query, client=server.client(client))
+            assert intensity.zone == "DE"
+
+    asyncio.run(run())
+
+
+def test_stand_in_emulates_latency():
+    """That responses are delayed by the configured latency."""
+    with StandInServer(latency=0.1, jitter=0.01) as server:
+        start = time.perf_counter()
+        execute(electricity_maps.get_zones(), client=server.client())
+
+    assert time.perf_counter() - start >= 0.09  # noqa: PLR2004
+
+
+def test_stand_in_emulates_errors():
+    """That requests fail at the configured rate."""
+    with StandInServer(error_rate=1) as server, pytest.raises(HTTPStatusError):
+        execute(electricity_maps.get_zones(), client=server.client())
+
+    assert server.stats == {503: 1}
+
+
+def test_stand_in_emulates_bursts_of_429s():
+    """That bursts of 429s span the configured number of requests."""
+    with StandInServer(burst_rate=1, burst_length=3, seed=0) as server:
+        for _ in range(3):
+            with pytest.raises(HTTPStatusError):
+                execute(electricity_maps.get_zones(), client=server.client())
+        server.burst_rate = 0
+        execute(electricity_maps.get_zones(), client=server.client())
+
+    assert server.stats == {429: 3, 200: 1}
+
+
+def test_stand_in_emulates_rate_limits():
+    """That requests above the rate limit are throttled."""
+    with StandInServer(rate_limit=2) as server:
+        for _ in range(2):
+            execute(electricity_maps.get_zones(), client=server.client())
+        with pytest.raises(HTTPStatusError) as excinfo:
+            execute(electricity_maps.get_zones(), client=server.client())
+
+    assert excinfo.value.response.headers["retry-after"] == "1"
+
+
+def test_stand_in_rejects_unknown_routes_and_missing_params(server):
+    """That requests the API would reject are rejected too."""
+    with pytest.raises(HTTPStatusError) as excinfo:
+        execute(
+            electricity_maps.get_zones(), client=RedirectingClient(f"{server.url}/x")
+        )
+    assert server.stats[404] == 1
+
+    status_code, _, _ = server.handle("GET", "/v3/carbon-intensity/latest")
+    assert status_code == 400  # noqa: PLR2004
+    assert excinfo.value.response.status_code == 404  # noqa: PLR2004
+
+
+def test_record_and_replay(server, tmp_path: Path):
+    """That recorded responses are replayed identically, in process and over the network."""
+    cassette = Cassette()
+    query = electricity_maps.power_breakdown.get_past_range("DE", START, END)
+
+    recorded = execute(query, client=RecordingClient(cassette, server.client()))
+    cassette.save(tmp_path / "cassette.json")
+    cassette = Cassette.load(tmp_path / "cassette.json")
+
+    assert len(cassette) == 1
+    assert execute(query, client=ReplayingClient(cassette)) == recorded
+    with StandInServer(cassette=cassette, seed=1) as replaying:
+        assert execute(query, client=replaying.client()) == recorded
+
+
+def test_replay_raises_on_unrecorded_requests():
+    """That requests without recorded responses fail, rather than hitting the network."""
+    with pytest.raises(LookupError, match="/v3/zones"):
+        execute(electricity_maps.get_zones(), client=ReplayingClient(Cassette()))
+
+
+def test_schemas_roundtrip(server):
+    """That schemas unstructure to the payloads they are structured from."""
+    query = electricity_maps.power_breakdown.get_history("DE")
+    history = execute(query, client=server.client())
+
+    payload = converter.unstructure(history)
+
+    assert "powerConsumptionBreakdown" in payload["history"][0]
+    assert converter.structure(payload, PowerBreakdownHistory) == history
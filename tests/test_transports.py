@@ -0,0 +1,147 @@
+import asyncio
+from collections.abc import Generator
+
+import httpx
+import pytest
+import snug
+
+from voltorb import ZoneKey, async_executor, electricity_maps, execute, execute_async
+from voltorb.middlewares import request_template
+from voltorb.testing import StandInServer
+from voltorb.transports import Http2Client, _shared, _shared_client
+
+MOCK_CARBON_INTENSITY = b"""\
+{
+  "zone": "FR",
+  "carbonIntensity": 302,
+  "datetime": "2018-04-25T18:07:00.350Z",
+  "updatedAt": "2018-04-25T18:07:01.000Z",
+  "createdAt": "2018-04-25T18:07:01.000Z",
+  "emissionFactorType": "lifecycle",
+  "isEstimated": true,
+  "estimationMethod": "TIME_SLICER_AVERAGE"
+}
+"""
+
+
+class SlowTransport(httpx.AsyncBaseTransport):
+    """A transport answering all requests with the same response, after yielding to the event loop."""
+
+    def __init__(self) -> None:
+        self.requests: list[httpx.Request] = []
+
+    async def handle_async_request(self, request):
+        self.requests.append(request)
+        await asyncio.sleep(0.01)
+        return httpx.Response(
+            200, content=MOCK_CARBON_INTENSITY, extensions={"http_version": b"HTTP/2"}
+        )
+
+
+def test_http2_client_sends_requests():
+    """That queries can be executed through the HTTP/2 client."""
+    transport = SlowTransport()
+    client = Http2Client(transport=transport)
+
+    query = electricity_maps.carbon_intensity.get_latest(ZoneKey("FR"))
+    result = asyncio.run(execute_async(query, client=client))
+
+    assert result.zone == "FR"
+    assert transport.requests[0].url.params["zone"] == "FR"
+    assert transport.requests[0].headers["user-agent"].startswith("voltorb/")
+
+
+def test_http2_client_keeps_stats():
+    """That the HTTP/2 client counts requests, concurrency and protocol versions."""
+    client = Http2Client(transport=SlowTransport())
+
+    zones = [ZoneKey(f"Z{i}") for i in range(10)]
+    query = electricity_maps.carbon_intensity.get_latest.many(zones, max_concurrency=4)
+
+    asyncio.run(async_executor(client=client)(query))
+
+    assert client.stats.requests == len(zones)
+    assert client.stats.in_flight == 0
+    assert client.stats.peak_in_flight == 4  # noqa: PLR2004
+    assert client.stats.http_versions == {"HTTP/2": len(zones)}
+
+
+def test_http2_client_counts_errors():
+    """That requests failing without a response are counted as errors."""
+
+    def fail(request: httpx.Request) -> httpx.Response:
+        msg = "unreachable"
+        raise httpx.ConnectError(msg, request=request)
+
+    client = Http2Client(transport=httpx.MockTransport(fail))
+
+    query = electricity_maps.carbon_intensity.get_latest(ZoneKey("FR"))
+    with pytest.raises(httpx.ConnectError):
+        asyncio.run(execute_async(query, client=client))
+
+    assert client.stats.errors == 1
+    assert client.stats.in_flight == 0
+
+
+def test_http2_client_can_be_reused_across_event_loops():
+    """That the HTTP/2 client opens new connections when used from a new event loop."""
+    client = Http2Client(transport=SlowTransport())
+    query = electricity_maps.carbon_intensity.get_latest(ZoneKey("FR"))
+
+    asyncio.run(execute_async(query, client=client))
+    asyncio.run(execute_async(query, client=client))
+
+    assert client.stats.requests == 2  # noqa: PLR2004
+
+
+def test_http2_client_is_async_only():
+    """That the HTTP/2 client can't be used by sync executors."""
+    query = electricity_maps.carbon_intensity.get_latest(ZoneKey("FR"))
+
+    with pytest.raises(TypeError, match="async"):
+        execute(query, client=Http2Client())
+
+
+def test_http2_client_closes_connections():
+    """That the HTTP/2 client closes its connections when exiting its context."""
+
+    async def run() -> Http2Client:
+        async with Http2Client(transport=SlowTransport()) as client:
+            await execute_async(
+                electricity_maps.carbon_intensity.get_latest(ZoneKey("FR")),
+                client=client,
+            )
+        return client
+
+    assert asyncio.run(run()).client is None
+
+
+def test_execute_async_http2_does_not_take_a_client():
+    """That the HTTP/2 transport can't be selected together with a custom client."""
+    query = electricity_maps.carbon_intensity.get_latest(ZoneKey("FR"))
+
+    with pytest.raises(ValueError, match="http2"):
+        asyncio.run(execute_async(query, client=Http2Client(), http2=True))
+
+
+def test_execute_async_http2_shares_a_client_per_event_loop(server: StandInServer):
+    """That concurrent HTTP/2 executions share the connections of the event loop, closed along with it."""
+
+    def health() -> Generator[snug.Request, snug.Response, int]:
+        response = yield request_template("GET", f"{server.url}/health")
+        return int(response.status_code)
+
+    async def main() -> Http2Client:
+        results = await asyncio.gather(
+            *(execute_async(health(), http2=True) for _ in range(5))
+        )
+        assert results == [200] * 5
+        return await _shared_client()
+
+    first = asyncio.run(main())
+    assert first.stats.requests == 5  # noqa: PLR2004
+    assert first.client is None
+
+    second = asyncio.run(main())
+    assert second is not first
+    assert len(_shared) == 1